@@ -1,14 +1,28 @@
+import anyio
 import attr
+import json
 
+from typing import Any, Optional
+
+from fastapi import Request
 from fastapi.applications import FastAPI
+from fastapi.responses import JSONResponse, Response
 from fastapi.routing import APIRoute
 from fastapi.middleware.cors import CORSMiddleware
 
+from limits import LimitExceeded, Limits
+
+
+# Hilos que ejecutan en paralelo el cuerpo de las rutas definidas en el script.
+DEFAULT_ROUTE_WORKERS = 8
+
 
 @attr.s(auto_attribs=True)
 class APIApp():
 
     title: str
+    workers: int = DEFAULT_ROUTE_WORKERS
+    limits: Optional[Limits] = None
 
     def __attrs_post_init__(self):
         self.app = FastAPI(title=self.title)
@@ -18,6 +32,7 @@ class APIApp():
             allow_methods=["*"],
             allow_headers=["*"],
         )
+        self.limiter: Optional[anyio.CapacityLimiter] = None
 
     def get_app_instance(self) -> FastAPI:
         return self.app
@@ -27,3 +42,64 @@ class APIApp():
 
     def include_router(self, router: APIRoute) -> None:
         self.app.include_router(router)
+
+    def add_health_check(self, handlers: list[Any]) -> None:
+        """Añade `GET /` con el estado del servicio si el script no define esa ruta."""
+        if any(handler.method == 'GET' and handler.path == '/' for handler in handlers):
+            return
+
+        @self.app.get("/")
+        def health_check():
+            return {"status": "OK!"}
+
+    def add_route(self, handler: Any) -> None:
+        """Publica una ruta del script.
+
+        El cuerpo de la ruta se ejecuta en hilos de trabajo, como máximo
+        `workers` a la vez, nunca en el bucle de eventos, así que un manejador
+        lento no bloquea al resto. Se usan los hilos de anyio y no un
+        `ThreadPoolExecutor` porque este deja de aceptar trabajo cuando
+        termina el hilo principal del script, que no espera al servidor.
+
+        Si la ruta tiene caché, una respuesta vigente se devuelve desde el
+        bucle de eventos, sin pasar por los hilos ni por la base de datos.
+
+        `limits` son los límites de las rutas que no tienen los suyos; una
+        petición que supera alguno responde 503.
+        """
+        cache = handler.cache
+
+        async def endpoint(request: Request) -> Response:
+            if cache is not None:
+                key = cache.key(request.url.path, request.query_params.multi_items())
+                cached = cache.get(key)
+                if cached is not None:
+                    return Response(cached, media_type="application/json")
+                generation = cache.generation
+            raw_body = await request.body()
+            try:
+                body = json.loads(raw_body) if raw_body else None
+            except json.JSONDecodeError:
+                return JSONResponse({"error": "El cuerpo de la petición no es JSON válido"}, status_code=400)
+            values = {
+                "method": request.method,
+                "path": request.url.path,
+                "params": dict(request.path_params),
+                "query": dict(request.query_params),
+                "body": body,
+            }
+            if self.limiter is None:
+                # El limitador se crea dentro del bucle de eventos del servidor
+                self.limiter = anyio.CapacityLimiter(self.workers)
+            try:
+                result = await anyio.to_thread.run_sync(handler.run, values, self.limits, limiter=self.limiter)
+            except LimitExceeded as e:
+                return JSONResponse({"error": str(e), "limit": e.limit}, status_code=503)
+            except Exception as e:
+                return JSONResponse({"error": str(e)}, status_code=500)
+            response = JSONResponse(result)
+            if cache is not None:
+                cache.put(key, response.body, generation)
+            return response
+
+        self.app.add_api_route(handler.path, endpoint, methods=[handler.method])
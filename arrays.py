@@ -0,0 +1,227 @@
+import array
+import attr
+import itertools
+import math
+import operator
+
+from typing import Any, Callable, Iterable, Iterator
+
+from database import RowSet
+
+
+# Códigos de `array.array`: enteros de 64 bits, reales y booleanos (máscaras).
+INT, FLOAT, BOOL = 'q', 'd', 'b'
+
+NUMBER_TYPES = (int, float)
+
+COMPARISONS = (operator.eq, operator.ne, operator.lt, operator.le, operator.gt, operator.ge)
+
+
+def _typecode(values: list[Any]) -> str:
+    """Elige el tipo más compacto que representa todos los valores."""
+    for value in values:
+        if not isinstance(value, NUMBER_TYPES):
+            raise Exception(f'Un array numérico solo admite números, no {type(value).__name__}')
+    if all(type(value) is bool for value in values) and values:
+        return BOOL
+    if all(isinstance(value, int) for value in values):
+        return INT
+    return FLOAT
+
+
+def _pack(typecode: str, values: Iterable[Any]) -> array.array:
+    if typecode != INT:
+        return array.array(typecode, values)
+    values = list(values)
+    try:
+        return array.array(INT, values)
+    except OverflowError:
+        # Enteros que no caben en 64 bits: se pasa a reales
+        return array.array(FLOAT, values)
+
+
+@attr.s(auto_attribs=True, slots=True, eq=False, repr=False)
+class NumArray:
+    """Array numérico compacto guardado en un `array.array`.
+
+    Las operaciones `+ - * /` y las comparaciones se aplican elemento a
+    elemento con otro array de la misma longitud o con un número, en una sola
+    pasada de `map` sobre los buffers (el bucle no pasa por el intérprete).
+    Las comparaciones devuelven una máscara de booleanos, que se puede usar
+    como índice para filtrar: `ventas[ventas > 100]`.
+    """
+    data: array.array
+
+    @classmethod
+    def from_values(cls, values: Iterable[Any]) -> 'NumArray':
+        """Crea el array a partir de números (lista, resultado de consulta, otro array...)."""
+        if isinstance(values, NumArray):
+            return values
+        if isinstance(values, dict) or isinstance(values, str):
+            raise Exception(f'No se puede convertir {type(values).__name__} en un array numérico')
+        values = list(values)
+        return cls(_pack(_typecode(values), values))
+
+    @property
+    def typecode(self) -> str:
+        return self.data.typecode
+
+    def _result_type(self, other_type: str, op: Callable[[Any, Any], Any]) -> str:
+        if op in COMPARISONS:
+            return BOOL
+        if op is operator.truediv or FLOAT in (self.typecode, other_type):
+            return FLOAT
+        return INT
+
+    def _elementwise(self, other: Any, op: Callable[[Any, Any], Any], reverse: bool = False) -> Any:
+        if isinstance(other, NumArray):
+            if len(other.data) != len(self.data):
+                raise Exception(
+                    f'Los arrays deben tener la misma longitud para operar: {len(self.data)} y {len(other.data)}'
+                )
+            other_values, other_type = other.data, other.typecode
+        elif isinstance(other, NUMBER_TYPES):
+            other_values = itertools.repeat(other, len(self.data))
+            other_type = FLOAT if isinstance(other, float) else INT
+        elif isinstance(other, list):
+            return self._elementwise(NumArray.from_values(other), op, reverse)
+        else:
+            return NotImplemented
+        values = map(op, other_values, self.data) if reverse else map(op, self.data, other_values)
+        return NumArray(_pack(self._result_type(other_type, op), values))
+
+    def __add__(self, other: Any) -> Any:
+        return self._elementwise(other, operator.add)
+
+    def __radd__(self, other: Any) -> Any:
+        return self._elementwise(other, operator.add, reverse=True)
+
+    def __sub__(self, other: Any) -> Any:
+        return self._elementwise(other, operator.sub)
+
+    def __rsub__(self, other: Any) -> Any:
+        return self._elementwise(other, operator.sub, reverse=True)
+
+    def __mul__(self, other: Any) -> Any:
+        return self._elementwise(other, operator.mul)
+
+    def __rmul__(self, other: Any) -> Any:
+        return self._elementwise(other, operator.mul, reverse=True)
+
+    def __truediv__(self, other: Any) -> Any:
+        return self._elementwise(other, operator.truediv)
+
+    def __rtruediv__(self, other: Any) -> Any:
+        return self._elementwise(other, operator.truediv, reverse=True)
+
+    def __eq__(self, other: Any) -> Any:
+        return self._elementwise(other, operator.eq)
+
+    def __ne__(self, other: Any) -> Any:
+        return self._elementwise(other, operator.ne)
+
+    def __lt__(self, other: Any) -> Any:
+        return self._elementwise(other, operator.lt)
+
+    def __le__(self, other: Any) -> Any:
+        return self._elementwise(other, operator.le)
+
+    def __gt__(self, other: Any) -> Any:
+        return self._elementwise(other, operator.gt)
+
+    def __ge__(self, other: Any) -> Any:
+        return self._elementwise(other, operator.ge)
+
+    __hash__ = None
+
+    def __neg__(self) -> 'NumArray':
+        typecode = INT if self.typecode == BOOL else self.typecode
+        return NumArray(_pack(typecode, map(operator.neg, self.data)))
+
+    def __pos__(self) -> 'NumArray':
+        return self
+
+    def __bool__(self) -> bool:
+        raise Exception('Un array no es verdadero ni falso: compara sus elementos con sum(), min() o max()')
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __iter__(self) -> Iterator[Any]:
+        if self.typecode == BOOL:
+            return map(bool, self.data)
+        return iter(self.data)
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, NumArray):
+            if index.typecode != BOOL or len(index.data) != len(self.data):
+                raise IndexError('solo se puede indexar un array con una máscara de su misma longitud')
+            return NumArray(array.array(self.typecode, itertools.compress(self.data, index.data)))
+        if not isinstance(index, int) or isinstance(index, bool):
+            raise TypeError(f'los índices de un array deben ser enteros, no {type(index).__name__}')
+        value = self.data[index]
+        return bool(value) if self.typecode == BOOL else value
+
+    def tolist(self) -> list[Any]:
+        """Los elementos como lista de Python (para JSON, por ejemplo)."""
+        return list(self)
+
+    def __str__(self) -> str:
+        return '[' + ', '.join(map(str, self)) + ']'
+
+    def __repr__(self) -> str:
+        return f'array({self})'
+
+
+def _numbers(values: Any) -> Any:
+    """Los números de `values`: el buffer de un array o los elementos de una secuencia."""
+    if isinstance(values, NumArray):
+        return values.data
+    if isinstance(values, (dict, str)) or not isinstance(values, Iterable):
+        raise Exception(f'Se esperaba una lista o un array de números, no {type(values).__name__}')
+    return values
+
+
+def total(values: Any) -> Any:
+    """Suma de los elementos; exacta con enteros y con `math.fsum` con reales."""
+    numbers = _numbers(values)
+    if isinstance(numbers, array.array) and numbers.typecode == FLOAT:
+        return math.fsum(numbers)
+    return sum(numbers)
+
+
+def extreme(name: str, func: Callable[..., Any], values: Any) -> Any:
+    """Mínimo o máximo de los elementos."""
+    numbers = _numbers(values)
+    try:
+        result = func(numbers)
+    except ValueError:
+        raise Exception(f'{name}() no admite una secuencia vacía')
+    return bool(result) if isinstance(values, NumArray) and values.typecode == BOOL else result
+
+
+def mean(values: Any) -> float:
+    """Media aritmética de los elementos."""
+    numbers = _numbers(values)
+    if not isinstance(numbers, array.array):
+        numbers = list(numbers)
+    if not len(numbers):
+        raise Exception('mean() no admite una secuencia vacía')
+    return math.fsum(numbers) / len(numbers)
+
+
+def column(rows: Any, name: str) -> NumArray:
+    """Array con los valores de la columna `name` de un resultado de `db_query` o una lista de filas.
+
+    Sobre un resultado de `db_query` solo se lee esa columna de SQLite.
+    """
+    if isinstance(rows, RowSet):
+        values = list(rows.column(name))
+    else:
+        try:
+            values = [row[name] for row in _numbers(rows)]
+        except (KeyError, TypeError, IndexError):
+            raise Exception(f'Las filas no tienen la columna "{name}"')
+    if None in values:
+        raise Exception(f'La columna "{name}" tiene valores nulos; fíltralos con la opción "where" de db_query')
+    return NumArray.from_values(values)
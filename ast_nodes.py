@@ -8,25 +8,25 @@ def _bool_converter(value: str | bool) -> bool:
         return value.lower() == 'true'
     return bool(value)
 
-@attr.s(auto_attribs=True, hash=True)
+@attr.s(auto_attribs=True, slots=True, frozen=True)
 class Num:
     """Nodo que representa un número."""
     value: int
 
 
-@attr.s(auto_attribs=True, hash=True)
+@attr.s(auto_attribs=True, slots=True, frozen=True)
 class String:
     """Nodo que representa una cadena de texto."""
     value: str
 
 
-@attr.s(auto_attribs=True, hash=True)
+@attr.s(auto_attribs=True, slots=True, frozen=True)
 class Bool:
     """Nodo que representa un Booleano."""
     value: bool = attr.ib(converter=_bool_converter)
 
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True, frozen=True)
 class DictNode:
     """Nodo que representa un diccionario."""
     pairs: dict[Any, Any]
@@ -38,47 +38,57 @@ class DictNode:
         return self.pairs.keys()
 
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True, frozen=True)
+class ListNode:
+    """Nodo que representa una lista literal."""
+    elements: list[Any]
+
+
+@attr.s(auto_attribs=True, slots=True, frozen=True)
 class BinOp:
     """Nodo que representa una operación binaria."""
     left: Any
     op: tuple
     right: Any
 
-    def __attrs_post_init__(self):
-        self.token = self.op
-
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True, frozen=True)
 class UnaryOp:
     """Nodo que representa una operación unaria."""
     op: tuple
     expr: Any
 
-    def __attrs_post_init__(self):
-        self.token = self.op
 
-
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True, frozen=True)
 class Var:
-    """Nodo que representa una variable."""
+    """Nodo que representa una variable.
+
+    `slot` es la posición de la variable en el `Frame` del contexto; la
+    asigna `Resolver` antes de ejecutar (-1 si aún no está resuelta).
+    """
     name: str
+    slot: int = attr.ib(default=-1, eq=False, repr=False)
 
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True, frozen=True)
 class Assign:
     """Nodo que representa una asignación."""
     left: Var
     right: Any
 
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True, frozen=True)
 class FuncCall:
-    """Nodo que representa una llamada a función."""
+    """Nodo que representa una llamada a función.
+
+    `native` lo rellena `Resolver` antes de ejecutar, para no buscar la
+    función por nombre en cada llamada.
+    """
     name: str
     args: list[Any]
+    native: Optional[Any] = attr.ib(default=None, eq=False, repr=False)
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True, frozen=True)
 class IfNode:
     """Nodo que representa una estructura condicional."""
     condition: Any
@@ -86,8 +96,66 @@ class IfNode:
     elif_blocks: Optional[list[tuple[Any, list[Any]]]] = None
     else_block: Optional[list[Any]] = None
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True, frozen=True)
 class IndexAccess:
     """Nodo que representa el acceso a un elemento de un contenedor."""
     container: Any
     index: Any
+
+@attr.s(auto_attribs=True, slots=True, frozen=True)
+class RouteNode:
+    """Nodo que representa una ruta de la API definida en el script.
+
+    `options` es la expresión opcional con las opciones de la ruta. `names`
+    son las variables del cuerpo en el orden de su `Frame` por petición; las
+    rellena `Resolver` antes de ejecutar.
+    """
+    method: str
+    path: str
+    body: list[Any]
+    options: Optional[Any] = None
+    names: tuple[str, ...] = attr.ib(default=(), eq=False, repr=False)
+
+@attr.s(auto_attribs=True, slots=True, frozen=True)
+class ReturnNode:
+    """Nodo que representa la sentencia `return` de una ruta o una función."""
+    value: Any
+
+@attr.s(auto_attribs=True, slots=True, frozen=True)
+class FunctionDef:
+    """Nodo que representa la definición de una función con `def`.
+
+    `memo` es el número máximo de resultados que guarda una función marcada
+    con `memo` (None si no se memoiza). `names` son las variables locales en
+    el orden de su `Frame`, empezando por los parámetros; las rellena
+    `Resolver`.
+    """
+    name: str
+    params: tuple[str, ...]
+    body: list[Any]
+    memo: Optional[int] = None
+    names: tuple[str, ...] = attr.ib(default=(), eq=False, repr=False)
+
+@attr.s(auto_attribs=True, slots=True, frozen=True)
+class ParallelNode:
+    """Nodo que representa un bloque `parallel`.
+
+    Cada tarea es una lista de sentencias que se ejecutan en orden; las
+    tareas se ejecutan a la vez. El parser crea una tarea por sentencia.
+    """
+    tasks: list[list[Any]]
+
+@attr.s(auto_attribs=True, slots=True, frozen=True)
+class GlobalVar:
+    """Nodo que representa la lectura de una variable global dentro de una función.
+
+    Lo crea `Resolver` en lugar de `Var`; `slot` es la posición en el `Frame`
+    de las variables del script.
+    """
+    name: str
+    slot: int = attr.ib(default=-1, eq=False, repr=False)
+
+@attr.s(auto_attribs=True, slots=True, frozen=True, eq=False)
+class Const:
+    """Nodo que representa un valor ya evaluado por el optimizador."""
+    value: Any
@@ -0,0 +1,198 @@
+"""`mercu run-many`: ejecuta muchos scripts en paralelo con un grupo de procesos."""
+
+import argparse
+import attr
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Optional
+
+import output
+from cache import CACHE_DIR, ProgramCache
+from functions import raise_recursion_limit
+from interpreter import Interpreter
+from natives import DEFAULT_REGISTRY, NativeRegistry
+from vm import VM
+
+
+@attr.s(auto_attribs=True)
+class ScriptResult:
+    """Resultado de un script: su salida capturada, su duración y el error, si lo hubo."""
+    filename: str
+    elapsed: float
+    output: str
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+# Estado de cada proceso del grupo: se crea una vez y se reutiliza entre scripts.
+_worker: dict[str, Any] = {}
+
+
+def batch_registry() -> NativeRegistry:
+    """Funciones nativas de los scripts de `run-many`.
+
+    `create_api` se rechaza: levanta un servidor que no termina, y el
+    proceso del grupo se quedaría esperándolo sin pasar al siguiente script.
+    """
+    natives = DEFAULT_REGISTRY.copy()
+
+    @natives.register('create_api', arity=(1, 2))
+    def _create_api(interpreter, title, options=None):
+        raise Exception('create_api() no se puede usar con run-many: el servidor no terminaría nunca')
+
+    return natives
+
+
+def init_worker(engine: str, use_cache: bool, optimize: bool, output_mode: str) -> None:
+    """Prepara el proceso: motor, caché de programas, funciones nativas y modo de salida.
+
+    Cada script se ejecuta con un intérprete y un contexto nuevos (crearlos
+    no cuesta nada, y así las funciones y variables de un script no pasan al
+    siguiente); lo que se reutiliza son los módulos ya importados, la caché
+    y el registro de nativas.
+    """
+    raise_recursion_limit()
+    _worker['engine'] = engine
+    _worker['cache'] = ProgramCache(engine=engine, enabled=use_cache, optimize=optimize)
+    _worker['natives'] = batch_registry()
+    _worker['output'] = output_mode
+
+
+def run_script(filename: str) -> ScriptResult:
+    """Ejecuta un script en el proceso actual capturando su salida."""
+    captured = io.StringIO()
+    error = None
+    engine = _worker['engine']
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(captured), contextlib.redirect_stderr(captured):
+        # La salida se vuelve a crear para que escriba en el buffer de este script
+        output.configure(_worker['output'])
+        runner = None
+        try:
+            program = _worker['cache'].load(filename)
+            natives = _worker['natives']
+            runner = Interpreter(program, natives=natives) if engine == 'ast' else VM(program, natives=natives)
+            if engine == 'ast':
+                runner.interpret()
+            else:
+                runner.run()
+        except BaseException:
+            error = traceback.format_exc()
+        finally:
+            output.flush()
+            if runner is not None and runner.context.database is not None:
+                runner.context.database.close()
+    return ScriptResult(filename, time.perf_counter() - start, captured.getvalue(), error)
+
+
+def expand(patterns: list[str]) -> list[str]:
+    """Convierte ficheros, patrones glob y directorios en la lista de scripts .mer."""
+    filenames = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, dirs, files in os.walk(pattern):
+                dirs[:] = sorted(name for name in dirs if name != CACHE_DIR)
+                filenames.extend(os.path.join(root, name) for name in sorted(files) if name.endswith('.mer'))
+        elif glob.has_magic(pattern):
+            filenames.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            filenames.append(pattern)
+    # Sin repetir y en el orden dado
+    return list(dict.fromkeys(name for name in filenames if name.endswith('.mer')))
+
+
+def print_result(result: ScriptResult) -> None:
+    """Escribe de una vez la salida de un script, con una cabecera."""
+    state = 'ok' if result.ok else 'ERROR'
+    block = [f'==> {result.filename} ({state}, {result.elapsed:.3f} s) <==']
+    if result.output:
+        block.append(result.output.rstrip('\n'))
+    if result.error:
+        block.append(result.error.rstrip('\n'))
+    print('\n'.join(block) + '\n', flush=True)
+
+
+def summary(results: list[ScriptResult], wall_time: float, jobs: int) -> str:
+    """Resumen de tiempos y fallos de todos los scripts."""
+    failures = [result for result in results if not result.ok]
+    busy = sum(result.elapsed for result in results)
+    lines = [
+        f'{len(results)} script(s) en {wall_time:.2f} s con {jobs} proceso(s): '
+        f'{len(results) - len(failures)} correcto(s), {len(failures)} con error',
+        f'Tiempo sumado de los scripts: {busy:.2f} s (concurrencia media {busy / wall_time if wall_time else 0:.1f})',
+    ]
+    slowest = sorted(results, key=lambda result: -result.elapsed)[:5]
+    if slowest:
+        lines.append('Más lentos:')
+        lines.extend(f'  {result.elapsed:>8.3f} s  {result.filename}' for result in slowest)
+    if failures:
+        lines.append('Con error:')
+        lines.extend(f'  {result.filename}: {result.error.strip().splitlines()[-1]}' for result in failures)
+    return '\n'.join(lines)
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    arg_parser = argparse.ArgumentParser(
+        prog='mercu run-many', usage='mercu run-many [opciones] archivo.mer|patrón|directorio ...',
+        description='Ejecuta muchos scripts en paralelo, cada uno con su salida capturada.'
+    )
+    arg_parser.add_argument('patterns', nargs='+', help='ficheros .mer, patrones glob (entre comillas) o directorios')
+    arg_parser.add_argument(
+        '-j', '--jobs', type=int, default=os.cpu_count() or 1,
+        help='número de procesos (por defecto, uno por núcleo)'
+    )
+    arg_parser.add_argument('--engine', choices=('vm', 'ast'), default='vm', help='motor de ejecución')
+    arg_parser.add_argument('--no-cache', action='store_true', help='no usa la caché de programas compilados')
+    arg_parser.add_argument('--no-optimize', action='store_true', help='desactiva el optimizador')
+    arg_parser.add_argument(
+        '--output', choices=output.OUTPUT_MODES, default='plain',
+        help='formato de la salida capturada de cada script (por defecto texto plano)'
+    )
+    arg_parser.add_argument('--quiet', action='store_true', help='solo muestra la salida de los scripts con error')
+    return arg_parser
+
+
+def main(argv: list[str]) -> None:
+    """Punto de entrada de `mercu run-many`."""
+    arg_parser = build_arg_parser()
+    args = arg_parser.parse_args(argv)
+    if args.jobs < 1:
+        arg_parser.error('--jobs debe ser al menos 1')
+    filenames = expand(args.patterns)
+    if not filenames:
+        print('No se ha encontrado ningún script .mer', file=sys.stderr)
+        sys.exit(1)
+
+    jobs = min(args.jobs, len(filenames))
+    results = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=init_worker,
+        initargs=(args.engine, not args.no_cache, not args.no_optimize, args.output),
+    ) as pool:
+        futures = {pool.submit(run_script, filename): filename for filename in filenames}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception:
+                # El proceso murió sin devolver resultado (señal, memoria...)
+                result = ScriptResult(futures[future], 0.0, '', traceback.format_exc())
+            results[result.filename] = result
+            if not args.quiet or not result.ok:
+                print_result(result)
+    wall_time = time.perf_counter() - start
+
+    ordered = [results[filename] for filename in filenames]
+    print(summary(ordered, wall_time, jobs), file=sys.stderr)
+    if any(not result.ok for result in ordered):
+        sys.exit(1)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Benchmark de rendimiento del lexer sobre un script de carga de datos generado."""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import Lexer  # noqa: E402
+from tokens import EOF  # noqa: E402
+
+
+def generate_script(size_mb: float, workload: str = 'inserts') -> str:
+    """Genera un script .mer de `size_mb` megabytes.
+
+    `inserts` produce líneas cortas de db_insert (muchos tokens pequeños) y
+    `strings` asignaciones de literales largos con escapes.
+    """
+    target = int(size_mb * 1024 * 1024)
+    lines = ['connect_db("bench.db")']
+    size = 0
+    i = 0
+    while size < target:
+        if workload == 'strings':
+            payload = 'lorem ipsum \\"dolor\\" sit amet ' * 64
+            line = f'payload_{i % 100} = "{payload}"'
+        else:
+            line = (
+                f'db_insert("users", {{"id": {i}, "name": "user \\"{i}\\"", '
+                f'"age": {i % 90}, "active": {"true" if i % 2 else "false"}}})'
+            )
+        lines.append(line)
+        size += len(line) + 1
+        i += 1
+    return '\n'.join(lines)
+
+
+def lex_all(text: str) -> int:
+    """Tokeniza el texto completo y devuelve el número de tokens."""
+    lexer = Lexer(text)
+    count = 0
+    while lexer.get_next_token()[0] != EOF:
+        count += 1
+    return count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--size', type=float, default=4.0, help='tamaño del script en MB')
+    arg_parser.add_argument('--workload', choices=('inserts', 'strings'), default='inserts')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='repeticiones (se toma la mejor)')
+    arg_parser.add_argument('--target', type=float, default=0.0, help='throughput mínimo exigido en MB/s')
+    args = arg_parser.parse_args()
+
+    text = generate_script(args.size, args.workload)
+    megabytes = len(text.encode('utf-8')) / (1024 * 1024)
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        count = lex_all(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    throughput = megabytes / best
+    print(f'{args.workload}: {megabytes:.2f} MB, {count} tokens, {best:.3f} s -> {throughput:.2f} MB/s')
+    if args.target and throughput < args.target:
+        print(f'Por debajo del objetivo de {args.target:.2f} MB/s')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
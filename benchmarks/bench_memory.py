@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Benchmark de memoria: tamaño del AST (y de los tokens) de un script grande generado.
+
+Cada medida se compara con la representación anterior: nodos attrs sin
+slots, con `__dict__` por instancia (y el atributo `token` repetido de
+`BinOp`/`UnaryOp`), y tokens con el tipo como cadena, una tupla nueva por
+token como en el lexer original. Para eso el árbol analizado se copia en
+clases equivalentes generadas aquí mismo.
+"""
+
+import argparse
+import attr
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ast_nodes  # noqa: E402
+from lexer import Lexer  # noqa: E402
+from parser import Parser  # noqa: E402
+from optimizer import count_nodes  # noqa: E402
+from tokens import token_name  # noqa: E402
+
+
+class _RepeatedToken:
+    """`BinOp` y `UnaryOp` guardaban además una copia de `op` en `token`."""
+
+    def __attrs_post_init__(self):
+        self.token = self.op
+
+
+def _legacy_class(cls: type) -> type:
+    """Copia de un nodo como clase attrs sin slots ni `frozen`, como eran antes."""
+    names = [field.name for field in attr.fields(cls)]
+    bases = (_RepeatedToken,) if cls in (ast_nodes.BinOp, ast_nodes.UnaryOp) else (object,)
+    # hash=True como tenían Num, String y Bool: los nodos pueden ser claves de un diccionario
+    return attr.make_class(cls.__name__, names, bases=bases, hash=True)
+
+
+LEGACY_CLASSES = {
+    cls: _legacy_class(cls) for cls in vars(ast_nodes).values() if isinstance(cls, type) and attr.has(cls)
+}
+
+
+def legacy_token(token: tuple) -> tuple:
+    """Token con el tipo como cadena, como los devolvía el lexer original."""
+    return (token_name(token[0]), token[1])
+
+
+def to_legacy(value: Any) -> Any:
+    """Copia un árbol (o parte de él) con las clases de nodo anteriores."""
+    legacy = LEGACY_CLASSES.get(type(value))
+    if legacy is not None:
+        fields = {}
+        for field in attr.fields(type(value)):
+            item = getattr(value, field.name)
+            fields[field.name] = legacy_token(item) if field.name == 'op' else to_legacy(item)
+        return legacy(**fields)
+    if isinstance(value, list):
+        return [to_legacy(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(to_legacy(item) for item in value)
+    if isinstance(value, dict):
+        return {to_legacy(key): to_legacy(item) for key, item in value.items()}
+    return value
+
+
+def generate_script(statements: int) -> str:
+    """Genera un script con asignaciones, expresiones, diccionarios y condicionales."""
+    lines = []
+    for i in range(statements):
+        kind = i % 4
+        if kind == 0:
+            lines.append(f'v{i % 50} = {i} + x * (y - {i % 7})')
+        elif kind == 1:
+            lines.append(f'row = {{"id": {i}, "name": "user {i}", "score": v{i % 50} * 2}}')
+        elif kind == 2:
+            lines.append(f'if row["score"] > {i}: {{ total = total + 1 }} else: {{ total = total - 1 }}')
+        else:
+            lines.append(f'print("fila ", row["id"], not flag)')
+    return '\n'.join(lines)
+
+
+def measure(source: str, what: str, legacy: bool = False) -> tuple[int, int, float]:
+    """Devuelve (bytes retenidos, nodos/tokens, segundos) para el AST o los tokens.
+
+    Con `legacy` se mide la representación anterior; el tiempo incluye
+    entonces la copia y no es comparable.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    if what == 'tokens':
+        result = list(Lexer(source).tokens())
+        count = len(result)
+        if legacy:
+            result = [legacy_token(token) for token in result]
+    else:
+        result = Parser(Lexer(source)).parse()
+        count = count_nodes(result)
+        if legacy:
+            result = to_legacy(result)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size, count, elapsed
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--statements', type=int, default=100_000, help='número de sentencias generadas')
+    args = arg_parser.parse_args()
+
+    source = generate_script(args.statements)
+    for what in ('tokens', 'ast'):
+        before, count, _ = measure(source, what, legacy=True)
+        after, _, elapsed = measure(source, what)
+        print(f'{what}: {count} elementos')
+        print(f'  antes:   {before / (1024 * 1024):7.1f} MiB retenidos, {before / count:6.1f} bytes/elemento')
+        print(
+            f'  ahora:   {after / (1024 * 1024):7.1f} MiB retenidos, {after / count:6.1f} bytes/elemento, '
+            f'{elapsed:.2f} s'
+        )
+        print(f'  ahorro:  {100 * (1 - after / before):.0f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""Suite de benchmarks del lexer, el parser, los dos motores y las funciones de base de datos.
+
+Cada carga de trabajo genera un script de tamaño proporcional a `--scale` y
+se mide por fases: `lex` (tokenizar), `parse` (construir el AST),
+`interpret` (ejecutar el AST ya analizado) y `vm` (ejecutar el bytecode ya
+compilado). La carga `db` llama directamente a las funciones nativas de
+SQLite sobre un fichero temporal. De cada fase se guarda la mejor de
+`--repeat` ejecuciones.
+
+Los resultados se escriben en JSON y, si existe, se comparan con una línea
+base: el proceso termina con código 1 si alguna fase es más lenta que la
+base en más de `--threshold` por ciento.
+
+    python benchmarks/suite.py --save-baseline        # guarda la línea base
+    python benchmarks/suite.py --output resultados.json  # compara con ella
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import output  # noqa: E402
+from compiler import Compiler  # noqa: E402
+from interpreter import Interpreter  # noqa: E402
+from lexer import Lexer  # noqa: E402
+from parser import Parser  # noqa: E402
+from tokens import EOF  # noqa: E402
+from version import __version__  # noqa: E402
+from vm import VM  # noqa: E402
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Sentencias de cada carga con `--scale 1`.
+BASE_STATEMENTS = 20_000
+# Niveles de paréntesis de cada expresión de la carga `nesting`: lo bastante
+# hondo para medir la recursión del parser sin acercarse al límite de Python.
+NESTING_DEPTH = 40
+ELIF_BRANCHES = 50
+
+
+def literals_script(statements: int, db_path: str) -> str:
+    """Asignaciones de números, cadenas con escapes, booleanos y diccionarios literales."""
+    lines = []
+    for i in range(statements):
+        kind = i % 4
+        if kind == 0:
+            lines.append(f'n{i % 100} = {i}')
+        elif kind == 1:
+            lines.append(f's{i % 100} = "cadena \\"{i}\\" con texto de relleno"')
+        elif kind == 2:
+            lines.append(f'b{i % 100} = {"true" if i % 2 else "false"}')
+        else:
+            lines.append(f'd{i % 100} = {{"id": {i}, "nombre": "usuario {i}", "activo": true}}')
+    return '\n'.join(lines)
+
+
+def nesting_script(statements: int, db_path: str) -> str:
+    """Expresiones aritméticas y lógicas con `NESTING_DEPTH` niveles de paréntesis."""
+    lines = ['x = 3']
+    for i in range(statements // NESTING_DEPTH):
+        expression = 'x'
+        for depth in range(NESTING_DEPTH):
+            expression = f'({expression} + {depth % 7}) * 1' if depth % 2 else f'({expression} - x)'
+        lines.append(f'v{i % 10} = {expression}')
+        lines.append(f'ok = x > {i} and not x < 1 or x == {i % 5}')
+    return '\n'.join(lines)
+
+
+def if_chain_script(statements: int, db_path: str) -> str:
+    """Cadenas largas de `if`/`elif`/`else` en las que casi siempre gana la última rama."""
+    lines = ['total = 0']
+    for i in range(statements // ELIF_BRANCHES):
+        lines.append(f'x = {i % (ELIF_BRANCHES + 1)}')
+        lines.append('if x == 0: { total = total + 1 }')
+        for branch in range(1, ELIF_BRANCHES):
+            lines.append(f'elif x == {branch}: {{ total = total + {branch} }}')
+        lines.append('else: { total = total - 1 }')
+    return '\n'.join(lines)
+
+
+def dict_index_script(statements: int, db_path: str) -> str:
+    """Acceso intensivo a diccionarios anidados."""
+    lines = [
+        'config = {"db": {"host": "localhost", "puerto": 5432, "opciones": {"ssl": true, "reintentos": 3}}, '
+        '"api": {"titulo": "Bench", "rutas": {"usuarios": "/usuarios", "salud": "/"}}}',
+        'total = 0',
+    ]
+    for i in range(statements):
+        kind = i % 3
+        if kind == 0:
+            lines.append('total = total + config["db"]["puerto"] + config["db"]["opciones"]["reintentos"]')
+        elif kind == 1:
+            lines.append('ruta = config["api"]["rutas"]["usuarios"]')
+        else:
+            lines.append(f'fila = {{"id": {i}, "datos": config["db"]}}["datos"]["host"]')
+    return '\n'.join(lines)
+
+
+def functions_script(statements: int, db_path: str) -> str:
+    """Llamadas repetidas a funciones del script, con y sin `memo`."""
+    lines = [
+        'tasa = 3',
+        'def precio(base, unidades): { total = base * unidades\n return total + total * tasa }',
+        'memo(64) def tramo(x): { if x > 50: { return 3 } elif x > 20: { return 2 }\n return 1 }',
+        'total = 0',
+    ]
+    for i in range(statements):
+        if i % 2:
+            lines.append(f'total = total + precio({i % 100}, {i % 7})')
+        else:
+            lines.append(f'total = total + tramo({i % 64})')
+    return '\n'.join(lines)
+
+
+def db_script(statements: int, db_path: str) -> str:
+    """`db_insert` fila a fila sobre un fichero SQLite temporal."""
+    lines = [
+        f'connect_db("{db_path}")',
+        'db_create_table("usuarios", {"id": "INTEGER", "nombre": "TEXT", "edad": "INTEGER"})',
+    ]
+    for i in range(statements // 20):
+        lines.append(f'db_insert("usuarios", {{"id": {i}, "nombre": "usuario {i}", "edad": {i % 90}}})')
+    return '\n'.join(lines)
+
+
+WORKLOADS = {
+    'literals': literals_script,
+    'nesting': nesting_script,
+    'if_chain': if_chain_script,
+    'dict_index': dict_index_script,
+    'functions': functions_script,
+    'db_insert': db_script,
+}
+PHASES = ('lex', 'parse', 'interpret', 'vm')
+
+
+def lex_all(source: str) -> int:
+    """Tokeniza el texto completo y devuelve el número de tokens."""
+    lexer = Lexer(source)
+    count = 0
+    while lexer.get_next_token()[0] != EOF:
+        count += 1
+    return count
+
+
+def timed(func, *args) -> float:
+    """Segundos que tarda `func(*args)`, con el recolector de basura parado."""
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        func(*args)
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def run_workload(name: str, statements: int, repeat: int, phases: tuple[str, ...], workdir: str) -> dict[str, dict]:
+    """Mide cada fase de una carga y devuelve `{"carga.fase": resultado}`."""
+    results = {}
+    best = {phase: None for phase in phases}
+    details = {}
+    for attempt in range(repeat):
+        # Cada repetición parte de una base de datos vacía
+        db_path = os.path.join(workdir, f'{name}-{attempt}.db')
+        source = WORKLOADS[name](statements, db_path)
+        details = {'bytes': len(source.encode('utf-8')), 'lines': source.count('\n') + 1}
+        tree = Parser(Lexer(source)).parse()
+        times = {}
+        if 'lex' in phases:
+            times['lex'] = timed(lex_all, source)
+        if 'parse' in phases:
+            times['parse'] = timed(lambda: Parser(Lexer(source)).parse())
+        if 'interpret' in phases:
+            times['interpret'] = timed(Interpreter(tree).interpret)
+        if 'vm' in phases:
+            if name == 'db_insert':
+                source = WORKLOADS[name](statements, db_path + '-vm')
+                tree = Parser(Lexer(source)).parse()
+            code = Compiler().compile(tree)
+            times['vm'] = timed(VM(code).run)
+        for phase, elapsed in times.items():
+            if best[phase] is None or elapsed < best[phase]:
+                best[phase] = elapsed
+    for phase, elapsed in best.items():
+        results[f'{name}.{phase}'] = {'seconds': elapsed, **details}
+    return results
+
+
+def run_db_builtins(statements: int, repeat: int, workdir: str) -> dict[str, dict]:
+    """Mide `db_insert`, `db_insert_many` y el recorrido de `db_query` sin pasar por el lenguaje."""
+    rows = [{'id': i, 'nombre': f'usuario {i}', 'edad': i % 90} for i in range(statements)]
+    single = rows[:max(1, statements // 20)]
+    best = {}
+    for attempt in range(repeat):
+        interpreter = Interpreter([])
+        interpreter.connect_db(os.path.join(workdir, f'builtins-{attempt}.db'))
+        interpreter.db_create_table('usuarios', {'id': 'INTEGER', 'nombre': 'TEXT', 'edad': 'INTEGER'})
+        times = {
+            'db_insert': timed(lambda: [interpreter.db_insert('usuarios', row) for row in single]),
+            'db_insert_many': timed(interpreter.db_insert_many, 'usuarios', rows),
+            'db_query': timed(lambda: sum(1 for _ in interpreter.db_query('usuarios', {'where': {'edad >=': 18}}))),
+        }
+        interpreter.context.database.close()
+        for phase, elapsed in times.items():
+            if phase not in best or elapsed < best[phase]:
+                best[phase] = elapsed
+    counts = {'db_insert': len(single), 'db_insert_many': len(rows), 'db_query': len(rows) + len(single)}
+    return {f'db.{phase}': {'seconds': elapsed, 'rows': counts[phase]} for phase, elapsed in best.items()}
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], threshold: float) -> list[str]:
+    """Imprime la comparación con la línea base y devuelve las medidas que han empeorado."""
+    regressions = []
+    print(f'\n{"medida":<24} {"base s":>10} {"actual s":>10} {"cambio":>9}')
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            print(f'{key:<24} {"-":>10} {result["seconds"]:>10.4f} {"nueva":>9}')
+            continue
+        change = (result['seconds'] / previous['seconds'] - 1) * 100 if previous['seconds'] else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(key)
+            flag = '  <- regresión'
+        print(f'{key:<24} {previous["seconds"]:>10.4f} {result["seconds"]:>10.4f} {change:>+8.1f}%{flag}')
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--scale', type=float, default=1.0, help='multiplica el tamaño de las cargas')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='repeticiones de cada medida (se toma la mejor)')
+    arg_parser.add_argument(
+        '--workloads', default=','.join([*WORKLOADS, 'db']),
+        help='cargas a ejecutar, separadas por comas (por defecto todas)'
+    )
+    arg_parser.add_argument(
+        '--phases', default=','.join(PHASES), help='fases a medir de cada carga, separadas por comas'
+    )
+    arg_parser.add_argument('--output', metavar='FICHERO', help='guarda los resultados en JSON')
+    arg_parser.add_argument('--baseline', metavar='FICHERO', default=DEFAULT_BASELINE, help='línea base con la que comparar')
+    arg_parser.add_argument('--save-baseline', action='store_true', help='guarda los resultados como nueva línea base')
+    arg_parser.add_argument(
+        '--threshold', type=float, default=10.0,
+        help='porcentaje de empeoramiento a partir del cual una medida cuenta como regresión'
+    )
+    args = arg_parser.parse_args()
+
+    workloads = [name.strip() for name in args.workloads.split(',') if name.strip()]
+    phases = tuple(phase.strip() for phase in args.phases.split(',') if phase.strip())
+    unknown = [name for name in workloads if name not in WORKLOADS and name != 'db']
+    unknown += [phase for phase in phases if phase not in PHASES]
+    if unknown:
+        arg_parser.error(f'cargas o fases desconocidas: {", ".join(unknown)}')
+
+    statements = max(1, int(BASE_STATEMENTS * args.scale))
+    results = {}
+    # Los mensajes de las funciones nativas no forman parte de la medida
+    output.configure('plain')
+    with tempfile.TemporaryDirectory(prefix='mercu-bench-') as workdir:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for name in workloads:
+                if name == 'db':
+                    measured = run_db_builtins(statements, args.repeat, workdir)
+                else:
+                    measured = run_workload(name, statements, args.repeat, phases, workdir)
+                results.update(measured)
+                for key, result in measured.items():
+                    print(f'{key:<24} {result["seconds"]:.4f} s', file=sys.stderr)
+
+    report = {
+        'version': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': args.scale,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        print(f'Línea base guardada en {args.baseline}')
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f'No hay línea base en {args.baseline}; guárdala con --save-baseline')
+        return
+    with open(args.baseline, 'r', encoding='utf-8') as file:
+        baseline = json.load(file)
+    if baseline.get('scale') != args.scale:
+        print(f'Aviso: la línea base se midió con --scale {baseline.get("scale")}')
+    regressions = compare(results, baseline['results'], args.threshold)
+    if regressions:
+        print(f'\n{len(regressions)} medida(s) más de un {args.threshold:g}% por encima de la línea base')
+        sys.exit(1)
+    print(f'\nSin regresiones por encima del {args.threshold:g}%')
+
+
+if __name__ == '__main__':
+    main()
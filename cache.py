@@ -0,0 +1,171 @@
+import attr
+import hashlib
+import os
+import pickle
+import struct
+import sys
+
+from collections import OrderedDict
+from typing import Any, Optional
+
+from lexer import Lexer
+from parser import Parser
+from compiler import Compiler
+from optimizer import Optimizer, OptimizerStats
+from version import __version__
+
+
+CACHE_DIR = '__mercucache__'
+
+# Se incrementa cada vez que cambia la forma serializada del AST o del bytecode.
+CACHE_FORMAT = 11
+
+# Cabecera: magic, tamaño del fuente, mtime del fuente (ns) y sha256 del fuente.
+HEADER = struct.Struct('<16sQQ32s')
+
+
+def cache_magic(variant: str) -> bytes:
+    """Identificador de la versión del intérprete, del formato y de la variante."""
+    key = f'{__version__}:{CACHE_FORMAT}:{variant}:{sys.version_info[0]}.{sys.version_info[1]}'
+    return hashlib.sha256(key.encode('utf-8')).digest()[:16]
+
+
+def compile_source(source: str, engine: str, optimizer: Optional[Optimizer] = None) -> Any:
+    """Analiza (y optimiza) el código fuente y devuelve el programa listo para el motor."""
+    tree = Parser(Lexer(source)).parse()
+    if optimizer is not None:
+        tree = optimizer.optimize(tree)
+    if engine == 'ast':
+        return tree
+    return Compiler().compile(tree)
+
+
+@attr.s(auto_attribs=True)
+class ProgramCache:
+    """Caché en disco de programas compilados, al estilo de los .pyc de Python.
+
+    Cada fichero `dir/script.mer` se guarda en
+    `dir/__mercucache__/script.mercu-<versión>.<variante>.cache`. La validación
+    rápida compara tamaño y mtime del fuente con la cabecera; si no coinciden
+    se compara el hash del contenido antes de recompilar.
+
+    Con `memory_size` mayor que cero se guardan además en memoria los últimos
+    programas cargados (LRU), para un proceso que ejecuta muchos scripts, como
+    el servidor residente de `daemon.py`.
+    """
+    engine: str = 'vm'
+    enabled: bool = True
+    optimize: bool = True
+    stats: Optional[OptimizerStats] = None
+    memory_size: int = 0
+
+    def __attrs_post_init__(self):
+        self._memory = OrderedDict()
+
+    def _remember(self, key: tuple, load: Any) -> Any:
+        """Devuelve el programa de `key` desde la memoria o lo obtiene con `load()`."""
+        if not self.memory_size:
+            return load()
+        program = self._memory.get(key)
+        if program is not None:
+            self._memory.move_to_end(key)
+            return program
+        program = self._memory[key] = load()
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+        return program
+
+    @property
+    def variant(self) -> str:
+        """Motor y opciones de compilación que distinguen un fichero de caché."""
+        return self.engine if self.optimize else f'{self.engine}-noopt'
+
+    def compile(self, source: str) -> Any:
+        """Compila `source` con las opciones de esta caché, guardando las estadísticas."""
+        optimizer = Optimizer() if self.optimize else None
+        program = compile_source(source, self.engine, optimizer)
+        self.stats = optimizer.stats if optimizer else None
+        return program
+
+    def cache_path(self, path: str) -> str:
+        """Devuelve la ruta del fichero de caché asociado a `path`."""
+        directory, filename = os.path.split(os.path.abspath(path))
+        stem = os.path.splitext(filename)[0]
+        return os.path.join(directory, CACHE_DIR, f'{stem}.mercu-{__version__}.{self.variant}.cache')
+
+    def load_source(self, source: str) -> Any:
+        """Compila código fuente sin fichero, reutilizando la memoria si ya se compiló."""
+        digest = hashlib.sha256(source.encode('utf-8')).digest()
+        return self._remember(('<source>', digest), lambda: self.compile(source))
+
+    def load(self, path: str) -> Any:
+        """Devuelve el programa de `path`, desde la caché si sigue siendo válida."""
+        if self.memory_size:
+            stat = os.stat(path)
+            key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+            return self._remember(key, lambda: self._load(path))
+        return self._load(path)
+
+    def _load(self, path: str) -> Any:
+        if not self.enabled:
+            with open(path, 'rb') as file:
+                return self.compile(file.read().decode('utf-8'))
+
+        stat = os.stat(path)
+        cache_path = self.cache_path(path)
+        header, payload = self._read(cache_path)
+        if header is not None and header[1:3] == (stat.st_size, stat.st_mtime_ns):
+            return pickle.loads(payload)
+
+        with open(path, 'rb') as file:
+            raw = file.read()
+        digest = hashlib.sha256(raw).digest()
+        if header is not None and header[3] == digest:
+            # Mismo contenido con otro mtime (checkout, touch...): se reutiliza
+            program = pickle.loads(payload)
+        else:
+            program = self.compile(raw.decode('utf-8'))
+            payload = pickle.dumps(program, protocol=pickle.HIGHEST_PROTOCOL)
+        self._write(cache_path, stat, digest, payload)
+        return program
+
+    def compile_directory(self, directory: str) -> int:
+        """Precompila todos los .mer de `directory` (recursivo) y devuelve cuántos son."""
+        count = 0
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [name for name in dirs if name != CACHE_DIR]
+            for filename in sorted(files):
+                if filename.endswith('.mer'):
+                    self.load(os.path.join(root, filename))
+                    count += 1
+        return count
+
+    def _read(self, cache_path: str) -> tuple[Optional[tuple], Optional[bytes]]:
+        """Lee la cabecera y el contenido de un fichero de caché, si es de esta versión."""
+        try:
+            with open(cache_path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None, None
+        if len(data) < HEADER.size:
+            return None, None
+        header = HEADER.unpack_from(data)
+        if header[0] != cache_magic(self.variant):
+            return None, None
+        return header, data[HEADER.size:]
+
+    def _write(self, cache_path: str, stat: os.stat_result, digest: bytes, payload: bytes) -> None:
+        """Escribe la caché de forma atómica; los errores de escritura se ignoran."""
+        header = HEADER.pack(cache_magic(self.variant), stat.st_size, stat.st_mtime_ns, digest)
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(tmp_path, 'wb') as file:
+                file.write(header)
+                file.write(payload)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
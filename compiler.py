@@ -0,0 +1,330 @@
+import attr
+import json
+
+from typing import Any, Iterable, Iterator, Optional
+
+from tokens import (
+    PLUS, MINUS, MUL, DIV, AND, OR, EQUALS, NOT_EQUALS, LESS_THAN, GREATER_THAN,
+    LESS_EQUAL, GREATER_EQUAL, NOT, token_name
+)
+from ast_nodes import (
+    Num, BinOp, UnaryOp, Assign, Var, FuncCall, String, DictNode, ListNode, Bool,
+    IfNode, IndexAccess, Const, RouteNode, ReturnNode, FunctionDef, ParallelNode
+)
+from functions import local_names
+from routes import referenced_tables
+from opcodes import (
+    LOAD_CONST, LOAD_NAME, STORE_NAME, BINARY_OP, UNARY_OP, CALL_FUNCTION,
+    POP_TOP, INDEX, BUILD_DICT, LOAD_JSON, JUMP, POP_JUMP_IF_FALSE, MAKE_ROUTE,
+    RETURN_VALUE, BUILD_LIST, LOAD_GLOBAL, PARALLEL, OPCODE_NAMES
+)
+
+
+BINARY_OP_INDEX = {
+    PLUS: 0,
+    MINUS: 1,
+    MUL: 2,
+    DIV: 3,
+    AND: 4,
+    OR: 5,
+    EQUALS: 6,
+    NOT_EQUALS: 7,
+    LESS_THAN: 8,
+    GREATER_THAN: 9,
+    LESS_EQUAL: 10,
+    GREATER_EQUAL: 11,
+}
+
+UNARY_OP_INDEX = {
+    PLUS: 0,
+    MINUS: 1,
+    NOT: 2,
+}
+
+
+@attr.s(auto_attribs=True)
+class Code:
+    """Programa compilado: bytecode plano más sus tablas de constantes, nombres y llamadas.
+
+    `functions` son las funciones definidas con `def` en el programa; la VM
+    las registra al enlazarlo.
+    """
+    instructions: list[int] = attr.ib(factory=list)
+    constants: list[Any] = attr.ib(factory=list)
+    names: list[str] = attr.ib(factory=list)
+    calls: list[tuple[str, int]] = attr.ib(factory=list)
+    functions: list['CompiledFunction'] = attr.ib(factory=list)
+    runs: Optional[list[int]] = attr.ib(default=None, init=False, eq=False, repr=False)
+
+    def straight_runs(self) -> list[int]:
+        """Instrucciones que se ejecutan seguidas desde cada una (posición `pc // 2`).
+
+        Una racha termina en el siguiente salto o `RETURN_VALUE`, incluido.
+        La VM la usa para contar los pasos de una ejecución con límites al
+        empezar y en cada salto, en lugar de instrucción a instrucción.
+        """
+        if self.runs is None:
+            code = self.instructions
+            runs = [0] * (len(code) >> 1)
+            count = 0
+            for pc in range(len(code) - 2, -1, -2):
+                count = 1 if code[pc] in (JUMP, POP_JUMP_IF_FALSE, RETURN_VALUE) else count + 1
+                runs[pc >> 1] = count
+            self.runs = runs
+        return self.runs
+
+    def disassemble(self) -> str:
+        """Devuelve una representación legible del bytecode."""
+        lines = []
+        code = self.instructions
+        for pc in range(0, len(code), 2):
+            op, arg = code[pc], code[pc + 1]
+            detail = ''
+            if op in (LOAD_CONST, LOAD_JSON):
+                detail = f'({self.constants[arg]!r})'
+            elif op in (LOAD_NAME, STORE_NAME, LOAD_GLOBAL):
+                detail = f'({self.names[arg]})'
+            elif op == CALL_FUNCTION:
+                detail = '(%s/%d)' % self.calls[arg]
+            elif op == MAKE_ROUTE:
+                route = self.constants[arg]
+                detail = f'({route.method} {route.path})'
+            elif op == PARALLEL:
+                detail = f'({len(self.constants[arg].codes)} tareas)'
+            lines.append(f'{pc:>6} {OPCODE_NAMES[op]:<18} {arg} {detail}'.rstrip())
+            if op == MAKE_ROUTE:
+                lines.extend('    ' + line for line in route.code.disassemble().splitlines())
+            elif op == PARALLEL:
+                for position, task in enumerate(self.constants[arg].codes, 1):
+                    lines.append(f'    tarea {position}')
+                    lines.extend('        ' + line for line in task.disassemble().splitlines())
+        for function in self.functions:
+            lines.append(f'def {function.name}({", ".join(function.params)})')
+            lines.extend('    ' + line for line in function.code.disassemble().splitlines())
+        return '\n'.join(lines)
+
+
+@attr.s(auto_attribs=True)
+class CompiledRoute:
+    """Ruta de la API con su cuerpo ya compilado; es la constante de MAKE_ROUTE.
+
+    `tables` son las tablas que consulta el cuerpo (ver `referenced_tables`).
+    """
+    method: str
+    path: str
+    code: Code
+    tables: Optional[tuple[str, ...]] = None
+
+
+@attr.s(auto_attribs=True)
+class CompiledFunction:
+    """Función definida con `def` con su cuerpo ya compilado.
+
+    `names` son sus variables locales en el orden de su `Frame`, empezando
+    por los parámetros, y `memo` el tamaño de su caché de resultados (None
+    si no se memoiza).
+    """
+    name: str
+    params: tuple[str, ...]
+    names: tuple[str, ...]
+    code: Code
+    memo: Optional[int] = None
+
+
+@attr.s(auto_attribs=True)
+class CompiledParallel:
+    """Bloque parallel con cada tarea compilada por separado; es la constante de PARALLEL."""
+    codes: list[Code]
+
+
+@attr.s(auto_attribs=True)
+class Compiler:
+    """Compilador que traduce la lista de nodos del AST a bytecode para la VM.
+
+    Al compilar el cuerpo de una función, `scope` son sus variables locales:
+    el resto se leen con LOAD_GLOBAL.
+    """
+    code: Code = attr.ib(factory=Code)
+    scope: Optional[frozenset[str]] = None
+
+    def __attrs_post_init__(self):
+        """Inicializa los índices de las tablas de constantes, nombres y llamadas."""
+        self._constant_index = {}
+        self._name_index = {}
+        self._call_index = {}
+
+    def error(self, node: Any) -> None:
+        """Lanza una excepción de compilación."""
+        raise Exception(f'No se puede compilar el nodo {type(node).__name__}')
+
+    def emit(self, op: int, arg: int = 0) -> int:
+        """Añade una instrucción y devuelve su posición."""
+        self.code.instructions.append(op)
+        self.code.instructions.append(arg)
+        return len(self.code.instructions) - 2
+
+    def patch(self, position: int, target: int) -> None:
+        """Corrige el destino de un salto ya emitido."""
+        self.code.instructions[position + 1] = target
+
+    def add_constant(self, value: Any) -> int:
+        """Registra una constante y devuelve su índice (sin duplicados)."""
+        key = (type(value), value)
+        try:
+            index = self._constant_index.get(key)
+        except TypeError:
+            # Diccionarios y listas constantes: no se deduplican
+            self.code.constants.append(value)
+            return len(self.code.constants) - 1
+        if index is None:
+            index = len(self.code.constants)
+            self.code.constants.append(value)
+            self._constant_index[key] = index
+        return index
+
+    def add_name(self, name: str) -> int:
+        """Registra un nombre de variable y devuelve su índice."""
+        index = self._name_index.get(name)
+        if index is None:
+            index = len(self.code.names)
+            self.code.names.append(name)
+            self._name_index[name] = index
+        return index
+
+    def add_call(self, name: str, argc: int) -> int:
+        """Registra una llamada (nombre, número de argumentos) y devuelve su índice."""
+        key = (name, argc)
+        index = self._call_index.get(key)
+        if index is None:
+            index = len(self.code.calls)
+            self.code.calls.append(key)
+            self._call_index[key] = index
+        return index
+
+    def compile(self, tree: list[Any]) -> Code:
+        """Compila una lista de sentencias y devuelve el programa resultante."""
+        self.compile_block(tree)
+        return self.code
+
+    @classmethod
+    def compile_stream(cls, statements: Iterable[Any]) -> Iterator[Code]:
+        """Compila cada sentencia de primer nivel en un programa independiente."""
+        for statement in statements:
+            yield cls().compile([statement])
+
+    def compile_block(self, block: list[Any]) -> None:
+        """Compila un bloque de sentencias."""
+        for statement in block:
+            self.compile_statement(statement)
+
+    def compile_statement(self, node: Any) -> None:
+        """Compila una sentencia; su valor, si lo tiene, se descarta."""
+        if isinstance(node, Assign):
+            self.compile_expr(node.right)
+            self.emit(STORE_NAME, self.add_name(node.left.name))
+        elif isinstance(node, IfNode):
+            self.compile_if(node)
+        elif isinstance(node, RouteNode):
+            # El cuerpo se compila una sola vez y se ejecuta en cada petición
+            route = CompiledRoute(
+                node.method, node.path, Compiler().compile(node.body), referenced_tables(node.body)
+            )
+            if node.options is None:
+                self.emit(LOAD_CONST, self.add_constant(None))
+            else:
+                self.compile_expr(node.options)
+            self.emit(MAKE_ROUTE, self.add_constant(route))
+        elif isinstance(node, FunctionDef):
+            names = local_names(node.params, node.body)
+            code = Compiler(scope=frozenset(names)).compile(node.body)
+            self.code.functions.append(CompiledFunction(node.name, node.params, names, code, node.memo))
+        elif isinstance(node, ParallelNode):
+            # Las tareas comparten las variables del bloque, así que se
+            # compilan con el mismo ámbito
+            codes = [Compiler(scope=self.scope).compile(task) for task in node.tasks]
+            self.emit(PARALLEL, self.add_constant(CompiledParallel(codes)))
+        elif isinstance(node, ReturnNode):
+            self.compile_expr(node.value)
+            self.emit(RETURN_VALUE)
+        else:
+            self.compile_expr(node)
+            self.emit(POP_TOP)
+
+    def compile_if(self, node: IfNode) -> None:
+        """Compila un if/elif/else como una cadena de saltos condicionales."""
+        branches = [(node.condition, node.if_block)] + list(node.elif_blocks or [])
+        end_jumps = []
+        for i, (condition, block) in enumerate(branches):
+            self.compile_expr(condition)
+            next_branch = self.emit(POP_JUMP_IF_FALSE)
+            self.compile_block(block)
+            if i < len(branches) - 1 or node.else_block is not None:
+                end_jumps.append(self.emit(JUMP))
+            self.patch(next_branch, len(self.code.instructions))
+        if node.else_block is not None:
+            self.compile_block(node.else_block)
+        end = len(self.code.instructions)
+        for position in end_jumps:
+            self.patch(position, end)
+
+    def compile_expr(self, node: Any) -> None:
+        """Compila una expresión que deja exactamente un valor en la pila."""
+        node_type = type(node)
+        if node_type is Const or node_type is Num or node_type is Bool:
+            self.emit(LOAD_CONST, self.add_constant(node.value))
+        elif node_type is String:
+            self.compile_string(node)
+        elif node_type is Var:
+            if self.scope is not None and node.name not in self.scope:
+                self.emit(LOAD_GLOBAL, self.add_name(node.name))
+            else:
+                self.emit(LOAD_NAME, self.add_name(node.name))
+        elif node_type is BinOp:
+            self.compile_expr(node.left)
+            self.compile_expr(node.right)
+            op_index = BINARY_OP_INDEX.get(node.op[0])
+            if op_index is None:
+                raise Exception(f'Operador "{token_name(node.op[0])}" no soportado')
+            self.emit(BINARY_OP, op_index)
+        elif node_type is UnaryOp:
+            self.compile_expr(node.expr)
+            op_index = UNARY_OP_INDEX.get(node.op[0])
+            if op_index is None:
+                raise Exception(f'Operador unario "{token_name(node.op[0])}" no soportado')
+            self.emit(UNARY_OP, op_index)
+        elif node_type is FuncCall:
+            for arg in node.args:
+                self.compile_expr(arg)
+            self.emit(CALL_FUNCTION, self.add_call(node.name, len(node.args)))
+        elif node_type is IndexAccess:
+            self.compile_expr(node.container)
+            self.compile_expr(node.index)
+            self.emit(INDEX)
+        elif node_type is DictNode:
+            for key_node, value_node in node.pairs.items():
+                self.compile_expr(key_node)
+                self.compile_expr(value_node)
+            self.emit(BUILD_DICT, len(node.pairs))
+        elif node_type is ListNode:
+            for element in node.elements:
+                self.compile_expr(element)
+            self.emit(BUILD_LIST, len(node.elements))
+        elif node_type is Assign:
+            # Una asignación usada como expresión se evalúa a None
+            self.compile_statement(node)
+            self.emit(LOAD_CONST, self.add_constant(None))
+        else:
+            self.error(node)
+
+    def compile_string(self, node: String) -> None:
+        """Compila una cadena, resolviendo en compilación si es JSON escalar."""
+        try:
+            value = json.loads(node.value)
+        except json.JSONDecodeError:
+            self.emit(LOAD_CONST, self.add_constant(node.value))
+            return
+        if isinstance(value, (dict, list)):
+            # Los contenedores se decodifican en cada ejecución para obtener un valor nuevo
+            self.emit(LOAD_JSON, self.add_constant(node.value))
+        else:
+            self.emit(LOAD_CONST, self.add_constant(value))
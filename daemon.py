@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""Servidor residente de Mercu y su cliente ligero.
+
+`mercu serve` arranca un proceso que importa una sola vez el intérprete y
+los subsistemas pesados (SQLite, FastAPI/uvicorn, rich) y mantiene en
+memoria los programas ya compilados. El cliente (`python daemon.py
+script.mer`) solo importa la biblioteca estándar: envía por un socket Unix
+la ruta del script (o su código, con `-`) junto con sus descriptores de
+stdin, stdout y stderr, y termina con el código de salida del script.
+
+Cada ejecución ocurre en un proceso hijo creado con `fork` a partir del
+servidor: hereda lo ya importado y compilado, pero tiene su propio
+`Context` y su propio estado, y escribe directamente en la terminal o en
+los ficheros del cliente.
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import traceback
+
+from typing import Any, Optional
+
+
+SOCKET_ENV = 'MERCU_SOCKET'
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), f'mercu-{os.getuid()}.sock')
+
+# Longitud de la petición JSON, que viaja junto a los descriptores.
+LENGTH = struct.Struct('<Q')
+
+# Módulos que el servidor importa al arrancar para que ningún script los pague.
+PRELOAD = (
+    ('sqlite3', 'db'),
+    ('rich.console', 'consola'),
+    ('fastapi', 'api'),
+    ('uvicorn', 'api'),
+    ('apiapp', 'api'),
+    ('serve', 'api'),
+)
+
+# Programas compilados que el servidor mantiene en memoria por motor.
+MEMORY_CACHE_SIZE = 256
+
+
+def default_socket() -> str:
+    return os.environ.get(SOCKET_ENV, DEFAULT_SOCKET)
+
+
+def _read_exactly(connection: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('La conexión se cerró antes de recibir la petición completa')
+        data += chunk
+    return bytes(data)
+
+
+def _send_message(connection: socket.socket, message: dict[str, Any]) -> None:
+    connection.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+
+# --- Servidor ---------------------------------------------------------------
+
+def receive_request(connection: socket.socket) -> tuple[dict[str, Any], list[int]]:
+    """Lee la petición del cliente y los descriptores de stdin, stdout y stderr."""
+    header, fds, _, _ = socket.recv_fds(connection, LENGTH.size, 3)
+    if len(header) < LENGTH.size:
+        header += _read_exactly(connection, LENGTH.size - len(header))
+    if len(fds) != 3:
+        for fd in fds:
+            os.close(fd)
+        raise ConnectionError('La petición no incluye los descriptores de stdin, stdout y stderr')
+    (length,) = LENGTH.unpack(header)
+    return json.loads(_read_exactly(connection, length)), fds
+
+
+def run_child(server: socket.socket, connection: socket.socket, request: dict[str, Any], fds: list[int], program: Any,
+              error: Optional[BaseException]) -> None:
+    """Ejecuta el programa en el proceso hijo y termina con su código de salida."""
+    import output
+    from interpreter import Context, Interpreter
+    from vm import VM
+
+    server.close()
+    status = 1
+    context = Context()
+    try:
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+            os.close(fd)
+        os.chdir(request['cwd'])
+        output.configure(request.get('output', 'auto'))
+        _send_message(connection, {'pid': os.getpid()})
+        if error is not None:
+            raise error
+        if request.get('engine') == 'ast':
+            Interpreter(program, context=context).interpret()
+        else:
+            VM(program, context=context).run()
+        # Si el script levantó una API, se sirve hasta que se detenga
+        for thread in threading.enumerate():
+            if thread is not threading.current_thread() and not thread.daemon:
+                thread.join()
+        status = 0
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else 1
+    except KeyboardInterrupt:
+        status = 128 + signal.SIGINT
+    except BaseException:
+        output.flush()
+        traceback.print_exc()
+    finally:
+        try:
+            output.flush()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            if context.database is not None:
+                context.database.close()
+            _send_message(connection, {'status': status})
+        finally:
+            os._exit(status)
+
+
+def serve_daemon(socket_path: str, engine: str = 'vm', optimize: bool = True) -> None:
+    """Atiende peticiones en `socket_path` hasta recibir SIGINT o SIGTERM."""
+    import subsystems
+    from cache import ProgramCache
+    from functions import raise_recursion_limit
+
+    raise_recursion_limit()
+    for module, subsystem in PRELOAD:
+        subsystems.require(module, subsystem)
+    caches = {
+        name: ProgramCache(engine=name, optimize=optimize, memory_size=MEMORY_CACHE_SIZE)
+        for name in ('vm', 'ast')
+    }
+
+    if os.path.exists(socket_path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+        except OSError:
+            os.unlink(socket_path)  # Socket huérfano de un servidor anterior
+        else:
+            raise Exception(f'Ya hay un servidor escuchando en {socket_path}')
+        finally:
+            probe.close()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # El socket se crea ya con permisos 0600: con un chmod posterior habría un
+    # instante en que otro usuario podría conectarse
+    umask = os.umask(0o177)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(umask)
+    server.listen(128)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    # Los hijos se recogen solos: cada uno envía su código de salida al cliente
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, stop)
+    print(f'Servidor de Mercu escuchando en {socket_path} (pid {os.getpid()})', file=sys.stderr)
+    try:
+        while True:
+            connection, _ = server.accept()
+            try:
+                handle(server, connection, caches, engine)
+            except Exception as e:
+                print(f'Petición descartada: {e}', file=sys.stderr)
+            finally:
+                connection.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.unlink(socket_path)
+
+
+def handle(server: socket.socket, connection: socket.socket, caches: dict[str, Any], default_engine: str) -> None:
+    """Prepara el programa de una petición y lo ejecuta en un proceso hijo."""
+    request, fds = receive_request(connection)
+    try:
+        engine = request.get('engine') or default_engine
+        request['engine'] = engine
+        program = error = None
+        # El programa se compila en el servidor para que quede en su caché
+        try:
+            if request.get('source') is not None:
+                program = caches[engine].load_source(request['source'])
+            else:
+                program = caches[engine].load(request['path'])
+        except Exception as e:
+            error = e
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if os.fork() == 0:
+            run_child(server, connection, request, fds, program, error)
+    finally:
+        for fd in fds:
+            os.close(fd)
+
+
+# --- Cliente ----------------------------------------------------------------
+
+def run_client(socket_path: str, request: dict[str, Any]) -> int:
+    """Envía la petición al servidor y devuelve el código de salida del script.
+
+    Ctrl+C y SIGTERM se reenvían al proceso que ejecuta el script.
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except OSError as e:
+        print(f'No se pudo conectar con el servidor de Mercu en {socket_path}: {e}', file=sys.stderr)
+        print('Arráncalo con: mercu serve', file=sys.stderr)
+        return 1
+    payload = json.dumps(request).encode('utf-8')
+    socket.send_fds(connection, [LENGTH.pack(len(payload))], [0, 1, 2])
+    connection.sendall(payload)
+
+    pid = None
+
+    def forward(signum, frame):
+        if pid is not None:
+            os.kill(pid, signum)
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+    with connection, connection.makefile('rb') as replies:
+        for line in replies:
+            message = json.loads(line)
+            if 'pid' in message:
+                pid = message['pid']
+            elif 'status' in message:
+                return message['status']
+    print('El proceso del script terminó sin devolver su código de salida', file=sys.stderr)
+    return 1
+
+
+def build_client_parser() -> argparse.ArgumentParser:
+    arg_parser = argparse.ArgumentParser(
+        prog='daemon.py', usage='daemon.py [opciones] archivo.mer | -',
+        description='Ejecuta un script en el servidor residente de Mercu (mercu serve).'
+    )
+    arg_parser.add_argument('filename', help='archivo .mer a ejecutar, o - para leer el código de stdin')
+    arg_parser.add_argument('--socket', default=default_socket(), help='socket del servidor')
+    arg_parser.add_argument('--engine', choices=('vm', 'ast'), help='motor de ejecución (por defecto el del servidor)')
+    arg_parser.add_argument('--output', choices=('auto', 'rich', 'plain'), default='auto', help='salida con rich o en texto plano')
+    arg_parser.add_argument('--plain', dest='output', action='store_const', const='plain', help='equivale a --output plain')
+    return arg_parser
+
+
+def build_serve_parser() -> argparse.ArgumentParser:
+    arg_parser = argparse.ArgumentParser(prog='mercu serve', description='Arranca el servidor residente de Mercu.')
+    arg_parser.add_argument('--socket', default=default_socket(), help='ruta del socket Unix en el que escuchar')
+    arg_parser.add_argument('--engine', choices=('vm', 'ast'), default='vm', help='motor por defecto de las peticiones')
+    arg_parser.add_argument('--no-optimize', action='store_true', help='desactiva el optimizador')
+    return arg_parser
+
+
+def serve_main(argv: list[str]) -> None:
+    """Punto de entrada de `mercu serve`."""
+    args = build_serve_parser().parse_args(argv)
+    serve_daemon(args.socket, args.engine, not args.no_optimize)
+
+
+def main() -> None:
+    args = build_client_parser().parse_args()
+    request = {'cwd': os.getcwd(), 'engine': args.engine, 'output': args.output}
+    if args.filename == '-':
+        request['source'] = sys.stdin.read()
+    elif not args.filename.endswith('.mer'):
+        print('Error: La extensión del archivo debe ser .mer', file=sys.stderr)
+        sys.exit(1)
+    else:
+        request['path'] = os.path.abspath(args.filename)
+    sys.exit(run_client(args.socket, request))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+import atexit
+import attr
+import itertools
+import re
+import subsystems
+import threading
+import weakref
+
+from typing import Any, Iterator, Optional
+
+
+IDENTIFIER_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*\Z')
+WHERE_KEY_RE = re.compile(r'\s*([A-Za-z_][A-Za-z0-9_]*)\s*(=|!=|<=|>=|<|>|like)?\s*\Z', re.IGNORECASE)
+
+QUERY_OPTIONS = ('columns', 'where', 'order_by', 'limit')
+
+# Filas que se piden a sqlite3 en cada `fetchmany` al recorrer un resultado.
+FETCH_BATCH_SIZE = 500
+
+CONNECT_OPTIONS = ('journal_mode', 'synchronous', 'cache_size', 'statement_cache', 'timeout')
+JOURNAL_MODES = ('delete', 'truncate', 'persist', 'memory', 'wal', 'off')
+SYNCHRONOUS_MODES = ('off', 'normal', 'full', 'extra')
+
+_memory_databases = itertools.count()
+
+# Gestores vivos, para cerrar sus conexiones al salir. Es un conjunto débil:
+# un gestor que ya no se usa (otro `connect_db`, un script terminado en el
+# servidor residente) no se queda en memoria por estar aquí.
+_managers = weakref.WeakSet()
+
+
+@atexit.register
+def _close_managers() -> None:
+    for manager in list(_managers):
+        manager.close()
+
+
+def check_identifier(name: Any, kind: str = 'columna') -> str:
+    """Comprueba que `name` es un nombre SQL válido y lo devuelve.
+
+    Las tablas y columnas no pueden pasarse como parámetros de la consulta,
+    así que solo se aceptan identificadores simples para evitar inyecciones.
+    """
+    if not isinstance(name, str) or not IDENTIFIER_RE.match(name):
+        raise Exception(f'Nombre de {kind} no válido: {name!r}')
+    return name
+
+
+def _names(value: Any, option: str) -> list[str]:
+    """Normaliza una lista de nombres dada como lista o como cadena separada por comas."""
+    if isinstance(value, str):
+        value = [part.strip() for part in value.split(',')]
+    if not isinstance(value, (list, tuple)) or not value:
+        raise Exception(f'La opción "{option}" debe ser una lista de columnas')
+    return value
+
+
+def build_select(table_name: str, options: Optional[dict[str, Any]] = None) -> tuple[str, tuple[Any, ...]]:
+    """Construye la consulta SELECT y sus parámetros a partir de las opciones de `db_query`.
+
+    Opciones admitidas:
+    - `columns`: columnas a devolver (por defecto todas).
+    - `where`: diccionario `columna -> valor`; la clave puede llevar un
+      operador (`"age >="`, `"name like"`). Los valores siempre van como
+      parámetros y `None` se traduce a `IS NULL` / `IS NOT NULL`.
+    - `order_by`: columnas de ordenación; un `-` delante indica descendente.
+    - `limit`: número máximo de filas.
+    """
+    options = options or {}
+    unknown = [key for key in options if key not in QUERY_OPTIONS]
+    if unknown:
+        raise Exception(f'Opciones de db_query desconocidas: {", ".join(map(str, unknown))}')
+
+    table_name = check_identifier(table_name, 'tabla')
+    columns = '*'
+    if options.get('columns') is not None:
+        columns = ', '.join(check_identifier(c) for c in _names(options['columns'], 'columns'))
+    sql = f'SELECT {columns} FROM {table_name}'
+    params = []
+
+    where = options.get('where')
+    if where:
+        if not isinstance(where, dict):
+            raise Exception('La opción "where" debe ser un diccionario columna -> valor')
+        conditions = []
+        for key, value in where.items():
+            match = WHERE_KEY_RE.match(key) if isinstance(key, str) else None
+            if match is None:
+                raise Exception(f'Condición no válida en "where": {key!r}')
+            column, operator = match.group(1), (match.group(2) or '=').upper()
+            if value is None and operator in ('=', '!='):
+                conditions.append(f'{column} IS {"NOT " if operator == "!=" else ""}NULL')
+            else:
+                conditions.append(f'{column} {operator} ?')
+                params.append(value)
+        sql += ' WHERE ' + ' AND '.join(conditions)
+
+    if options.get('order_by') is not None:
+        terms = []
+        for name in _names(options['order_by'], 'order_by'):
+            descending = isinstance(name, str) and name.startswith('-')
+            column = check_identifier(name[1:] if descending else name)
+            terms.append(f'{column} DESC' if descending else column)
+        sql += ' ORDER BY ' + ', '.join(terms)
+
+    limit = options.get('limit')
+    if limit is not None:
+        if not isinstance(limit, int) or isinstance(limit, bool) or limit < 0:
+            raise Exception('La opción "limit" debe ser un entero no negativo')
+        sql += ' LIMIT ?'
+        params.append(limit)
+
+    return sql, tuple(params)
+
+
+def _check_option(options: dict[str, Any], name: str, valid: tuple[str, ...]) -> str:
+    """Valida una opción de `connect_db` que se interpola en un PRAGMA."""
+    value = options[name]
+    if not isinstance(value, str) or value.lower() not in valid:
+        raise Exception(f'La opción "{name}" debe ser una de: {", ".join(valid)}')
+    return value.lower()
+
+
+@attr.s(auto_attribs=True, eq=False)
+class ConnectionManager:
+    """Conexiones SQLite a una misma base de datos, una por hilo.
+
+    Cada hilo (el script, o cada hilo de trabajo de uvicorn) obtiene con
+    `connection()` su propia conexión, que se crea la primera vez y se
+    reutiliza después, así que ninguna conexión se comparte entre hilos. Por
+    defecto se usa el modo WAL con `synchronous=NORMAL`: los lectores no
+    bloquean al escritor ni al revés. `statement_cache` fija el tamaño de la
+    caché LRU de sentencias preparadas que sqlite3 mantiene por conexión,
+    indexada por el texto SQL. Las conexiones que sigan abiertas al terminar
+    el proceso se cierran entonces.
+    """
+    path: str
+    journal_mode: str = 'wal'
+    synchronous: str = 'normal'
+    cache_size: Optional[int] = None
+    statement_cache: int = 256
+    timeout: float = 30.0
+
+    def __attrs_post_init__(self):
+        """Prepara el almacenamiento por hilo y el registro de conexiones abiertas."""
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._uri = False
+        self._target = self.path
+        if self.path == ':memory:':
+            # Una base en memoria es distinta en cada conexión: se comparte
+            # entre los hilos mediante una URI con caché compartida.
+            self._uri = True
+            self._target = f'file:mercu-memory-{next(_memory_databases)}?mode=memory&cache=shared'
+        _managers.add(self)
+
+    @classmethod
+    def from_options(cls, path: str, options: Optional[dict[str, Any]] = None) -> 'ConnectionManager':
+        """Crea el gestor a partir del diccionario de opciones de `connect_db`."""
+        options = dict(options or {})
+        unknown = [key for key in options if key not in CONNECT_OPTIONS]
+        if unknown:
+            raise Exception(f'Opciones de connect_db desconocidas: {", ".join(map(str, unknown))}')
+        if 'journal_mode' in options:
+            options['journal_mode'] = _check_option(options, 'journal_mode', JOURNAL_MODES)
+        if 'synchronous' in options:
+            options['synchronous'] = _check_option(options, 'synchronous', SYNCHRONOUS_MODES)
+        for name in ('cache_size', 'statement_cache'):
+            value = options.get(name)
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+                raise Exception(f'La opción "{name}" debe ser un entero')
+        if 'timeout' in options and not isinstance(options['timeout'], (int, float)):
+            raise Exception('La opción "timeout" debe ser un número de segundos')
+        return cls(path, **options)
+
+    def __reduce__(self):
+        # Al copiarse a otro proceso solo viaja la configuración: las
+        # conexiones se vuelven a abrir allí bajo demanda.
+        return (ConnectionManager, (
+            self.path, self.journal_mode, self.synchronous, self.cache_size,
+            self.statement_cache, self.timeout,
+        ))
+
+    def connection(self) -> Any:
+        """Devuelve la conexión del hilo actual, abriéndola si hace falta."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._open()
+        return connection
+
+    def _open(self) -> Any:
+        """Abre una conexión nueva y le aplica los PRAGMA configurados."""
+        sqlite3 = subsystems.require('sqlite3', 'db')
+        # check_same_thread=False solo para poder cerrarla desde `close()`:
+        # cada conexión se usa únicamente desde el hilo que la abrió.
+        connection = sqlite3.connect(
+            self._target, timeout=self.timeout, uri=self._uri,
+            check_same_thread=False, cached_statements=self.statement_cache,
+        )
+        if not self._uri:
+            connection.execute(f'PRAGMA journal_mode={self.journal_mode}')
+        connection.execute(f'PRAGMA synchronous={self.synchronous}')
+        if self.cache_size is not None:
+            connection.execute(f'PRAGMA cache_size={int(self.cache_size)}')
+        with self._lock:
+            self._connections.append(connection)
+        return connection
+
+    def data_version(self) -> int:
+        """`PRAGMA data_version` en la conexión del hilo actual.
+
+        Cambia cada vez que otra conexión, de este proceso o de otro, confirma
+        cambios en la base de datos.
+        """
+        return self.connection().execute('PRAGMA data_version').fetchone()[0]
+
+    def in_transaction(self) -> bool:
+        """Indica si la conexión del hilo actual tiene una transacción abierta."""
+        connection = getattr(self._local, 'connection', None)
+        return connection is not None and connection.in_transaction
+
+    def rollback(self) -> None:
+        """Deshace la transacción abierta en la conexión del hilo actual, si la hay."""
+        if self.in_transaction():
+            self._local.connection.rollback()
+
+    def close(self) -> None:
+        """Cierra todas las conexiones abiertas por cualquier hilo."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+
+@attr.s(auto_attribs=True, eq=False)
+class RowSet:
+    """Resultado perezoso de `db_query`.
+
+    No guarda filas: cada recorrido ejecuta la consulta y lee las filas por
+    bloques con `fetchmany`, así que la memoria no depende del tamaño de la
+    tabla. El acceso por índice y `len()` se resuelven con consultas sobre la
+    misma SELECT. Cada fila es un diccionario `columna -> valor`. Las
+    consultas usan la conexión del hilo que recorre el resultado. Si la
+    ejecución tiene límites, `governor` cuenta las filas leídas.
+    """
+    database: ConnectionManager
+    sql: str
+    params: tuple[Any, ...] = ()
+    batch_size: int = FETCH_BATCH_SIZE
+    governor: Optional[Any] = attr.ib(default=None, repr=False)
+
+    def _rows(self, sql: str, params: tuple[Any, ...]) -> Iterator[dict[str, Any]]:
+        """Ejecuta `sql` y devuelve sus filas como diccionarios, bloque a bloque."""
+        cursor = self.database.connection().execute(sql, params)
+        try:
+            names = [column[0] for column in cursor.description]
+            while True:
+                batch = cursor.fetchmany(self.batch_size)
+                if not batch:
+                    return
+                if self.governor is not None:
+                    self.governor.add_rows(len(batch))
+                for row in batch:
+                    yield dict(zip(names, row))
+        finally:
+            cursor.close()
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        return self._rows(self.sql, self.params)
+
+    def __getitem__(self, index: Any) -> dict[str, Any]:
+        if not isinstance(index, int) or isinstance(index, bool):
+            raise TypeError(f'los índices de un resultado deben ser enteros, no {type(index).__name__}')
+        if index < 0:
+            index += len(self)
+        if index >= 0:
+            for row in self._rows(f'SELECT * FROM ({self.sql}) LIMIT 1 OFFSET ?', self.params + (index,)):
+                return row
+        raise IndexError('índice fuera del resultado')
+
+    def column(self, name: str) -> Iterator[Any]:
+        """Valores de una columna, sin leer el resto de columnas de cada fila."""
+        column = check_identifier(name)
+        for row in self._rows(f'SELECT {column} FROM ({self.sql})', self.params):
+            yield row[column]
+
+    def __len__(self) -> int:
+        cursor = self.database.connection().execute(f'SELECT COUNT(*) FROM ({self.sql})', self.params)
+        try:
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    def __bool__(self) -> bool:
+        for _ in self._rows(f'SELECT 1 FROM ({self.sql}) LIMIT 1', self.params):
+            return True
+        return False
+
+    def __str__(self) -> str:
+        return '\n'.join(str(row) for row in self)
+
+    def __repr__(self) -> str:
+        return f'RowSet({self.sql!r}, {self.params!r})'
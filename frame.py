@@ -0,0 +1,80 @@
+from collections.abc import MutableMapping
+from typing import Any, Iterable, Iterator, Optional
+
+
+class _Unbound:
+    """Centinela para las posiciones de variables sin valor asignado."""
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return '<unbound>'
+
+    def __reduce__(self):
+        return 'UNBOUND'
+
+
+UNBOUND = _Unbound()
+
+
+class Frame(MutableMapping):
+    """Almacén de variables respaldado por una lista plana de posiciones (slots).
+
+    El resolver y el enlazador de la VM asignan a cada nombre una posición
+    fija, de modo que la ejecución accede por índice y no por hash. La clase
+    se comporta además como un diccionario `nombre -> valor` para embeber el
+    intérprete y para depurar; las variables sin asignar no aparecen en él.
+    """
+    __slots__ = ('slots', 'names', 'index')
+
+    def __init__(self, initial: Optional[dict[str, Any]] = None):
+        self.slots: list[Any] = []
+        self.names: list[str] = []
+        self.index: dict[str, int] = {}
+        if initial:
+            self.update(initial)
+
+    @classmethod
+    def from_names(cls, names: Iterable[str]) -> 'Frame':
+        """Crea un frame vacío con una posición sin asignar para cada nombre."""
+        frame = cls()
+        for name in names:
+            frame.slot(name)
+        return frame
+
+    def slot(self, name: str) -> int:
+        """Devuelve la posición de `name`, reservándola si aún no existe."""
+        position = self.index.get(name)
+        if position is None:
+            position = self.index[name] = len(self.slots)
+            self.slots.append(UNBOUND)
+            self.names.append(name)
+        return position
+
+    def __getitem__(self, name: str) -> Any:
+        position = self.index.get(name)
+        if position is None or self.slots[position] is UNBOUND:
+            raise KeyError(name)
+        return self.slots[position]
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        self.slots[self.slot(name)] = value
+
+    def __delitem__(self, name: str) -> None:
+        position = self.index.get(name)
+        if position is None or self.slots[position] is UNBOUND:
+            raise KeyError(name)
+        self.slots[position] = UNBOUND
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name, value in zip(self.names, self.slots) if value is not UNBOUND)
+
+    def __len__(self) -> int:
+        return sum(1 for value in self.slots if value is not UNBOUND)
+
+    def __repr__(self) -> str:
+        return f'Frame({dict(self)!r})'
+
+
+def to_frame(value: Any) -> Frame:
+    """Convierte un diccionario de variables en `Frame` (conversor de `Context`)."""
+    return value if isinstance(value, Frame) else Frame(value)
@@ -0,0 +1,235 @@
+import attr
+import sys
+import threading
+
+from collections import OrderedDict
+from typing import Any, Optional
+
+from ast_nodes import (
+    BinOp, UnaryOp, Assign, FuncCall, DictNode, ListNode, IfNode, IndexAccess, ReturnNode,
+    ParallelNode
+)
+from frame import UNBOUND, Frame
+from natives import NativeFunction, NativeRegistry
+
+
+# Resultados que guarda por defecto una función marcada con `memo`.
+DEFAULT_MEMO_SIZE = 1024
+
+# Frames libres que conserva cada función para reutilizarlos en las llamadas
+# siguientes (basta con la profundidad habitual de recursión).
+MAX_FREE_FRAMES = 64
+
+# Llamadas anidadas a funciones del script que admite cada hilo, el mismo
+# límite en los dos motores. Cada llamada ocupa varios frames de Python (unos
+# 4 en la VM y 12 en el intérprete del AST), así que caben en RECURSION_LIMIT.
+MAX_CALL_DEPTH = 1500
+
+# Límite de recursión de Python que fijan los puntos de entrada con
+# `raise_recursion_limit`. No se sube más para no agotar la pila de C.
+RECURSION_LIMIT = 20000
+
+_depth = threading.local()
+
+
+def raise_recursion_limit() -> None:
+    """Sube el límite de recursión de Python para admitir `MAX_CALL_DEPTH` llamadas anidadas.
+
+    Es un ajuste de todo el proceso: lo hacen una sola vez los puntos de
+    entrada (`mercu`, el servidor residente, `run-many` y los procesos de la
+    API), no la biblioteca. Sin él, una recursión profunda termina con el
+    mismo error de llamadas anidadas, solo que antes.
+    """
+    if sys.getrecursionlimit() < RECURSION_LIMIT:
+        sys.setrecursionlimit(RECURSION_LIMIT)
+
+
+def local_names(params: tuple[str, ...], body: list[Any]) -> tuple[str, ...]:
+    """Variables locales de una función: sus parámetros y las que asigna su cuerpo.
+
+    El resto de nombres que lee el cuerpo son variables globales del script.
+    """
+    names = dict.fromkeys(params)
+    pending = list(reversed(body))
+    while pending:
+        node = pending.pop()
+        node_type = type(node)
+        if node_type is Assign:
+            names.setdefault(node.left.name)
+            pending.append(node.right)
+        elif node_type is FuncCall:
+            pending.extend(reversed(node.args))
+        elif node_type is BinOp:
+            pending.extend((node.right, node.left))
+        elif node_type is UnaryOp:
+            pending.append(node.expr)
+        elif node_type is ReturnNode:
+            pending.append(node.value)
+        elif node_type is IndexAccess:
+            pending.extend((node.index, node.container))
+        elif node_type is DictNode:
+            for key, value in reversed(node.pairs.items()):
+                pending.extend((value, key))
+        elif node_type is ListNode:
+            pending.extend(reversed(node.elements))
+        elif node_type is IfNode:
+            pending.extend(reversed(node.else_block or []))
+            for condition, block in reversed(node.elif_blocks or []):
+                pending.extend(reversed(block))
+                pending.append(condition)
+            pending.extend(reversed(node.if_block))
+            pending.append(node.condition)
+        elif node_type is ParallelNode:
+            for task in reversed(node.tasks):
+                pending.extend(reversed(task))
+    return tuple(names)
+
+
+@attr.s(auto_attribs=True, eq=False)
+class MemoCache:
+    """Caché LRU de los resultados de una función marcada con `memo`.
+
+    La clave son los valores de los argumentos junto con sus tipos, para no
+    confundir `1` con `true`. Las llamadas con argumentos no hashables
+    (listas, diccionarios, arrays) se ejecutan sin pasar por la caché y
+    cuentan como fallos.
+    """
+    max_entries: int = DEFAULT_MEMO_SIZE
+
+    def __attrs_post_init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __reduce__(self):
+        return (MemoCache, (self.max_entries,))
+
+    def get(self, key: tuple) -> tuple[bool, Any]:
+        """Devuelve `(True, resultado)` si la llamada está guardada, o `(False, None)`."""
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key: tuple, value: Any) -> None:
+        """Guarda el resultado de una llamada, descartando el menos usado si no cabe."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def miss(self) -> None:
+        """Anota un fallo de una llamada que no se puede guardar."""
+        with self._lock:
+            self.misses += 1
+
+    def stats(self) -> dict[str, int]:
+        """Contadores de la caché."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'evictions': self.evictions,
+        }
+
+
+@attr.s(auto_attribs=True, eq=False)
+class UserFunction:
+    """Función definida en el script con `def`.
+
+    Se registra como una función nativa más (`native()`), así que las
+    llamadas se enlazan y se comprueban igual que las de las nativas. Cada
+    llamada toma un `Frame` de `names` de la lista de frames libres de la
+    función y lo devuelve vacío al terminar: en un bucle o una recursión
+    poco profunda no se crea ningún frame nuevo. `global_variables` es el
+    `Frame` del script, del que el cuerpo lee las variables que no asigna.
+
+    Esta clase ejecuta el cuerpo ya resuelto con el intérprete del AST; la
+    VM usa `VMFunction`, con el cuerpo compilado.
+    """
+    name: str
+    params: tuple[str, ...]
+    names: tuple[str, ...]
+    body: Any
+    global_variables: Optional[Frame] = attr.ib(default=None, repr=False)
+    memo_size: Optional[int] = None
+
+    def __attrs_post_init__(self):
+        self.memo = MemoCache(self.memo_size) if self.memo_size else None
+        self._free_frames = []
+        self._empty = [UNBOUND] * len(self.names)
+
+    def __reduce__(self):
+        # Ni los frames libres ni los resultados guardados pasan a otro proceso,
+        # y las variables globales las vuelve a enlazar `bind_functions`
+        return (type(self), (self.name, self.params, self.names, self.body, None, self.memo_size))
+
+    def native(self) -> NativeFunction:
+        """La función como entrada del registro de funciones nativas."""
+        return NativeFunction(self.name, self, len(self.params), len(self.params))
+
+    def __call__(self, interpreter: Any, *args: Any) -> Any:
+        memo = self.memo
+        if memo is None:
+            return self.call(interpreter, args)
+        key = (args, tuple(map(type, args)))
+        try:
+            found, value = memo.get(key)
+        except TypeError:
+            memo.miss()
+            return self.call(interpreter, args)
+        if found:
+            return value
+        value = self.call(interpreter, args)
+        memo.put(key, value)
+        return value
+
+    def call(self, interpreter: Any, args: tuple[Any, ...]) -> Any:
+        """Ejecuta el cuerpo con los argumentos en un frame reutilizado."""
+        depth = getattr(_depth, 'value', 0)
+        if depth >= MAX_CALL_DEPTH:
+            raise Exception(
+                f'Demasiadas llamadas anidadas en la función "{self.name}" (el máximo es {MAX_CALL_DEPTH})'
+            )
+        free_frames = self._free_frames
+        try:
+            frame = free_frames.pop()
+        except IndexError:
+            frame = Frame.from_names(self.names)
+        slots = frame.slots
+        slots[:len(args)] = args
+        _depth.value = depth + 1
+        try:
+            return self.run(interpreter, frame)
+        except RecursionError:
+            raise Exception(f'Demasiadas llamadas anidadas en la función "{self.name}"') from None
+        finally:
+            _depth.value = depth
+            # El frame vuelve vacío para no retener los valores de la llamada
+            slots[:] = self._empty
+            if len(free_frames) < MAX_FREE_FRAMES:
+                free_frames.append(frame)
+
+    def run(self, interpreter: Any, frame: Frame) -> Any:
+        """Ejecuta el cuerpo sobre `frame` y devuelve el valor de su `return`."""
+        return interpreter.run_function(self.body, frame, self.global_variables)
+
+
+def user_functions(natives: NativeRegistry) -> list[UserFunction]:
+    """Las funciones definidas por el script registradas en `natives`."""
+    return [native.func for native in natives.functions.values() if isinstance(native.func, UserFunction)]
+
+
+def bind_functions(natives: NativeRegistry, global_variables: Frame) -> None:
+    """Enlaza las funciones del script con el `Frame` de sus variables globales."""
+    for function in user_functions(natives):
+        function.global_variables = global_variables
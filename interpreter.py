@@ -1,37 +1,90 @@
 import attr
-import sqlite3
-import threading
-import uvicorn
-from rich.console import Console
-from typing import Any, Optional
+import functools
+import itertools
+import subsystems
+import time
+from typing import TYPE_CHECKING, Any, Iterable, Optional
 from tokens import (
     PLUS, MINUS, MUL, DIV, AND, OR, EQUALS, NOT_EQUALS, LESS_THAN, LESS_EQUAL,
-    GREATER_EQUAL, GREATER_THAN, NOT
+    GREATER_EQUAL, GREATER_THAN, NOT, token_name
 )
 from ast_nodes import (
-    Num, BinOp, UnaryOp, Assign, Var, FuncCall, String, DictNode, Bool, IfNode,
-    IndexAccess
+    Num, BinOp, UnaryOp, Assign, Var, FuncCall, String, DictNode, ListNode, Bool,
+    IfNode, IndexAccess, Const, RouteNode, ReturnNode, FunctionDef, GlobalVar, ParallelNode
 )
-from apiapp import APIApp
+from database import ConnectionManager, RowSet, build_select, check_identifier
+from frame import UNBOUND, Frame, to_frame
+from functions import user_functions
+from limits import Governor
+from natives import DEFAULT_REGISTRY, NativeRegistry
+from output import get_output
+from parallel import run_parallel
+from resolver import Resolver
+from routes import RouteHandler, invalidate_routes, referenced_tables
 import json
 
+if TYPE_CHECKING:
+    from apiapp import APIApp
 
-console = Console()
+
+# Filas por llamada a `executemany` y tiempo mínimo entre dos refrescos del
+# progreso de `db_insert_many`.
+INSERT_BATCH_SIZE = 1000
+PROGRESS_INTERVAL = 0.25
+
+
+@functools.lru_cache(maxsize=128)
+def insert_statement(table_name: str, columns: tuple[str, ...]) -> str:
+    """Devuelve la sentencia INSERT para la tabla y columnas dadas.
+
+    Se cachea para que cada inserción con la misma forma reutilice la misma
+    cadena y, con ella, la sentencia preparada que guarda sqlite3. La tabla
+    y las columnas se comprueban con `check_identifier`, como en las
+    consultas.
+    """
+    table_name = check_identifier(table_name, 'tabla')
+    names = ', '.join(check_identifier(column) for column in columns)
+    placeholders = ', '.join('?' * len(columns))
+    return f'INSERT INTO {table_name} ({names}) VALUES ({placeholders})'
+
+
+class ReturnValue(Exception):
+    """Señal interna con la que `return` termina el cuerpo de una ruta o una función."""
+
+    def __init__(self, value: Any):
+        super().__init__(value)
+        self.value = value
 
 
 @attr.s(auto_attribs=True)
 class Context:
-    """Contexto que almacena variables y conexiones de base de datos."""
-    variables: dict[str, Any] = attr.ib(factory=dict)
-    database: Optional[Any] = None
-    app: Optional[APIApp] = None
+    """Contexto que almacena variables y conexiones de base de datos.
+
+    `variables` es un `Frame`: la ejecución accede por posición, pero se
+    puede usar como un diccionario `nombre -> valor`. Mientras se ejecuta una
+    función, `variables` es su frame local y `global_variables` el del script.
+    `governor` lleva la cuenta de los recursos de una ejecución con límites.
+    """
+    variables: Frame = attr.ib(factory=Frame, converter=to_frame)
+    global_variables: Optional[Frame] = attr.ib(default=None, repr=False)
+    database: Optional[ConnectionManager] = None
+    app: Optional['APIApp'] = None
+    transaction: bool = False
+    pending_rows: int = 0
+    routes: list[RouteHandler] = attr.ib(factory=list)
+    governor: Optional[Governor] = attr.ib(default=None, repr=False)
 
 
 @attr.s(auto_attribs=True)
 class Interpreter:
-    """Intérprete que ejecuta el AST."""
-    tree: list[Any]
+    """Intérprete que ejecuta el AST.
+
+    `tree` puede ser una lista o un generador de sentencias (modo streaming):
+    cada sentencia se ejecuta y se descarta antes de analizar la siguiente.
+    """
+    tree: Iterable[Any]
     context: Context = attr.ib(factory=Context)
+    natives: NativeRegistry = DEFAULT_REGISTRY
 
     def visit(self, node: Any) -> Any:
         """Despacha el método de visita adecuado para el nodo dado."""
@@ -51,6 +104,10 @@ class Interpreter:
         """Devuelve el valor booleano."""
         return node.value
 
+    def visit_Const(self, node: Const) -> Any:
+        """Devuelve un valor ya evaluado por el optimizador."""
+        return node.value
+
     def visit_String(self, node: String) -> Any:
         """Devuelve el valor de una cadena de texto o un objeto si es JSON."""
         value = node.value
@@ -72,6 +129,10 @@ class Interpreter:
             result[key] = value
         return result
 
+    def visit_ListNode(self, node: ListNode) -> list[Any]:
+        """Devuelve una lista nueva con los valores de sus elementos."""
+        return [self.visit(element) for element in node.elements]
+
     def visit_BinOp(self, node: BinOp) -> Any:
         """Realiza operaciones binarias, incluyendo lógicas y relacionales."""
         left = self.visit(node.left)
@@ -103,7 +164,7 @@ class Interpreter:
         elif op_type == GREATER_EQUAL:
             return left >= right
         else:
-            raise Exception(f'Operador "{op_type}" no soportado')
+            raise Exception(f'Operador "{token_name(op_type)}" no soportado')
 
     def visit_IfNode(self, node: IfNode) -> None:
         """Ejecuta una estructura condicional."""
@@ -123,6 +184,82 @@ class Interpreter:
         for statement in block:
             self.visit(statement)
 
+    def visit_ParallelNode(self, node: ParallelNode) -> None:
+        """Ejecuta a la vez las sentencias de un bloque parallel.
+
+        Cada tarea usa un intérprete propio con una copia del contexto: las
+        variables son las mismas, pero las llamadas a funciones del script
+        cambian `variables` en su copia y no en la de las demás tareas. Con
+        límites, cada tarea cuenta con su propio `TaskGovernor`.
+        """
+        self.check_parallel()
+        governor = self.context.governor
+        governors = governor.fork(len(node.tasks)) if governor is not None else [None] * len(node.tasks)
+        tasks = []
+        for task, task_governor in zip(node.tasks, governors):
+            context = attr.evolve(self.context, governor=task_governor)
+            interpreter = type(self)(tree=[], context=context, natives=self.natives)
+            tasks.append(functools.partial(interpreter._execute_block, task))
+        try:
+            run_parallel(tasks)
+        finally:
+            if governor is not None:
+                governor.join(governors)
+
+    def check_parallel(self) -> None:
+        """Lanza un error si un bloque parallel no se puede ejecutar en el estado actual."""
+        if self.context.transaction:
+            raise Exception('No se puede usar un bloque parallel dentro de una transacción')
+
+    def visit_RouteNode(self, node: RouteNode) -> None:
+        """Registra una ruta de la API; su cuerpo se ejecutará en cada petición."""
+        options = self.visit(node.options) if node.options is not None else None
+        self.register_route(self.route_handler(node, options))
+
+    def route_handler(self, node: RouteNode, options: Optional[dict[str, Any]] = None) -> RouteHandler:
+        """Prepara una ruta para ejecutarla en cada petición con un intérprete propio."""
+        body, natives = node.body, self.natives
+
+        def execute(context: Context) -> Any:
+            interpreter_class = Interpreter if context.governor is None else GovernedInterpreter
+            return interpreter_class(tree=[], context=context, natives=natives).run_body(body)
+
+        return RouteHandler(
+            node.method, node.path, node.names, execute, self.context, node, options,
+            referenced_tables(body)
+        )
+
+    def visit_ReturnNode(self, node: ReturnNode) -> None:
+        """Termina el cuerpo de la ruta devolviendo un valor."""
+        raise ReturnValue(self.visit(node.value))
+
+    def visit_FunctionDef(self, node: FunctionDef) -> None:
+        """Las funciones se registran al resolver el árbol: la sentencia no hace nada."""
+
+    def run_function(self, body: list[Any], frame: Frame, global_variables: Frame) -> Any:
+        """Ejecuta el cuerpo de una función con `frame` como variables locales."""
+        context = self.context
+        saved = context.variables, context.global_variables
+        context.variables, context.global_variables = frame, global_variables
+        try:
+            return self.run_body(body)
+        finally:
+            context.variables, context.global_variables = saved
+
+    def run_body(self, body: list[Any]) -> Any:
+        """Ejecuta el cuerpo de una ruta o función y devuelve el valor de su `return` (None si no hay)."""
+        try:
+            self._execute_block(body)
+        except ReturnValue as result:
+            return result.value
+        return None
+
+    def register_route(self, handler: RouteHandler) -> None:
+        """Guarda la ruta y, si la API ya está levantada, la publica en ella."""
+        self.context.routes.append(handler)
+        if self.context.app is not None:
+            self.context.app.add_route(handler)
+
     def visit_UnaryOp(self, node: UnaryOp) -> Any:
         """Realiza operaciones unarias."""
         expr = self.visit(node.expr)
@@ -134,49 +271,59 @@ class Interpreter:
         elif op_type == NOT:
             return not expr
         else:
-            raise Exception(f'Operador unario "{op_type}" no soportado')
+            raise Exception(f'Operador unario "{token_name(op_type)}" no soportado')
 
     def visit_Assign(self, node: Assign) -> None:
         """Asigna un valor a una variable."""
-        var_name = node.left.name
-        self.context.variables[var_name] = self.visit(node.right)
+        value = self.visit(node.right)
+        slot = node.left.slot
+        if slot < 0:
+            self.context.variables[node.left.name] = value
+        else:
+            self.context.variables.slots[slot] = value
 
     def visit_Var(self, node: Var) -> Any:
         """Devuelve el valor de una variable."""
-        var_name = node.name
-        val = self.context.variables.get(var_name, None)
-        if val is None:
-            raise Exception(f'Variable "{var_name}" no definida')
-        else:
-            return val
-
-    def visit_FuncCall(self, node: FuncCall) -> None:
-        """Ejecuta una función nativa."""
-        func_name = node.name
-        if func_name == 'print':
-            final_value = ""
-            for arg in node.args:
-                final_value += str(self.visit(arg))
-            console.print(f"[bold green]{final_value}[/bold green]")
-        elif func_name == 'connect_db':
-            db_path = self.visit(node.args[0])
-            self.connect_db(db_path)
-        elif func_name == 'create_api':
-            api_title = self.visit(node.args[0])
-            self.create_api(api_title)
-        elif func_name == 'db_insert':
-            table_name = self.visit(node.args[0])
-            data = self.visit(node.args[1])
-            self.db_insert(table_name, data)
-        elif func_name == 'db_query':
-            table_name = self.visit(node.args[0])
-            self.db_query(table_name)
-        elif func_name == 'db_create_table':
-            table_name = self.visit(node.args[0])
-            columns = self.visit(node.args[1])
-            self.db_create_table(table_name, columns)
-        else:
-            raise Exception(f'Función "{func_name}" no definida')
+        variables = self.context.variables
+        slot = node.slot if node.slot >= 0 else variables.slot(node.name)
+        value = variables.slots[slot]
+        if value is UNBOUND:
+            raise Exception(f'Variable "{node.name}" no definida')
+        return value
+
+    def visit_GlobalVar(self, node: GlobalVar) -> Any:
+        """Devuelve el valor de una variable global leída desde una función."""
+        variables = self.context.global_variables
+        slot = node.slot if node.slot >= 0 else variables.slot(node.name)
+        value = variables.slots[slot]
+        if value is UNBOUND:
+            raise Exception(f'Variable "{node.name}" no definida')
+        return value
+
+    def visit_FuncCall(self, node: FuncCall) -> Any:
+        """Evalúa los argumentos y ejecuta la función nativa enlazada."""
+        native = node.native
+        if native is None:
+            native = self.natives.resolve(node.name, len(node.args))
+        return native.func(self, *[self.visit(arg) for arg in node.args])
+
+    def call_function(self, func_name: str, args: list[Any]) -> Any:
+        """Ejecuta una función nativa por nombre con los argumentos ya evaluados."""
+        return self.natives.resolve(func_name, len(args)).func(self, *args)
+
+    def print_values(self, values: Iterable[Any]) -> None:
+        """Imprime los valores concatenados en una línea.
+
+        Un resultado de `db_query` impreso solo se muestra fila a fila, sin
+        cargarlo entero en memoria.
+        """
+        values = tuple(values)
+        if len(values) == 1 and isinstance(values[0], RowSet):
+            output = get_output()
+            for row in values[0]:
+                output.print(str(row), style="bold yellow")
+            return
+        get_output().print(''.join(map(str, values)), style="bold green")
 
     def visit_IndexAccess(self, node: IndexAccess) -> Any:
         """Evalúa el acceso a un elemento de un contenedor."""
@@ -188,71 +335,250 @@ class Interpreter:
         except (TypeError, KeyError, IndexError) as e:
             raise Exception(f'Error al acceder al elemento: {e}')
 
-    def connect_db(self, db_path: str) -> None:
-        """Conecta a una base de datos SQLite."""
-        console.rule("[red]Step: Conexión con la base de datos[/red]")
-        with console.status(f"conectando a la base de datos: {db_path}"):
-            self.context.database = sqlite3.connect(db_path, check_same_thread=False)
-        console.print(f"[bold blue]Conectado a la base de datos: {db_path}[/bold blue]\n")
-
-    def create_api(self, title: str) -> None:
-        """Crea y levanta una API con FastAPI."""
-        console.rule("[red]Step: Creando la API[/red]")
-        console.print("Running API...:shooting_star:\n")
-
-        with console.status(f"Creando la API: {title}..."):
-            self.context.app = APIApp(title).app
-            app = self.context.app
-
-            @app.get("/")
-            def health_check():
-                return {"status": "OK!"}
-
-            def run():
-                uvicorn.run(app, host="127.0.0.1", port=8000)
-
-            threading.Thread(target=run).start()
+    def connect_db(self, db_path: str, options: Optional[dict[str, Any]] = None) -> None:
+        """Conecta a una base de datos SQLite.
+
+        `options` configura el `ConnectionManager` (`journal_mode`,
+        `synchronous`, `cache_size`, `statement_cache` y `timeout`).
+        """
+        output = get_output()
+        output.step("Conexión con la base de datos")
+        with output.status(f"conectando a la base de datos: {db_path}"):
+            manager = ConnectionManager.from_options(db_path, options)
+            manager.connection()
+            if self.context.database is not None:
+                self.context.database.close()
+            self.context.database = manager
+        output.print(f"Conectado a la base de datos: {db_path}\n", style="bold blue")
+
+    def create_api(self, title: str, options: Optional[dict[str, Any]] = None) -> None:
+        """Crea y levanta una API con FastAPI.
+
+        Con un solo proceso (`workers` = 1, por defecto) la API se sirve en un
+        hilo y el script continúa. Con varios, `create_api` bloquea: cada
+        proceso carga una instantánea de las rutas compiladas y de las
+        variables, y la llamada vuelve cuando se detiene el servidor.
+        """
+        serve = subsystems.require('serve', 'api')
+        server_options = serve.ServerOptions.from_options(options)
+        output = get_output()
+        output.step("Creando la API")
+        output.print("Running API...", emoji="shooting_star")
+        output.print("")
+
+        address = f"http://{server_options.host}:{server_options.port}"
+        if server_options.workers > 1:
+            snapshot = serve.take_snapshot(self.context, title, server_options, self.natives)
+            output.print(f"API levantada en {address} con {server_options.workers} procesos\n", style="bold magenta")
+            output.flush()
+            serve.serve_workers(snapshot, server_options)
+            return
+
+        with output.status(f"Creando la API: {title}..."):
+            APIApp = subsystems.require('apiapp', 'api').APIApp
+            api = self.context.app = APIApp(title, workers=server_options.threads, limits=server_options.limits)
+            for handler in self.context.routes:
+                api.add_route(handler)
+            api.add_health_check(self.context.routes)
+            serve.serve_in_thread(api.app, server_options)
+
+        output.print(f"API levantada en {address}\n", style="bold magenta")
+
+    def require_database(self) -> Any:
+        """Devuelve la conexión del hilo actual o lanza un error si no hay base de datos."""
+        if not self.context.database:
+            raise Exception('No hay conexión a la base de datos.')
+        return self.context.database.connection()
 
-        console.print("[bold magenta]API levantada en http://127.0.0.1:8000[/bold magenta]\n")
+    def commit(self) -> None:
+        """Confirma los cambios, salvo dentro de una transacción explícita."""
+        if not self.context.transaction:
+            self.require_database().commit()
 
     def db_insert(self, table_name: str, data: dict[Any, Any]) -> None:
         """Inserta datos en la base de datos."""
-        if not self.context.database:
-            raise Exception('No hay conexión a la base de datos.')
-        console.rule("[red]Step: Insetando datos[/red]")
-        with console.status(f"Insertando datos en la tabla: {table_name}"):
-            columns = ', '.join(data.keys())
-            placeholders = ', '.join('?' * len(data))
-            sql = f'INSERT INTO {table_name} ({columns}) VALUES ({placeholders})'
-            self.context.database.execute(sql, tuple(data.values()))
-            self.context.database.commit()
-            console.print(f"[bold green]Datos insertados en {table_name}[/bold green]\n")
-
-    def db_query(self, table_name: str) -> None:
-        """Recupera datos de la base de datos."""
-        if not self.context.database:
-            raise Exception('No hay conexión a la base de datos.')
-        console.rule("[red]Step: Obteniendo datos[/red]")
-        with console.status(f"Obteniendo todos los datos de la tabla: {table_name}"):
-            cursor = self.context.database.execute(f'SELECT * FROM {table_name}')
-            rows = cursor.fetchall()
+        database = self.require_database()
+        sql = insert_statement(table_name, tuple(data.keys()))
+        if self.context.transaction:
+            # Dentro de una transacción no se confirma ni se dibuja nada por fila
+            database.execute(sql, tuple(data.values()))
+            self.context.pending_rows += 1
+            return
+        output = get_output()
+        output.step("Insetando datos")
+        with output.status(f"Insertando datos en la tabla: {table_name}"):
+            database.execute(sql, tuple(data.values()))
+            database.commit()
+            invalidate_routes(self.context.routes, table_name)
+            output.print(f"Datos insertados en {table_name}\n", style="bold green")
+
+    def db_insert_many(self, table_name: str, rows: list[dict[Any, Any]]) -> int:
+        """Inserta una lista de filas con `executemany` y una sola confirmación.
+
+        Todas las filas deben tener las mismas columnas que la primera. Fuera
+        de una transacción la inserción es atómica: si falla una fila, se
+        deshace todo el lote. Devuelve el número de filas insertadas.
+        """
+        database = self.require_database()
+        if not rows:
+            return 0
+        columns = tuple(rows[0].keys())
+        sql = insert_statement(table_name, columns)
+        column_set = set(columns)
+
+        def values():
             for row in rows:
-                console.print(f"[bold yellow]{row}[/bold yellow]")
+                if not isinstance(row, dict) or row.keys() != column_set:
+                    raise Exception(f'Todas las filas deben tener las columnas: {", ".join(columns)}')
+                yield tuple(row[column] for column in columns)
+
+        output = get_output()
+        output.step("Insertando datos")
+        inserted = 0
+        with output.status(f"Insertando {len(rows)} filas en la tabla: {table_name}") as status:
+            pending = values()
+            last_update = time.perf_counter()
+            try:
+                while True:
+                    batch = list(itertools.islice(pending, INSERT_BATCH_SIZE))
+                    if not batch:
+                        break
+                    database.executemany(sql, batch)
+                    inserted += len(batch)
+                    now = time.perf_counter()
+                    if now - last_update >= PROGRESS_INTERVAL:
+                        status.update(f"Insertando en la tabla {table_name}: {inserted}/{len(rows)} filas")
+                        last_update = now
+            except Exception:
+                if not self.context.transaction:
+                    database.rollback()
+                raise
+            self.commit()
+        if self.context.transaction:
+            self.context.pending_rows += inserted
+        else:
+            invalidate_routes(self.context.routes, table_name)
+        output.print(f"{inserted} filas insertadas en {table_name}\n", style="bold green")
+        return inserted
+
+    def api_cache_stats(self) -> dict[str, dict[str, int]]:
+        """Contadores de la caché de cada ruta cacheada, indexados por "MÉTODO ruta"."""
+        return {
+            f'{handler.method} {handler.path}': handler.cache.stats()
+            for handler in self.context.routes if handler.cache is not None
+        }
+
+    def api_limit_stats(self) -> dict[str, dict[str, Any]]:
+        """Consumo de las ejecuciones con límites de cada ruta, indexado por "MÉTODO ruta"."""
+        return {
+            f'{handler.method} {handler.path}': handler.limit_stats.stats()
+            for handler in self.context.routes
+            if handler.limits is not None or handler.limit_stats.executions
+        }
+
+    def memo_stats(self) -> dict[str, dict[str, int]]:
+        """Contadores de la caché de cada función marcada con `memo`, por nombre."""
+        return {
+            function.name: function.memo.stats()
+            for function in user_functions(self.natives) if function.memo is not None
+        }
+
+    def db_begin(self) -> None:
+        """Abre una transacción: las inserciones siguientes comparten un único commit."""
+        database = self.require_database()
+        if self.context.transaction:
+            raise Exception('Ya hay una transacción abierta.')
+        database.execute('BEGIN')
+        self.context.transaction = True
+        self.context.pending_rows = 0
+
+    def db_commit(self) -> None:
+        """Confirma la transacción abierta con `db_begin`."""
+        database = self.require_database()
+        if not self.context.transaction:
+            raise Exception('No hay ninguna transacción abierta.')
+        database.commit()
+        self.context.transaction = False
+        # Lo insertado en la transacción se hace visible ahora
+        invalidate_routes(self.context.routes)
+        get_output().print(f"Transacción confirmada: {self.context.pending_rows} filas insertadas\n", style="bold green")
+
+    def db_rollback(self) -> None:
+        """Deshace la transacción abierta con `db_begin`."""
+        database = self.require_database()
+        if not self.context.transaction:
+            raise Exception('No hay ninguna transacción abierta.')
+        database.rollback()
+        self.context.transaction = False
+        get_output().print(f"Transacción deshecha: {self.context.pending_rows} filas descartadas\n", style="bold yellow")
+
+    def db_query(self, table_name: str, options: Optional[dict[str, Any]] = None) -> RowSet:
+        """Devuelve las filas de una tabla como un resultado perezoso.
+
+        `options` admite `columns`, `where`, `order_by` y `limit` (ver
+        `database.build_select`); la consulta no se ejecuta hasta que se
+        recorre, indexa o imprime el resultado.
+        """
+        sql, params = build_select(table_name, options)
+        self.require_database()
+        return RowSet(self.context.database, sql, params, governor=self.context.governor)
 
     def db_create_table(self, table_name: str, columns: dict[str, str]) -> None:
-        """Crea una tabla en la base de datos."""
-        if not self.context.database:
-            raise Exception('No hay conexión a la base de datos.')
-        console.rule("[red]Step: Creando tabla[/red]")
-        with console.status(f"Creando la tabla {table_name}..."):
+        """Crea una tabla en la base de datos.
+
+        La tabla y las columnas se comprueban con `check_identifier`, como en
+        las inserciones y las consultas.
+        """
+        table_name = check_identifier(table_name, 'tabla')
+        if not isinstance(columns, dict) or not columns:
+            raise Exception('Las columnas de db_create_table deben ser un diccionario columna -> tipo')
+        for col_name, col_type in columns.items():
+            check_identifier(col_name)
+            if not isinstance(col_type, str):
+                raise Exception(f'El tipo de la columna "{col_name}" debe ser una cadena, no {type(col_type).__name__}')
+        database = self.require_database()
+        output = get_output()
+        output.step("Creando tabla")
+        with output.status(f"Creando la tabla {table_name}..."):
             columns_def = ', '.join([f"{col_name} {col_type}" for col_name, col_type in columns.items()])
             sql = f'CREATE TABLE IF NOT EXISTS {table_name} ({columns_def});'
-            self.context.database.execute('PRAGMA encoding="UTF-8";')
-            self.context.database.execute(sql)
-            self.context.database.commit()
-        console.print(f"[bold green]Tabla '{table_name}' creada con éxito[/bold green]\n")
+            database.execute('PRAGMA encoding="UTF-8";')
+            database.execute(sql)
+            self.commit()
+        invalidate_routes(self.context.routes, table_name)
+        output.print(f"Tabla '{table_name}' creada con éxito\n", style="bold green")
 
     def interpret(self) -> None:
-        """Interpreta el AST completo."""
-        for node in self.tree:
+        """Interpreta el AST completo.
+
+        Las llamadas se enlazan con sus funciones nativas antes de ejecutar:
+        todo el árbol de golpe si es una lista, o sentencia a sentencia en
+        modo streaming. Las funciones del script se registran en una copia
+        del registro de nativas.
+        """
+        resolver = Resolver(self.natives.copy(), self.context.variables)
+        self.natives = resolver.natives
+        if isinstance(self.tree, list):
+            tree = resolver.resolve(self.tree)
+        else:
+            tree = resolver.resolve_stream(self.tree)
+        for node in tree:
             self.visit(node)
+
+
+@attr.s(auto_attribs=True)
+class GovernedInterpreter(Interpreter):
+    """Intérprete que cuenta cada nodo visitado contra los límites de `context.governor`.
+
+    Solo se usa en las ejecuciones con límites: el intérprete normal no
+    lleva ninguna cuenta.
+    """
+
+    def visit(self, node: Any) -> Any:
+        self.context.governor.step()
+        return super().visit(node)
+
+    def visit_Assign(self, node: Assign) -> None:
+        super().visit_Assign(node)
+        name = node.left.name
+        self.context.governor.check_value(name, self.context.variables[name])
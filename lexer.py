@@ -1,10 +1,14 @@
 import attr
+import re
+
+from typing import Optional, TextIO
 
 from tokens import (
     PLUS, MINUS, NUMBER, LPAREN, RPAREN, IDENTIFIER, MUL, DIV,
-    ASSIGN, COMMA, EOF, STRING, LBRACE, RBRACE, COLON, BOOLEAN,
+    ASSIGN, COMMA, EOF, STRING, LBRACE, RBRACE, COLON,
     TRUE, FALSE, IF, ELIF, ELSE, AND, OR, NOT, NOT_EQUALS, GREATER_EQUAL,
-    GREATER_THAN, LESS_EQUAL, LESS_THAN, EQUALS, LBRACKET, RBRACKET
+    GREATER_THAN, LESS_EQUAL, LESS_THAN, EQUALS, LBRACKET, RBRACKET, ROUTE, RETURN,
+    DEF, MEMO, PARALLEL
 )
 
 
@@ -22,6 +26,12 @@ CHAR_TOKENS_SWITCHER = {
     '[': (LBRACKET, '['),
     ']': (RBRACKET, ']'),
     ':': (COLON, ':'),
+    '==': (EQUALS, '=='),
+    '!=': (NOT_EQUALS, '!='),
+    '<': (LESS_THAN, '<'),
+    '>': (GREATER_THAN, '>'),
+    '<=': (LESS_EQUAL, '<='),
+    '>=': (GREATER_EQUAL, '>='),
 }
 
 IDENTIFIER_SWITCHER = {
@@ -35,130 +45,144 @@ IDENTIFIER_SWITCHER = {
     'not': NOT,
 }
 
+# Palabras reservadas que solo lo son en minúsculas: se añadieron después y
+# así `Memo = 1` o `Return = x` de los scripts existentes siguen siendo
+# variables.
+KEYWORDS = {
+    'route': ROUTE,
+    'return': RETURN,
+    'def': DEF,
+    'memo': MEMO,
+    'parallel': PARALLEL,
+}
+
+# Expresión maestra: un único `match` por token, con los espacios previos
+# absorbidos en el mismo match. Los operadores de dos caracteres van antes
+# que los de uno y las cadenas sin cerrar llegan hasta el final del texto,
+# como en el lexer original.
+TOKEN_REGEX = re.compile(r'''
+    \s*
+    (?:
+        (?P<IDENTIFIER>[^\W\d]\w*)
+      | (?P<OPERATOR>==|!=|<=|>=|[-+*/(),{}\[\]:=<>])
+      | (?P<NUMBER>\d+)
+      | (?P<STRING>"[^"\\]*(?:\\.[^"\\]*)*(?:"|\Z)|'[^'\\]*(?:\\.[^'\\]*)*(?:'|\Z))
+      | (?P<EOF>\Z)
+    )
+''', re.VERBOSE | re.DOTALL)
+
+IDENTIFIER_GROUP = TOKEN_REGEX.groupindex['IDENTIFIER']
+NUMBER_GROUP = TOKEN_REGEX.groupindex['NUMBER']
+STRING_GROUP = TOKEN_REGEX.groupindex['STRING']
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
 
 @attr.s(auto_attribs=True)
 class Lexer:
-    """Analizador léxico que convierte el código fuente en tokens."""
-    text: str
+    """Analizador léxico que convierte el código fuente en tokens.
+
+    El código puede venir completo en `text` o leerse por bloques desde
+    `stream`, de modo que nunca hace falta tener el fichero entero en memoria.
+    """
+    text: str = ''
+    stream: Optional[TextIO] = None
+    chunk_size: int = DEFAULT_CHUNK_SIZE
 
     def __attrs_post_init__(self):
-        """Inicializa el lexer estableciendo la posición y el carácter actual."""
+        """Inicializa el lexer en la primera posición del texto."""
         self.pos = 0
-        self.current_char = self.text[self.pos]
+        self._tokens = self._scan()
+
+    @classmethod
+    def from_stream(cls, stream: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> 'Lexer':
+        """Crea un lexer que lee el código de `stream` de forma incremental."""
+        return cls(stream=stream, chunk_size=chunk_size)
 
     def error(self) -> None:
         """Lanza una excepción de análisis léxico."""
         raise Exception('Error de análisis léxico')
 
-    def advance(self) -> None:
-        """Avanza al siguiente carácter en el texto."""
-        self.pos += 1
-        if self.pos >= len(self.text):
-            self.current_char = None  # Indicador de fin de entrada
+    def string(self, raw: str) -> tuple:
+        """Devuelve un token de tipo STRING a partir del literal con comillas."""
+        if len(raw) > 1 and raw[-1] == raw[0] and not _ends_escaped(raw):
+            value = raw[1:-1]
         else:
-            self.current_char = self.text[self.pos]
-
-    def skip_whitespace(self) -> None:
-        """Salta los espacios en blanco."""
-        while self.current_char and self.current_char.isspace():
-            self.advance()
-
-    def number(self) -> tuple:
-        """Devuelve un token de tipo NUMBER."""
-        result = ''
-        while self.current_char and self.current_char.isdigit():
-            result += self.current_char
-            self.advance()
-        return (NUMBER, int(result))
-
-    def boolean(self) -> tuple:
-        """Devuelve un token de tipo BOOLEAN."""
-        result = ''
-        while self.current_char and isinstance(self.current_char, bool):
-            result += self.current_char
-            self.advance()
-        return (BOOLEAN, bool(result))
-
-    def identifier(self) -> tuple:
-        """Devuelve un token de tipo IDENTIFIER o palabra clave."""
-        result = ''
-        while self.current_char and (
-            self.current_char.isalnum() or self.current_char == '_'
-        ):
-            result += self.current_char
-            self.advance()
-    
-        result_lower = result.lower()
-        token_type = IDENTIFIER_SWITCHER.get(result_lower, IDENTIFIER)
-
-        if token_type != IDENTIFIER:
-            return (token_type, result)
-
-        return (IDENTIFIER, result)
-
-    def string(self) -> tuple:
-        """Devuelve un token de tipo STRING."""
-        quote_char = self.current_char
-        result = ''
-        self.advance()  # Saltar la comilla inicial
-        while self.current_char and self.current_char != quote_char:
-            if self.current_char == '\\':
-                self.advance()
-                if self.current_char in ['"', "'", '\\']:
-                    result += self.current_char
-                else:
-                    result += '\\' + self.current_char
+            value = raw[1:]  # Cadena sin cerrar
+        if '\\' in value:
+            value = _unescape(value)
+        return (STRING, value)
+
+    def _scan(self):
+        """Generador que recorre el texto con la expresión maestra.
+
+        Los identificadores y operadores se repiten mucho en los scripts
+        generados, así que sus tokens se reutilizan desde una caché indexada
+        por el texto del lexema.
+        """
+        text = self.text
+        stream = self.stream
+        match = TOKEN_REGEX.match
+        cache = dict(CHAR_TOKENS_SWITCHER)
+        pos = 0
+        base = 0  # Posición absoluta del inicio de `text` en el código fuente
+        while True:
+            m = match(text, pos)
+            if stream is not None and (m is None or m.end() == len(text)):
+                # El token puede continuar en el siguiente bloque: se descarta
+                # lo ya consumido, se añade más texto y se repite el match.
+                chunk = stream.read(max(self.chunk_size, len(text) - pos))
+                if chunk:
+                    base += pos
+                    text = text[pos:] + chunk
+                    pos = 0
+                    continue
+                stream = None
+            if m is None:
+                self.pos = base + pos
+                self.error()
+            pos = m.end()
+            self.pos = base + pos
+            group = m.lastindex
+            value = m.group(group)
+            token = cache.get(value)
+            if token is not None:
+                yield token
+            elif group == IDENTIFIER_GROUP:
+                token = cache[value] = (
+                    KEYWORDS.get(value) or IDENTIFIER_SWITCHER.get(value.lower(), IDENTIFIER), value
+                )
+                yield token
+            elif group == NUMBER_GROUP:
+                yield (NUMBER, int(value))
+            elif group == STRING_GROUP:
+                yield self.string(value)
             else:
-                result += self.current_char
-            self.advance()
-        self.advance()  # Saltar la comilla final
-        return (STRING, result)
+                while True:
+                    yield (EOF, None)
 
     def get_next_token(self) -> tuple:
         """Analiza y devuelve el siguiente token."""
-        while self.current_char:
-            if self.current_char.isspace():
-                self.skip_whitespace()
-                continue
-            elif self.current_char.isdigit():
-                return self.number()
-            elif self.current_char.isalpha() or self.current_char == '_':
-                return self.identifier()
-
-            token = CHAR_TOKENS_SWITCHER.get(self.current_char)
-
-            if self.current_char == '=':
-                self.advance()
-                if self.current_char == '=':
-                    self.advance()
-                    return (EQUALS, '==')
-                return (ASSIGN, '=')
-
-            if self.current_char == '!':
-                self.advance()
-                if self.current_char == '=':
-                    self.advance()
-                    return (NOT_EQUALS, '!=')
-                self.error()
+        return next(self._tokens)
+
+    def tokens(self):
+        """Generador con todos los tokens restantes, incluido EOF."""
+        while True:
+            token = self.get_next_token()
+            yield token
+            if token[0] == EOF:
+                return
+
+
+def _ends_escaped(raw: str) -> bool:
+    """Indica si la comilla final de `raw` está escapada por una barra invertida."""
+    backslashes = len(raw) - 1 - len(raw[:-1].rstrip('\\'))
+    return backslashes % 2 == 1
+
 
-            if self.current_char == '<':
-                self.advance()
-                if self.current_char == '=':
-                    self.advance()
-                    return (LESS_EQUAL, '<=')
-                return (LESS_THAN, '<')
-
-            if self.current_char == '>':
-                self.advance()
-                if self.current_char == '=':
-                    self.advance()
-                    return (GREATER_EQUAL, '>=')
-                return (GREATER_THAN, '>')
-
-            if token:
-                self.advance()
-                return token
-            if self.current_char in ['"', "'"]:
-                return self.string()
-            self.error()
-        return (EOF, None)
+def _unescape(value: str) -> str:
+    """Resuelve los escapes \\", \\' y \\\\; el resto de secuencias se conservan tal cual."""
+    return '\\'.join(
+        part.replace('\\"', '"').replace("\\'", "'")
+        for part in value.split('\\\\')
+    )
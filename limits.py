@@ -0,0 +1,253 @@
+"""Límites de recursos de una ejecución: pasos, tiempo, tamaño de los valores y filas leídas.
+
+Cada ejecución limitada (una petición a una ruta con la opción `limits`)
+lleva en su `Context` un `Governor` que cuenta lo que consume y lanza
+`LimitExceeded` en cuanto se pasa de alguno de los límites. Sin límites no
+hay `Governor` y la ejecución no comprueba nada.
+"""
+
+import attr
+import sys
+import threading
+import time
+
+from typing import Any, Optional
+
+from arrays import NumArray
+
+
+LIMIT_OPTIONS = ('max_steps', 'timeout', 'max_value_size', 'max_rows')
+
+# Pasos entre dos consultas del reloj en el intérprete del AST.
+DEADLINE_CHECK_INTERVAL = 256
+
+
+class LimitExceeded(Exception):
+    """Error de una ejecución que ha superado uno de sus límites (`limit` es su nombre)."""
+
+    def __init__(self, limit: str, message: str):
+        super().__init__(message)
+        self.limit = limit
+
+
+def _check_positive(options: dict[str, Any], name: str, types: tuple[type, ...], kind: str) -> None:
+    value = options.get(name)
+    if value is None:
+        return
+    if not isinstance(value, types) or isinstance(value, bool) or value <= 0:
+        raise Exception(f'La opción "{name}" de limits debe ser {kind} mayor que 0')
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class Limits:
+    """Límites de una ejecución; None significa sin límite.
+
+    - `max_steps`: nodos del AST visitados (motor AST) o instrucciones de
+      bytecode ejecutadas (VM). Solo cuenta lo que se ejecuta, no las ramas
+      que no se toman. El compilador genera más o menos una instrucción por
+      nodo, así que los dos motores dan cifras parecidas, aunque no iguales.
+    - `timeout`: segundos de reloj desde que empieza la ejecución. Se
+      comprueba entre pasos y entre bloques de filas, así que una única
+      llamada nativa lenta no se interrumpe.
+    - `max_value_size`: bytes (aproximados) del valor que se asigna a una
+      variable, contando los elementos de listas, diccionarios y arrays.
+    - `max_rows`: filas leídas de la base de datos en total.
+    """
+    max_steps: Optional[int] = None
+    timeout: Optional[float] = None
+    max_value_size: Optional[int] = None
+    max_rows: Optional[int] = None
+
+    @classmethod
+    def from_options(cls, options: Any) -> 'Limits':
+        """Valida el diccionario de la opción `limits`."""
+        if not isinstance(options, dict):
+            raise Exception('La opción "limits" debe ser un diccionario')
+        unknown = [key for key in options if key not in LIMIT_OPTIONS]
+        if unknown:
+            raise Exception(f'Límites desconocidos: {", ".join(map(str, unknown))}')
+        _check_positive(options, 'max_steps', (int,), 'un entero')
+        _check_positive(options, 'timeout', (int, float), 'un número de segundos')
+        _check_positive(options, 'max_value_size', (int,), 'un número de bytes')
+        _check_positive(options, 'max_rows', (int,), 'un entero')
+        return cls(**options)
+
+
+def value_size(value: Any, limit: Optional[int] = None) -> int:
+    """Tamaño aproximado en bytes de un valor y de los elementos que contiene.
+
+    Con `limit`, deja de contar en cuanto lo supera: el resultado solo
+    indica entonces que el valor es mayor que el límite.
+    """
+    total = 0
+    pending = [value]
+    while pending:
+        item = pending.pop()
+        total += sys.getsizeof(item)
+        if isinstance(item, NumArray):
+            pending.append(item.data)  # `getsizeof` del array incluye su buffer
+        elif isinstance(item, dict):
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            pending.extend(item)
+        if limit is not None and total > limit:
+            break
+    return total
+
+
+@attr.s(auto_attribs=True, eq=False)
+class Governor:
+    """Consumo de una ejecución limitada por `limits`."""
+    limits: Limits
+
+    def __attrs_post_init__(self):
+        self.steps = 0
+        self.rows = 0
+        self.started = time.monotonic()
+        self.deadline = self.started + self.limits.timeout if self.limits.timeout is not None else None
+        self._next_check = DEADLINE_CHECK_INTERVAL
+
+    def step(self, count: int = 1) -> None:
+        """Cuenta `count` pasos y comprueba los límites de pasos y de tiempo."""
+        self.steps += count
+        self.check_steps(self.steps)
+        if self.deadline is not None and self.steps >= self._next_check:
+            self._next_check = self.steps + DEADLINE_CHECK_INTERVAL
+            self.check_deadline()
+
+    def check_steps(self, steps: int) -> None:
+        max_steps = self.limits.max_steps
+        if max_steps is not None and steps > max_steps:
+            raise LimitExceeded('max_steps', f'Se ha superado el límite de {max_steps} pasos de ejecución')
+
+    def check_deadline(self) -> None:
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise LimitExceeded('timeout', f'Se ha superado el tiempo máximo de ejecución ({self.limits.timeout} s)')
+
+    def check_value(self, name: str, value: Any) -> None:
+        """Comprueba el tamaño de un valor que se asigna a la variable `name`."""
+        limit = self.limits.max_value_size
+        if limit is not None and value_size(value, limit) > limit:
+            raise LimitExceeded(
+                'max_value_size', f'El valor asignado a "{name}" ocupa más de {limit} bytes'
+            )
+
+    def add_rows(self, count: int) -> None:
+        """Cuenta filas leídas de la base de datos."""
+        self.rows += count
+        self.check_rows(self.rows)
+        self.check_deadline()
+
+    def check_rows(self, rows: int) -> None:
+        max_rows = self.limits.max_rows
+        if max_rows is not None and rows > max_rows:
+            raise LimitExceeded('max_rows', f'Se ha superado el límite de {max_rows} filas leídas de la base de datos')
+
+    def fork(self, count: int) -> list['TaskGovernor']:
+        """Crea los `Governor` de las `count` tareas de un bloque parallel."""
+        tasks = []
+        tasks.extend(TaskGovernor(self, tasks) for _ in range(count))
+        return tasks
+
+    def join(self, tasks: list['TaskGovernor']) -> None:
+        """Suma lo que han consumido las tareas de un bloque parallel ya terminado."""
+        self.steps += sum(task.steps for task in tasks)
+        self.rows += sum(task.rows for task in tasks)
+
+
+@attr.s(auto_attribs=True, eq=False)
+class TaskGovernor:
+    """Consumo de una tarea de un bloque parallel.
+
+    Las tareas se ejecutan en hilos distintos, así que cada una lleva sus
+    propios contadores y ninguna actualización se pierde. Cada cierto número
+    de pasos se comprueban los límites con la suma de lo consumido antes del
+    bloque y por todas las tareas (`tasks`); el intervalo se acorta a medida
+    que se acerca el límite de pasos. Al terminar el bloque, `Governor.join`
+    suma los contadores al `Governor` de la ejecución.
+    """
+    governor: Governor
+    tasks: list['TaskGovernor'] = attr.ib(repr=False)
+
+    def __attrs_post_init__(self):
+        self.steps = 0
+        self.rows = 0
+        self._next_check = 0
+
+    def step(self, count: int = 1) -> None:
+        self.steps += count
+        if self.steps >= self._next_check:
+            self.check_steps()
+
+    def check_steps(self) -> None:
+        """Comprueba los límites de pasos y de tiempo y fija la siguiente comprobación."""
+        governor = self.governor
+        steps = governor.steps + sum(task.steps for task in self.tasks)
+        governor.check_steps(steps)
+        governor.check_deadline()
+        interval = DEADLINE_CHECK_INTERVAL
+        max_steps = governor.limits.max_steps
+        if max_steps is not None:
+            # Aunque todas las tareas avancen a la vez, entre dos comprobaciones
+            # no pueden pasarse del límite más que en unos pocos pasos
+            interval = min(interval, max(1, (max_steps - steps) // len(self.tasks)))
+        self._next_check = self.steps + interval
+
+    def check_deadline(self) -> None:
+        self.governor.check_deadline()
+
+    def check_value(self, name: str, value: Any) -> None:
+        self.governor.check_value(name, value)
+
+    def fork(self, count: int) -> list['TaskGovernor']:
+        # Un bloque parallel dentro de una tarea se ejecuta en el hilo de
+        # esta, una sentencia tras otra: todas pueden contar aquí
+        return [self] * count
+
+    def join(self, tasks: list['TaskGovernor']) -> None:
+        pass
+
+    def add_rows(self, count: int) -> None:
+        self.rows += count
+        governor = self.governor
+        governor.check_rows(governor.rows + sum(task.rows for task in self.tasks))
+        governor.check_deadline()
+
+
+@attr.s(auto_attribs=True, eq=False)
+class LimitStats:
+    """Métricas de las ejecuciones limitadas de una ruta."""
+
+    def __attrs_post_init__(self):
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.steps = 0
+        self.max_steps = 0
+        self.rows = 0
+        self.max_seconds = 0.0
+        self.exceeded = dict.fromkeys(LIMIT_OPTIONS, 0)
+
+    def record(self, governor: Governor, error: Optional[LimitExceeded] = None) -> None:
+        """Suma el consumo de una ejecución terminada y, si la hubo, la superación de un límite."""
+        elapsed = time.monotonic() - governor.started
+        with self._lock:
+            self.executions += 1
+            self.steps += governor.steps
+            self.max_steps = max(self.max_steps, governor.steps)
+            self.rows += governor.rows
+            self.max_seconds = max(self.max_seconds, elapsed)
+            if error is not None:
+                self.exceeded[error.limit] += 1
+
+    def stats(self) -> dict[str, Any]:
+        """Contadores de las ejecuciones."""
+        with self._lock:
+            return {
+                'executions': self.executions,
+                'steps': self.steps,
+                'max_steps': self.max_steps,
+                'rows': self.rows,
+                'max_seconds': round(self.max_seconds, 6),
+                'exceeded': dict(self.exceeded),
+            }
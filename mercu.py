@@ -1,31 +1,171 @@
 #!/usr/bin/env python3
 
+import time
+
+IMPORT_START = time.perf_counter()
+
+import argparse
 import sys
+from typing import Any, Optional
 from lexer import Lexer
 from parser import Parser
 from interpreter import Interpreter
+from compiler import Compiler
+from vm import VM
+from cache import ProgramCache
+from optimizer import Optimizer
+from functions import raise_recursion_limit
+import output
+import subsystems
+
+CORE_IMPORT_TIME = time.perf_counter() - IMPORT_START
 
 sys.stdout.reconfigure(encoding='utf-8')
 
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    arg_parser = argparse.ArgumentParser(prog='mercu', usage='mercu [opciones] archivo.mer')
+    arg_parser.add_argument('filename', nargs='?', help='archivo .mer a ejecutar')
+    arg_parser.add_argument(
+        '--engine', choices=('vm', 'ast'), default='vm',
+        help='motor de ejecución: bytecode + VM (por defecto) o recorrido del AST'
+    )
+    arg_parser.add_argument(
+        '--stream', action='store_true',
+        help='lee, analiza y ejecuta el script sentencia a sentencia con memoria constante'
+    )
+    arg_parser.add_argument(
+        '--dis', action='store_true',
+        help='muestra el bytecode compilado en lugar de ejecutarlo'
+    )
+    arg_parser.add_argument(
+        '--no-cache', action='store_true',
+        help='no lee ni escribe la caché de programas compilados (__mercucache__)'
+    )
+    arg_parser.add_argument(
+        '--no-optimize', action='store_true',
+        help='desactiva el plegado de constantes y la poda de ramas'
+    )
+    arg_parser.add_argument(
+        '--debug-opt', action='store_true',
+        help='muestra en stderr cuántos nodos elimina el optimizador (ignora la caché)'
+    )
+    arg_parser.add_argument(
+        '--startup-profile', action='store_true',
+        help='al terminar, muestra en stderr el tiempo de importación de cada subsistema'
+    )
+    arg_parser.add_argument(
+        '--output', choices=output.OUTPUT_MODES, default='auto',
+        help='salida con rich o en texto plano; auto usa texto plano si stdout no es una terminal'
+    )
+    arg_parser.add_argument(
+        '--plain', dest='output', action='store_const', const='plain',
+        help='equivale a --output plain'
+    )
+    arg_parser.add_argument(
+        '--profile', action='store_true',
+        help='ejecuta con el perfilador (motor AST, sin optimizar) y muestra en stderr los puntos calientes'
+    )
+    arg_parser.add_argument(
+        '--profile-collapsed', metavar='FICHERO',
+        help='con --profile, guarda las pilas en formato collapsed para generar un flamegraph'
+    )
+    arg_parser.add_argument(
+        '--watch', action='store_true',
+        help='vuelve a ejecutar el script con cada cambio, reanudando desde la primera sentencia modificada'
+    )
+    arg_parser.add_argument(
+        '--compile', metavar='DIRECTORIO',
+        help='precompila todos los .mer del directorio en la caché y termina'
+    )
+    return arg_parser
+
+
 def main():
     if len(sys.argv) < 2:
         print("Uso: mercu archivo.mer")
         sys.exit(1)
+    if sys.argv[1] == 'serve':
+        subsystems.require('daemon', 'servidor').serve_main(sys.argv[2:])
+        return
+    if sys.argv[1] == 'run-many':
+        subsystems.require('batch', 'lotes').main(sys.argv[2:])
+        return
+
+    args = build_arg_parser().parse_args()
+    output.configure(args.output)
+    raise_recursion_limit()
+    try:
+        run(args)
+    finally:
+        # Antes de que un posible error se escriba en stderr
+        output.flush()
+        if args.startup_profile:
+            print(subsystems.startup_report(CORE_IMPORT_TIME), file=sys.stderr)
+
+
+def run(args: argparse.Namespace) -> None:
+    """Ejecuta la acción pedida en la línea de comandos."""
+    engine = 'vm' if args.dis else args.engine
+    cache = ProgramCache(
+        engine=engine,
+        enabled=not (args.no_cache or args.debug_opt),
+        optimize=not args.no_optimize,
+    )
 
-    filename = sys.argv[1]
+    if args.compile:
+        count = cache.compile_directory(args.compile)
+        print(f"{count} archivo(s) .mer precompilado(s) en {args.compile}")
+        return
+
+    filename = args.filename
+    if not filename:
+        print("Uso: mercu archivo.mer")
+        sys.exit(1)
     if not filename.endswith('.mer'):
         print("Error: La extensión del archivo debe ser .mer")
         sys.exit(1)
 
+    if args.profile:
+        subsystems.require('profiler', 'perfilador').profile_file(filename, args.profile_collapsed)
+        return
+
+    if args.watch:
+        subsystems.require('watch', 'vigilancia').watch_file(filename, engine, optimize=not args.no_optimize)
+        return
+
+    if args.stream and not args.dis:
+        optimizer = None if args.no_optimize else Optimizer()
+        run_stream(filename, engine, optimizer)
+        report_optimizer(args, optimizer.stats if optimizer else None)
+        return
+
+    program = cache.load(filename)
+    report_optimizer(args, cache.stats)
+    if args.dis:
+        print(program.disassemble())
+    elif engine == 'ast':
+        Interpreter(program).interpret()
+    else:
+        VM(program).run()
+
+
+def run_stream(filename: str, engine: str, optimizer: Optional[Optimizer] = None) -> None:
+    """Ejecuta cada sentencia en cuanto se analiza, sin construir el AST completo."""
     with open(filename, 'r', encoding="utf-8") as file:
-        code = file.read()
+        statements = Parser(Lexer.from_stream(file)).statements()
+        if optimizer is not None:
+            statements = optimizer.optimize_stream(statements)
+        if engine == 'ast':
+            Interpreter(statements).interpret()
+        else:
+            VM().run_stream(Compiler.compile_stream(statements))
 
-    lexer = Lexer(code)
-    parser = Parser(lexer)
-    tree = parser.parse()
-    interpreter = Interpreter(tree)
-    interpreter.interpret()
 
+def report_optimizer(args: argparse.Namespace, stats: Optional[Any]) -> None:
+    """Muestra las estadísticas del optimizador si se pidió con --debug-opt."""
+    if args.debug_opt and stats is not None:
+        print(stats.report(), file=sys.stderr)
 
 if __name__ == '__main__':
     main()
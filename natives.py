@@ -0,0 +1,190 @@
+import arrays
+import attr
+
+from typing import Any, Callable, Optional, Union
+
+
+Arity = Union[int, tuple[int, Optional[int]]]
+
+
+@attr.s(auto_attribs=True, slots=True, frozen=True)
+class NativeFunction:
+    """Función nativa: implementación en Python, aridad y si es pura.
+
+    `func` recibe el intérprete que la ejecuta seguido de los argumentos ya
+    evaluados. Una función pura no tiene efectos secundarios ni usa el
+    intérprete, así que el optimizador puede evaluarla en compilación.
+    """
+    name: str
+    func: Callable[..., Any]
+    min_args: int
+    max_args: Optional[int]  # None: número variable de argumentos
+    pure: bool = False
+
+    def accepts(self, argc: int) -> bool:
+        """Indica si la función admite `argc` argumentos."""
+        return argc >= self.min_args and (self.max_args is None or argc <= self.max_args)
+
+    def describe_arity(self) -> str:
+        """Descripción legible del número de argumentos admitido."""
+        if self.max_args is None:
+            return f'al menos {self.min_args}'
+        if self.min_args == self.max_args:
+            return str(self.min_args)
+        return f'entre {self.min_args} y {self.max_args}'
+
+
+@attr.s(auto_attribs=True)
+class NativeRegistry:
+    """Registro de funciones nativas, indexado por nombre."""
+    functions: dict[str, NativeFunction] = attr.ib(factory=dict)
+
+    def register(self, name: str, arity: Arity, pure: bool = False) -> Callable:
+        """Decorador que registra `func(interpreter, *args)` como función nativa."""
+        min_args, max_args = (arity, arity) if isinstance(arity, int) else arity
+
+        def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+            self.functions[name] = NativeFunction(name, func, min_args, max_args, pure)
+            return func
+        return decorator
+
+    def lookup(self, name: str) -> Optional[NativeFunction]:
+        """Devuelve la función registrada con ese nombre, o None."""
+        return self.functions.get(name)
+
+    def check(self, name: str, argc: int) -> Optional[str]:
+        """Devuelve un mensaje de error si la llamada no es válida, o None."""
+        native = self.functions.get(name)
+        if native is None:
+            return f'Función "{name}" no definida'
+        if not native.accepts(argc):
+            return (
+                f'La función "{name}" espera {native.describe_arity()} argumento(s), '
+                f'pero recibe {argc}'
+            )
+        return None
+
+    def resolve(self, name: str, argc: int) -> NativeFunction:
+        """Devuelve la función para una llamada con `argc` argumentos o lanza un error."""
+        error = self.check(name, argc)
+        if error is not None:
+            raise Exception(error)
+        return self.functions[name]
+
+    def copy(self) -> 'NativeRegistry':
+        """Devuelve un registro independiente con las mismas funciones."""
+        return NativeRegistry(functions=dict(self.functions))
+
+
+DEFAULT_REGISTRY = NativeRegistry()
+register = DEFAULT_REGISTRY.register
+
+
+@register('print', arity=(0, None))
+def _print(interpreter, *values):
+    interpreter.print_values(values)
+
+
+@register('connect_db', arity=(1, 2))
+def _connect_db(interpreter, db_path, options=None):
+    interpreter.connect_db(db_path, options)
+
+
+@register('create_api', arity=(1, 2))
+def _create_api(interpreter, title, options=None):
+    interpreter.create_api(title, options)
+
+
+@register('db_insert', arity=2)
+def _db_insert(interpreter, table_name, data):
+    interpreter.db_insert(table_name, data)
+
+
+@register('db_insert_many', arity=2)
+def _db_insert_many(interpreter, table_name, rows):
+    return interpreter.db_insert_many(table_name, rows)
+
+
+@register('db_begin', arity=0)
+def _db_begin(interpreter):
+    interpreter.db_begin()
+
+
+@register('db_commit', arity=0)
+def _db_commit(interpreter):
+    interpreter.db_commit()
+
+
+@register('db_rollback', arity=0)
+def _db_rollback(interpreter):
+    interpreter.db_rollback()
+
+
+@register('db_query', arity=(1, 2))
+def _db_query(interpreter, table_name, options=None):
+    return interpreter.db_query(table_name, options)
+
+
+@register('db_create_table', arity=2)
+def _db_create_table(interpreter, table_name, columns):
+    interpreter.db_create_table(table_name, columns)
+
+
+@register('api_cache_stats', arity=0)
+def _api_cache_stats(interpreter):
+    return interpreter.api_cache_stats()
+
+
+@register('api_limit_stats', arity=0)
+def _api_limit_stats(interpreter):
+    return interpreter.api_limit_stats()
+
+
+@register('memo_stats', arity=0)
+def _memo_stats(interpreter):
+    return interpreter.memo_stats()
+
+
+@register('len', arity=1, pure=True)
+def _len(interpreter, value):
+    return len(value)
+
+
+@register('str', arity=1, pure=True)
+def _str(interpreter, value):
+    return str(value)
+
+
+@register('int', arity=1, pure=True)
+def _int(interpreter, value):
+    return int(value)
+
+
+@register('array', arity=1, pure=True)
+def _array(interpreter, values):
+    return arrays.NumArray.from_values(values)
+
+
+@register('column', arity=2)
+def _column(interpreter, rows, name):
+    return arrays.column(rows, name)
+
+
+@register('sum', arity=1, pure=True)
+def _sum(interpreter, values):
+    return arrays.total(values)
+
+
+@register('min', arity=(1, None), pure=True)
+def _min(interpreter, *values):
+    return arrays.extreme('min', min, values[0] if len(values) == 1 else values)
+
+
+@register('max', arity=(1, None), pure=True)
+def _max(interpreter, *values):
+    return arrays.extreme('max', max, values[0] if len(values) == 1 else values)
+
+
+@register('mean', arity=1, pure=True)
+def _mean(interpreter, values):
+    return arrays.mean(values)
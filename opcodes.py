@@ -0,0 +1,74 @@
+import operator
+
+
+# Instrucciones de la máquina virtual. Cada instrucción ocupa dos enteros
+# en el bytecode: el código de operación y su argumento (0 si no lo usa).
+
+LOAD_CONST = 0 # Apila constants[arg]
+LOAD_NAME = 1 # Apila la variable names[arg]
+STORE_NAME = 2 # Desapila y guarda en la variable names[arg]
+BINARY_OP = 3 # Aplica BINARY_OPERATORS[arg] a los dos valores superiores
+UNARY_OP = 4 # Aplica UNARY_OPERATORS[arg] al valor superior
+CALL_FUNCTION = 5 # Llama a la función calls[arg] = (nombre, número de argumentos)
+POP_TOP = 6 # Descarta el valor superior de la pila
+INDEX = 7 # Acceso contenedor[índice]
+BUILD_DICT = 8 # Construye un diccionario con arg pares clave/valor
+LOAD_JSON = 9 # Apila json.loads(constants[arg]) (valor nuevo en cada ejecución)
+JUMP = 10 # Salta a la instrucción arg
+POP_JUMP_IF_FALSE = 11 # Desapila y salta a la instrucción arg si es falso
+MAKE_ROUTE = 12 # Desapila las opciones y registra la ruta compilada constants[arg]
+RETURN_VALUE = 13 # Termina la ejecución devolviendo el valor superior
+BUILD_LIST = 14 # Construye una lista con los arg valores superiores
+LOAD_GLOBAL = 15 # Apila la variable global names[arg] desde el cuerpo de una función
+PARALLEL = 16 # Ejecuta a la vez las tareas del bloque parallel constants[arg]
+
+OPCODE_NAMES = {
+    LOAD_CONST: 'LOAD_CONST',
+    LOAD_NAME: 'LOAD_NAME',
+    STORE_NAME: 'STORE_NAME',
+    BINARY_OP: 'BINARY_OP',
+    UNARY_OP: 'UNARY_OP',
+    CALL_FUNCTION: 'CALL_FUNCTION',
+    POP_TOP: 'POP_TOP',
+    INDEX: 'INDEX',
+    BUILD_DICT: 'BUILD_DICT',
+    LOAD_JSON: 'LOAD_JSON',
+    JUMP: 'JUMP',
+    POP_JUMP_IF_FALSE: 'POP_JUMP_IF_FALSE',
+    MAKE_ROUTE: 'MAKE_ROUTE',
+    RETURN_VALUE: 'RETURN_VALUE',
+    BUILD_LIST: 'BUILD_LIST',
+    LOAD_GLOBAL: 'LOAD_GLOBAL',
+    PARALLEL: 'PARALLEL',
+}
+
+
+def _logical_and(left, right):
+    return left and right
+
+
+def _logical_or(left, right):
+    return left or right
+
+
+# El índice de cada operador es el argumento de BINARY_OP / UNARY_OP.
+BINARY_OPERATORS = (
+    operator.add,
+    operator.sub,
+    operator.mul,
+    operator.truediv,
+    _logical_and,
+    _logical_or,
+    operator.eq,
+    operator.ne,
+    operator.lt,
+    operator.gt,
+    operator.le,
+    operator.ge,
+)
+
+UNARY_OPERATORS = (
+    operator.pos,
+    operator.neg,
+    operator.not_,
+)
@@ -0,0 +1,333 @@
+import attr
+import json
+import operator
+
+from typing import Any, Iterable, Iterator
+
+from ast_nodes import (
+    Num, BinOp, UnaryOp, Assign, Var, FuncCall, String, DictNode, ListNode, Bool,
+    IfNode, IndexAccess, Const, RouteNode, ReturnNode, FunctionDef, ParallelNode
+)
+from compiler import BINARY_OP_INDEX, UNARY_OP_INDEX
+from opcodes import BINARY_OPERATORS, UNARY_OPERATORS
+from natives import DEFAULT_REGISTRY, NativeRegistry
+
+
+HASHABLE_KEY_TYPES = (str, int, float, bool, tuple)
+
+# Tamaño máximo (caracteres o elementos) de un valor plegado en compilación;
+# por encima, la expresión se deja para la ejecución y no llega a la caché.
+MAX_FOLDED_SIZE = 10_000
+
+
+class FrozenDict(dict):
+    """Diccionario inmutable para los literales constantes compartidos entre ejecuciones."""
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('Un diccionario constante no se puede modificar')
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+    __ior__ = _immutable
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+class FrozenList(list):
+    """Lista inmutable para los valores JSON constantes."""
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('Una lista constante no se puede modificar')
+
+    __setitem__ = __delitem__ = _immutable
+    append = extend = insert = pop = remove = clear = sort = reverse = _immutable
+    __iadd__ = __imul__ = _immutable
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+
+# Los mensajes de error (propios y de Python) muestran los tipos del lenguaje;
+# `__qualname__` sigue siendo el real, que es el que usa pickle.
+FrozenDict.__name__ = 'dict'
+FrozenList.__name__ = 'list'
+
+
+def freeze(value: Any) -> Any:
+    """Devuelve una versión inmutable (recursiva) de diccionarios y listas."""
+    if isinstance(value, dict) and not isinstance(value, FrozenDict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list) and not isinstance(value, FrozenList):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+
+def folded_size(value: Any) -> int:
+    """Tamaño de un valor a efectos de `MAX_FOLDED_SIZE`."""
+    try:
+        return len(value)
+    except TypeError:
+        return 1
+
+
+def repeat_size(op_index: int, left: Any, right: Any) -> int:
+    """Tamaño del resultado de repetir una secuencia, sin llegar a construirlo."""
+    if BINARY_OPERATORS[op_index] is operator.mul:
+        for sequence, count in ((left, right), (right, left)):
+            if isinstance(count, int) and not isinstance(sequence, (int, float)):
+                return folded_size(sequence) * count
+    return 0
+
+
+def count_nodes(node: Any) -> int:
+    """Cuenta los nodos de un árbol (o de una lista de sentencias)."""
+    if isinstance(node, list):
+        return sum(count_nodes(item) for item in node)
+    if isinstance(node, (Num, String, Bool, Var, Const)):
+        return 1
+    if isinstance(node, BinOp):
+        return 1 + count_nodes(node.left) + count_nodes(node.right)
+    if isinstance(node, UnaryOp):
+        return 1 + count_nodes(node.expr)
+    if isinstance(node, Assign):
+        return 1 + count_nodes(node.right)
+    if isinstance(node, FuncCall):
+        return 1 + count_nodes(node.args)
+    if isinstance(node, IndexAccess):
+        return 1 + count_nodes(node.container) + count_nodes(node.index)
+    if isinstance(node, DictNode):
+        return 1 + sum(count_nodes(key) + count_nodes(value) for key, value in node.pairs.items())
+    if isinstance(node, ListNode):
+        return 1 + count_nodes(node.elements)
+    if isinstance(node, IfNode):
+        total = 1 + count_nodes(node.condition) + count_nodes(node.if_block)
+        for condition, block in node.elif_blocks or []:
+            total += count_nodes(condition) + count_nodes(block)
+        return total + count_nodes(node.else_block or [])
+    if isinstance(node, RouteNode):
+        return 1 + count_nodes(node.body) + (count_nodes(node.options) if node.options is not None else 0)
+    if isinstance(node, FunctionDef):
+        return 1 + count_nodes(node.body)
+    if isinstance(node, ParallelNode):
+        return 1 + sum(count_nodes(task) for task in node.tasks)
+    if isinstance(node, ReturnNode):
+        return 1 + count_nodes(node.value)
+    return 1
+
+
+@attr.s(auto_attribs=True)
+class OptimizerStats:
+    """Estadísticas de una pasada del optimizador."""
+    nodes_before: int = 0
+    nodes_after: int = 0
+    folded: int = 0
+    strings_decoded: int = 0
+    dicts_frozen: int = 0
+    lists_frozen: int = 0
+    branches_pruned: int = 0
+    statements_removed: int = 0
+
+    @property
+    def nodes_removed(self) -> int:
+        return self.nodes_before - self.nodes_after
+
+    def report(self) -> str:
+        """Resumen legible de las estadísticas."""
+        return (
+            f'Optimizador: {self.nodes_before} -> {self.nodes_after} nodos '
+            f'({self.nodes_removed} eliminados); '
+            f'{self.folded} expresiones plegadas, '
+            f'{self.strings_decoded} cadenas JSON decodificadas, '
+            f'{self.dicts_frozen} diccionarios constantes, '
+            f'{self.lists_frozen} listas constantes, '
+            f'{self.branches_pruned} ramas eliminadas, '
+            f'{self.statements_removed} sentencias sin efecto eliminadas'
+        )
+
+
+@attr.s(auto_attribs=True)
+class Optimizer:
+    """Pasada de optimización entre `Parser.parse()` y la ejecución.
+
+    Pliega las operaciones entre constantes y las llamadas a funciones
+    nativas puras con argumentos constantes, decide una sola vez si cada
+    cadena es JSON, congela los diccionarios y listas literales constantes y elimina
+    las ramas de `if` cuya condición se conoce en compilación.
+    """
+    stats: OptimizerStats = attr.ib(factory=OptimizerStats)
+    natives: NativeRegistry = DEFAULT_REGISTRY
+
+    def optimize(self, tree: list[Any]) -> list[Any]:
+        """Optimiza una lista de sentencias y devuelve la nueva lista."""
+        self.stats.nodes_before += count_nodes(tree)
+        result = self.optimize_block(tree)
+        self.stats.nodes_after += count_nodes(result)
+        return result
+
+    def optimize_stream(self, statements: Iterable[Any]) -> Iterator[Any]:
+        """Optimiza las sentencias de primer nivel a medida que llegan."""
+        for statement in statements:
+            yield from self.optimize([statement])
+
+    def optimize_block(self, block: list[Any]) -> list[Any]:
+        """Optimiza un bloque; una sentencia puede desaparecer o expandirse en varias."""
+        result = []
+        for statement in block:
+            result.extend(self.optimize_statement(statement))
+        return result
+
+    def optimize_statement(self, node: Any) -> list[Any]:
+        """Optimiza una sentencia y devuelve las sentencias que la sustituyen."""
+        if isinstance(node, IfNode):
+            return self.optimize_if(node)
+        if isinstance(node, Assign):
+            return [Assign(left=node.left, right=self.optimize_expr(node.right))]
+        if isinstance(node, RouteNode):
+            options = self.optimize_expr(node.options) if node.options is not None else None
+            return [RouteNode(method=node.method, path=node.path, body=self.optimize_block(node.body), options=options)]
+        if isinstance(node, FunctionDef):
+            return [FunctionDef(name=node.name, params=node.params, body=self.optimize_block(node.body), memo=node.memo)]
+        if isinstance(node, ParallelNode):
+            return self.optimize_parallel(node)
+        if isinstance(node, ReturnNode):
+            return [ReturnNode(value=self.optimize_expr(node.value))]
+        node = self.optimize_expr(node)
+        if isinstance(node, Const):
+            # Una expresión constante como sentencia no tiene ningún efecto
+            self.stats.statements_removed += 1
+            return []
+        return [node]
+
+    def optimize_parallel(self, node: ParallelNode) -> list[Any]:
+        """Optimiza cada tarea por separado; las que quedan vacías desaparecen."""
+        tasks = [task for task in map(self.optimize_block, node.tasks) if task]
+        if len(tasks) < 2:
+            # Con una sola tarea no hay nada que ejecutar a la vez
+            return tasks[0] if tasks else []
+        return [ParallelNode(tasks=tasks)]
+
+    def optimize_if(self, node: IfNode) -> list[Any]:
+        """Elimina las ramas cuya condición es constante."""
+        branches = []
+        else_block = node.else_block
+        for condition, block in [(node.condition, node.if_block)] + list(node.elif_blocks or []):
+            condition = self.optimize_expr(condition)
+            if isinstance(condition, Const):
+                self.stats.branches_pruned += 1
+                if condition.value:
+                    # Rama siempre cierta: ninguna de las siguientes se evalúa
+                    else_block = block
+                    break
+                continue
+            branches.append((condition, self.optimize_block(block)))
+        else_block = self.optimize_block(else_block) if else_block is not None else None
+
+        if not branches:
+            return else_block or []
+        (condition, if_block), elif_blocks = branches[0], branches[1:]
+        return [IfNode(condition=condition, if_block=if_block, elif_blocks=elif_blocks, else_block=else_block)]
+
+    def optimize_expr(self, node: Any) -> Any:
+        """Optimiza una expresión y devuelve el nodo resultante."""
+        if isinstance(node, (Num, Bool)):
+            return Const(value=node.value)
+        if isinstance(node, String):
+            return self.optimize_string(node)
+        if isinstance(node, BinOp):
+            return self.optimize_binop(node)
+        if isinstance(node, UnaryOp):
+            return self.optimize_unaryop(node)
+        if isinstance(node, DictNode):
+            return self.optimize_dict(node)
+        if isinstance(node, ListNode):
+            return self.optimize_list(node)
+        if isinstance(node, FuncCall):
+            return self.optimize_call(node)
+        if isinstance(node, IndexAccess):
+            return IndexAccess(container=self.optimize_expr(node.container), index=self.optimize_expr(node.index))
+        if isinstance(node, Assign):
+            return Assign(left=node.left, right=self.optimize_expr(node.right))
+        return node
+
+    def optimize_call(self, node: FuncCall) -> Any:
+        """Evalúa en compilación las llamadas a funciones puras con argumentos constantes."""
+        args = [self.optimize_expr(arg) for arg in node.args]
+        native = self.natives.lookup(node.name)
+        if (
+            native is not None and native.pure and native.accepts(len(args))
+            and all(isinstance(arg, Const) for arg in args)
+        ):
+            try:
+                value = native.func(None, *[arg.value for arg in args])
+            except Exception:
+                pass
+            else:
+                if folded_size(value) <= MAX_FOLDED_SIZE:
+                    self.stats.folded += 1
+                    return Const(value=freeze(value))
+        return FuncCall(name=node.name, args=args)
+
+    def optimize_string(self, node: String) -> Const:
+        """Decide una sola vez si la cadena es JSON."""
+        try:
+            value = json.loads(node.value)
+        except json.JSONDecodeError:
+            return Const(value=node.value)
+        self.stats.strings_decoded += 1
+        return Const(value=freeze(value))
+
+    def optimize_binop(self, node: BinOp) -> Any:
+        """Pliega una operación binaria entre constantes."""
+        left = self.optimize_expr(node.left)
+        right = self.optimize_expr(node.right)
+        op_index = BINARY_OP_INDEX.get(node.op[0])
+        if (
+            op_index is not None and isinstance(left, Const) and isinstance(right, Const)
+            and repeat_size(op_index, left.value, right.value) <= MAX_FOLDED_SIZE
+        ):
+            try:
+                value = BINARY_OPERATORS[op_index](left.value, right.value)
+            except Exception:
+                pass  # El error se reproducirá al ejecutar, como sin optimizar
+            else:
+                if folded_size(value) <= MAX_FOLDED_SIZE:
+                    self.stats.folded += 1
+                    return Const(value=freeze(value))
+        return BinOp(left=left, op=node.op, right=right)
+
+    def optimize_unaryop(self, node: UnaryOp) -> Any:
+        """Pliega una operación unaria sobre una constante."""
+        expr = self.optimize_expr(node.expr)
+        op_index = UNARY_OP_INDEX.get(node.op[0])
+        if op_index is not None and isinstance(expr, Const):
+            try:
+                value = UNARY_OPERATORS[op_index](expr.value)
+            except Exception:
+                pass
+            else:
+                self.stats.folded += 1
+                return Const(value=value)
+        return UnaryOp(op=node.op, expr=expr)
+
+    def optimize_dict(self, node: DictNode) -> Any:
+        """Congela un diccionario literal cuyas claves y valores son constantes."""
+        pairs = {
+            self.optimize_expr(key): self.optimize_expr(value)
+            for key, value in node.pairs.items()
+        }
+        if all(
+            isinstance(key, Const) and isinstance(key.value, HASHABLE_KEY_TYPES) and isinstance(value, Const)
+            for key, value in pairs.items()
+        ):
+            self.stats.dicts_frozen += 1
+            return Const(value=FrozenDict((key.value, value.value) for key, value in pairs.items()))
+        return DictNode(pairs=pairs)
+
+    def optimize_list(self, node: ListNode) -> Any:
+        """Congela una lista literal cuyos elementos son constantes."""
+        elements = [self.optimize_expr(element) for element in node.elements]
+        if all(isinstance(element, Const) for element in elements):
+            self.stats.lists_frozen += 1
+            return Const(value=FrozenList(element.value for element in elements))
+        return ListNode(elements=elements)
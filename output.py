@@ -0,0 +1,145 @@
+import contextlib
+import subsystems
+import sys
+import threading
+
+from typing import Any, Iterator, Optional, TextIO
+
+
+OUTPUT_MODES = ('auto', 'rich', 'plain')
+
+
+class _NullStatus:
+    """Sustituto del indicador de progreso de rich en modo texto plano."""
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+
+class RichOutput:
+    """Salida enriquecida con la consola de rich: colores, separadores y spinners."""
+    rich = True
+
+    def __init__(self):
+        self.console = subsystems.require('rich.console', 'consola').Console()
+
+    def print(self, text: str, style: Optional[str] = None, emoji: Optional[str] = None) -> None:
+        """Imprime una línea, con el estilo de rich indicado."""
+        if emoji is not None:
+            text = f'{text}:{emoji}:'
+        self.console.print(f'[{style}]{text}[/{style}]' if style else text)
+
+    def step(self, title: str) -> None:
+        """Separador que anuncia un paso del script."""
+        self.console.rule(f'[red]Step: {title}[/red]')
+
+    def status(self, message: str) -> Any:
+        """Indicador de progreso mientras dura el bloque `with`."""
+        return self.console.status(message)
+
+    def flush(self) -> None:
+        self.console.file.flush()
+
+
+class PlainOutput:
+    """Salida de texto plano, sin marcado ni separadores ni spinners.
+
+    Escribe en el buffer de `stream` sin vaciarlo en cada línea (rich lo hace
+    en cada `print`), así que redirigir la salida a un fichero es barato. Los
+    separadores de cada paso se omiten.
+    """
+    rich = False
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        self.stream = stream
+
+    def print(self, text: str, style: Optional[str] = None, emoji: Optional[str] = None) -> None:
+        """Imprime una línea; el estilo y el emoji se ignoran."""
+        (self.stream or sys.stdout).write(text + '\n')
+
+    def step(self, title: str) -> None:
+        pass
+
+    @contextlib.contextmanager
+    def status(self, message: str) -> Iterator[_NullStatus]:
+        yield _NullStatus()
+
+    def flush(self) -> None:
+        (self.stream or sys.stdout).flush()
+
+
+class RecordedOutput:
+    """Salida que guarda las llamadas para escribirlas después con `replay`.
+
+    La usan los bloques `parallel` para que la salida de cada sentencia
+    aparezca junta y en el orden del código. Los indicadores de progreso no
+    se graban.
+    """
+
+    def __init__(self, rich: bool = False):
+        self.rich = rich
+        self.calls = []
+
+    def print(self, text: str, style: Optional[str] = None, emoji: Optional[str] = None) -> None:
+        self.calls.append(('print', (text, style, emoji)))
+
+    def step(self, title: str) -> None:
+        self.calls.append(('step', (title,)))
+
+    @contextlib.contextmanager
+    def status(self, message: str) -> Iterator[_NullStatus]:
+        yield _NullStatus()
+
+    def flush(self) -> None:
+        pass
+
+    def replay(self, target: Any) -> None:
+        """Escribe en `target` todo lo grabado, en orden."""
+        for method, args in self.calls:
+            getattr(target, method)(*args)
+
+
+_output = None
+_mode = 'auto'
+_local = threading.local()
+
+
+def configure(mode: str = 'auto') -> None:
+    """Elige la salida: 'rich', 'plain' o 'auto' (texto plano si stdout no es una terminal)."""
+    global _output, _mode
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f'Modo de salida no válido: {mode}')
+    _mode = mode
+    _output = None
+
+
+def get_output() -> Any:
+    """Devuelve la salida configurada, creándola la primera vez que se usa.
+
+    Dentro de `captured()` devuelve la salida que graba el hilo actual.
+    """
+    global _output
+    recorded = getattr(_local, 'recorded', None)
+    if recorded is not None:
+        return recorded
+    if _output is None:
+        plain = _mode == 'plain' or (_mode == 'auto' and not sys.stdout.isatty())
+        _output = PlainOutput() if plain else RichOutput()
+    return _output
+
+
+@contextlib.contextmanager
+def captured() -> Iterator[RecordedOutput]:
+    """Graba la salida del hilo actual mientras dura el bloque `with`."""
+    previous = getattr(_local, 'recorded', None)
+    recorded = _local.recorded = RecordedOutput(get_output().rich)
+    try:
+        yield recorded
+    finally:
+        _local.recorded = previous
+
+
+def flush() -> None:
+    """Vacía la salida pendiente, si se ha llegado a crear."""
+    if _output is not None:
+        _output.flush()
@@ -0,0 +1,274 @@
+"""Bloques `parallel { ... }`: cada sentencia se ejecuta en un hilo del grupo compartido.
+
+Las sentencias de un bloque deben ser independientes: ninguna puede asignar
+una variable que otra asigne o lea, ni modificar una tabla que otra consulte
+o modifique (también a través de las funciones del script a las que
+llaman), lo que se comprueba al analizar el script. La
+salida de cada sentencia se guarda mientras se ejecuta y se escribe al
+terminar el bloque en el orden del código, y los errores de todas las
+sentencias se lanzan juntos.
+"""
+
+import attr
+import queue
+import threading
+
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+import output
+from ast_nodes import (
+    BinOp, UnaryOp, Assign, Var, FuncCall, String, Const, DictNode, ListNode, IfNode, IndexAccess,
+    ReturnNode, FunctionDef, ParallelNode
+)
+from functions import local_names
+from limits import LimitExceeded
+from natives import DEFAULT_REGISTRY
+
+
+# Hilos del grupo compartido por todos los bloques del proceso.
+MAX_WORKERS = 8
+
+# Funciones que cambian el estado global del contexto (conexión, transacción,
+# servidor) y no pueden ejecutarse a la vez que otras sentencias.
+SEQUENTIAL_FUNCTIONS = ('connect_db', 'create_api', 'db_begin', 'db_commit', 'db_rollback')
+
+# Funciones nativas cuyo primer argumento es la tabla que leen o modifican.
+TABLE_READERS = ('db_query',)
+TABLE_WRITERS = ('db_insert', 'db_insert_many', 'db_create_table')
+
+# Tabla de una llamada cuyo nombre no es un literal: puede ser cualquiera.
+ANY_TABLE = '*'
+
+
+def _table(node: FuncCall) -> str:
+    """Tabla a la que accede una llamada a una función de `TABLE_READERS` o `TABLE_WRITERS`."""
+    table = node.args[0] if node.args else None
+    if type(table) in (String, Const) and isinstance(table.value, str):
+        return table.value
+    return ANY_TABLE
+
+
+def _accesses(task: list[Any], functions: dict[str, FunctionDef]) -> tuple[set[str], ...]:
+    """Variables que lee y que asigna una tarea, funciones a las que llama y tablas que lee y modifica.
+
+    Las llamadas a funciones del script se siguen hasta sus cuerpos: cuentan
+    las variables globales que leen, las tablas que usan y las funciones a
+    las que llaman a su vez. Las funciones no asignan variables globales (lo
+    que asignan es local), así que no añaden escrituras de variables.
+    """
+    reads, writes, calls = set(), set(), set()
+    table_reads, table_writes = set(), set()
+    pending = [(node, None) for node in task]
+    visited = set()
+    while pending:
+        node, local = pending.pop()
+        node_type = type(node)
+        if node_type is Var:
+            if local is None or node.name not in local:
+                reads.add(node.name)
+        elif node_type is Assign:
+            if local is None:
+                writes.add(node.left.name)
+            pending.append((node.right, local))
+        elif node_type is FuncCall:
+            calls.add(node.name)
+            if node.name in TABLE_READERS:
+                table_reads.add(_table(node))
+            elif node.name in TABLE_WRITERS:
+                table_writes.add(_table(node))
+            pending.extend((arg, local) for arg in node.args)
+            function = functions.get(node.name)
+            if function is not None and node.name not in visited:
+                visited.add(node.name)
+                names = set(local_names(function.params, function.body))
+                pending.extend((statement, names) for statement in function.body)
+        elif node_type is BinOp:
+            pending.extend(((node.left, local), (node.right, local)))
+        elif node_type is UnaryOp:
+            pending.append((node.expr, local))
+        elif node_type is ReturnNode:
+            pending.append((node.value, local))
+        elif node_type is IndexAccess:
+            pending.extend(((node.container, local), (node.index, local)))
+        elif node_type is DictNode:
+            for key, value in node.pairs.items():
+                pending.extend(((key, local), (value, local)))
+        elif node_type is ListNode:
+            pending.extend((element, local) for element in node.elements)
+        elif node_type is IfNode:
+            pending.append((node.condition, local))
+            pending.extend((statement, local) for statement in node.if_block)
+            for condition, block in node.elif_blocks or []:
+                pending.append((condition, local))
+                pending.extend((statement, local) for statement in block)
+            pending.extend((statement, local) for statement in node.else_block or [])
+        elif node_type is ParallelNode:
+            # Un bloque dentro de una función llamada desde una tarea
+            for statement in node.tasks:
+                pending.extend((child, local) for child in statement)
+    return reads, writes, calls, table_reads, table_writes
+
+
+def _shared_tables(writes: set[str], tables: set[str]) -> set[str]:
+    """Tablas de `writes` que están también en `tables`, teniendo en cuenta `ANY_TABLE`."""
+    if ANY_TABLE in writes:
+        return set(tables)
+    if ANY_TABLE in tables:
+        return set(writes)
+    return writes & tables
+
+
+def check_dependencies(tasks: list[list[Any]], functions: Optional[dict[str, FunctionDef]] = None) -> Optional[str]:
+    """Devuelve un mensaje de error si las tareas de un bloque no son independientes, o None.
+
+    `functions` son las funciones del script definidas antes del bloque. Una
+    tarea no puede llamar a una función que no sea nativa ni esté entre
+    ellas: sin su cuerpo no se sabe qué variables usa. Tampoco puede
+    modificar una tabla que otra tarea lee o modifica.
+    """
+    functions = functions or {}
+    accesses = [_accesses(task, functions) for task in tasks]
+    for position, (reads, writes, calls, table_reads, table_writes) in enumerate(accesses, 1):
+        for name in SEQUENTIAL_FUNCTIONS:
+            if name in calls:
+                return f'"{name}()" no se puede usar dentro de un bloque parallel (sentencia {position})'
+        for name in sorted(calls):
+            if name not in functions and name not in DEFAULT_REGISTRY.functions:
+                return (
+                    f'La función "{name}" debe definirse antes del bloque parallel que la usa '
+                    f'(sentencia {position})'
+                )
+        for other, (other_reads, other_writes, _, other_table_reads, other_table_writes) in enumerate(accesses, 1):
+            if other == position:
+                continue
+            conflicts = writes & (other_reads | other_writes)
+            if conflicts:
+                name = sorted(conflicts)[0]
+                verb = 'asigna' if name in other_writes else 'usa'
+                return (
+                    f'Sentencias dependientes en el bloque parallel: "{name}" se asigna en la '
+                    f'sentencia {position} y se {verb} en la sentencia {other}'
+                )
+            tables = _shared_tables(table_writes, other_table_reads | other_table_writes)
+            if tables:
+                name = sorted(tables)[0]
+                if name == ANY_TABLE or ANY_TABLE in table_writes:
+                    return (
+                        f'Sentencias dependientes en el bloque parallel: la sentencia {position} modifica '
+                        f'una tabla que también puede usar la sentencia {other} (para comprobarlo, el '
+                        f'nombre de la tabla debe ser un literal)'
+                    )
+                verb = 'modifica' if name in other_table_writes or ANY_TABLE in other_table_writes else 'consulta'
+                return (
+                    f'Sentencias dependientes en el bloque parallel: la tabla "{name}" se modifica en la '
+                    f'sentencia {position} y se {verb} en la sentencia {other}'
+                )
+    return None
+
+
+class WorkerPool:
+    """Grupo de hilos que se reutilizan entre bloques.
+
+    Los hilos son daemon y esperan tareas indefinidamente: no retrasan la
+    salida del proceso y conservan entre bloques su conexión SQLite (una
+    por hilo, ver `ConnectionManager`). Se crean a medida que hacen falta.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self.max_workers = max_workers
+        self._queue = queue.SimpleQueue()
+        self._threads = []
+        self._idle = 0
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> Future:
+        """Encola `func(*args)` y devuelve su `Future`."""
+        future = Future()
+        self._queue.put((future, func, args))
+        with self._lock:
+            if self._queue.qsize() > self._idle and len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._work, name=f'mercu-parallel-{len(self._threads) + 1}', daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+        return future
+
+    def _work(self) -> None:
+        _state.worker = True
+        while True:
+            with self._lock:
+                self._idle += 1
+            future, func, args = self._queue.get()
+            with self._lock:
+                self._idle -= 1
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = func(*args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+
+_state = threading.local()
+_pool: Optional[WorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> WorkerPool:
+    """Devuelve el grupo de hilos del proceso, creándolo la primera vez."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool()
+        return _pool
+
+
+@attr.s(auto_attribs=True)
+class TaskResult:
+    """Salida grabada y error (si lo hubo) de una tarea de un bloque."""
+    recorded: Any
+    error: Optional[Exception] = None
+
+
+def _run_task(task: Callable[[], Any]) -> TaskResult:
+    with output.captured() as recorded:
+        try:
+            task()
+        except Exception as e:
+            return TaskResult(recorded, e)
+    return TaskResult(recorded)
+
+
+def run_parallel(tasks: list[Callable[[], Any]], sequential: bool = False) -> None:
+    """Ejecuta las tareas a la vez y espera a que terminen todas.
+
+    La salida de cada tarea se escribe después, en el orden de `tasks`, y si
+    alguna falla se lanza un único error con los de todas (o, si alguna ha
+    superado un límite de ejecución, su `LimitExceeded`). Dentro de un hilo
+    del grupo (un bloque en una función llamada desde otro bloque) o con
+    `sequential`, las tareas se ejecutan una tras otra en el hilo actual,
+    con la misma salida y los mismos errores.
+    """
+    if sequential or len(tasks) < 2 or getattr(_state, 'worker', False):
+        results = [_run_task(task) for task in tasks]
+    else:
+        pool = get_pool()
+        futures = [pool.submit(_run_task, task) for task in tasks]
+        results = [future.result() for future in futures]
+
+    target = output.get_output()
+    errors = []
+    for position, result in enumerate(results, 1):
+        result.recorded.replay(target)
+        if result.error is not None:
+            errors.append(f'  sentencia {position}: {result.error}')
+    for result in results:
+        if isinstance(result.error, LimitExceeded):
+            # Se propaga tal cual para que la ruta responda con 503
+            raise result.error
+    if errors:
+        raise Exception('Errores en el bloque parallel:\n' + '\n'.join(errors))
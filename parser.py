@@ -1,6 +1,6 @@
 import attr
 
-from typing import Any
+from typing import Any, Iterator
 
 from lexer import Lexer
 from tokens import (
@@ -8,12 +8,17 @@ from tokens import (
     ASSIGN, COMMA, EOF, STRING, LBRACE, RBRACE, COLON, TRUE,
     FALSE, IF, ELIF, ELSE, AND, OR, NOT, EQUALS, NOT_EQUALS,
     LESS_THAN, GREATER_THAN, LESS_EQUAL, GREATER_EQUAL, LBRACKET,
-    RBRACKET
+    RBRACKET, ROUTE, RETURN, DEF, MEMO, PARALLEL
 )
 from ast_nodes import (
     UnaryOp, Num, BinOp, FuncCall, Var, Assign, String,
-    DictNode, Bool, IfNode, IndexAccess
+    DictNode, ListNode, Bool, IfNode, IndexAccess, RouteNode, ReturnNode,
+    FunctionDef, ParallelNode
 )
+from functions import DEFAULT_MEMO_SIZE
+from parallel import check_dependencies
+
+HTTP_METHODS = ('GET', 'POST', 'PUT', 'DELETE')
 
 
 @attr.s(auto_attribs=True)
@@ -24,10 +29,15 @@ class Parser:
     def __attrs_post_init__(self):
         """Inicializa el parser obteniendo el primer token."""
         self.current_token = self.lexer.get_next_token()
+        self.in_route = False
+        self.in_function = False
+        self.in_parallel = False
+        self.depth = 0
+        self.functions = {}  # Funciones ya definidas, para comprobar los bloques parallel
 
-    def error(self) -> None:
+    def error(self, message: str = 'Error de análisis sintáctico') -> None:
         """Lanza una excepción de análisis sintáctico."""
-        raise Exception('Error de análisis sintáctico')
+        raise Exception(message)
 
     def eat(self, token_type: str) -> None:
         """Consume el token actual si coincide con `token_type`."""
@@ -66,6 +76,7 @@ class Parser:
             TRUE: self._parse_boolean,
             FALSE: self._parse_boolean,
             LBRACE: self.dict_literal,
+            LBRACKET: self.list_literal,
             LPAREN: self._parse_grouped_expr,
             IDENTIFIER: self.variable_or_function,
             STRING: self._parse_string,
@@ -148,6 +159,19 @@ class Parser:
         self.eat(RBRACE)
         return DictNode(pairs=pairs)
 
+    def list_literal(self) -> ListNode:
+        """Analiza y devuelve un nodo de lista."""
+        elements = []
+        self.eat(LBRACKET)
+        while self.current_token[0] != RBRACKET:
+            elements.append(self.logical_expr())
+            if self.current_token[0] == COMMA:
+                self.eat(COMMA)
+            else:
+                break
+        self.eat(RBRACKET)
+        return ListNode(elements=elements)
+
     def variable_or_function(self) -> Any:
         """Distingue entre variables y funciones."""
         token = self.current_token
@@ -176,6 +200,14 @@ class Parser:
         """Analiza una sentencia, que puede ser una asignación, una estructura condicional o una expresión."""
         if self.current_token[0] == IF:
             return self.if_statement()
+        if self.current_token[0] == ROUTE:
+            return self.route_statement()
+        if self.current_token[0] == RETURN:
+            return self.return_statement()
+        if self.current_token[0] in (DEF, MEMO):
+            return self.function_statement()
+        if self.current_token[0] == PARALLEL:
+            return self.parallel_statement()
 
         return self.assignment()
 
@@ -213,21 +245,116 @@ class Parser:
 
         return IfNode(condition=condition, if_block=if_block, elif_blocks=elif_blocks, else_block=else_block)
 
+    def route_statement(self) -> RouteNode:
+        """Analiza la definición de una ruta: route GET "/ruta" [opciones]: { ... }"""
+        self.eat(ROUTE)
+        if self.in_route:
+            self.error('No se puede definir una ruta dentro de otra')
+        if self.in_function:
+            self.error('No se puede definir una ruta dentro de una función')
+        if self.in_parallel:
+            self.error('No se puede definir una ruta dentro de un bloque parallel')
+        method = self.current_token
+        self.eat(IDENTIFIER)
+        if method[1].upper() not in HTTP_METHODS:
+            self.error(f'Método HTTP no soportado: {method[1]}')
+        path = self.current_token
+        self.eat(STRING)
+        options = self.dict_literal() if self.current_token[0] == LBRACE else None
+        self.eat(COLON)
+        self.in_route = True
+        try:
+            body = self.block()
+        finally:
+            self.in_route = False
+        return RouteNode(method=method[1].upper(), path=path[1], body=body, options=options)
+
+    def function_statement(self) -> FunctionDef:
+        """Analiza la definición de una función: [memo[(tamaño)]] def nombre(a, b): { ... }"""
+        memo = None
+        if self.current_token[0] == MEMO:
+            self.eat(MEMO)
+            memo = DEFAULT_MEMO_SIZE
+            if self.current_token[0] == LPAREN:
+                self.eat(LPAREN)
+                size = self.current_token
+                self.eat(NUMBER)
+                self.eat(RPAREN)
+                if size[1] < 1:
+                    self.error('El tamaño de memo debe ser mayor que 0')
+                memo = size[1]
+        self.eat(DEF)
+        if self.depth or self.in_route:
+            self.error('Las funciones solo se pueden definir en el primer nivel del script')
+        name = self.current_token
+        self.eat(IDENTIFIER)
+        params = []
+        self.eat(LPAREN)
+        while self.current_token[0] == IDENTIFIER:
+            param = self.current_token[1]
+            if param in params:
+                self.error(f'Parámetro "{param}" repetido en la función "{name[1]}"')
+            params.append(param)
+            self.eat(IDENTIFIER)
+            if self.current_token[0] != COMMA:
+                break
+            self.eat(COMMA)
+        self.eat(RPAREN)
+        self.eat(COLON)
+        self.in_function = True
+        try:
+            body = self.block()
+        finally:
+            self.in_function = False
+        node = FunctionDef(name=name[1], params=tuple(params), body=body, memo=memo)
+        self.functions[node.name] = node
+        return node
+
+    def parallel_statement(self) -> ParallelNode:
+        """Analiza un bloque parallel: { ... }, cuyas sentencias deben ser independientes."""
+        self.eat(PARALLEL)
+        if self.in_parallel:
+            self.error('No se puede anidar un bloque parallel dentro de otro')
+        self.eat(COLON)
+        self.in_parallel = True
+        try:
+            body = self.block()
+        finally:
+            self.in_parallel = False
+        tasks = [[statement] for statement in body]
+        error = check_dependencies(tasks, self.functions)
+        if error is not None:
+            self.error(error)
+        return ParallelNode(tasks=tasks)
+
+    def return_statement(self) -> ReturnNode:
+        """Analiza la sentencia return, solo válida dentro de una ruta o una función."""
+        self.eat(RETURN)
+        if not self.in_route and not self.in_function:
+            self.error('return solo se puede usar dentro de una ruta o de una función')
+        if self.in_parallel:
+            self.error('return no se puede usar dentro de un bloque parallel')
+        return ReturnNode(value=self.logical_expr())
+
     def block(self) -> list[Any]:
         """Analiza un bloque de código."""
         statements = []
         self.eat(LBRACE)
-
-        while self.current_token[0] != RBRACE and self.current_token[0] != EOF:
-            statements.append(self.statement())
+        self.depth += 1
+        try:
+            while self.current_token[0] != RBRACE and self.current_token[0] != EOF:
+                statements.append(self.statement())
+        finally:
+            self.depth -= 1
 
         self.eat(RBRACE)
         return statements
 
+    def statements(self) -> Iterator[Any]:
+        """Generador que devuelve las sentencias de primer nivel a medida que se analizan."""
+        while self.current_token[0] != EOF:
+            yield self.statement()
+
     def parse(self) -> list[Any]:
         """Analiza todos los tokens y devuelve una lista de nodos."""
-        statements = []
-        while self.current_token[0] != EOF:
-            node = self.statement()
-            statements.append(node)
-        return statements
+        return list(self.statements())
@@ -0,0 +1,219 @@
+import attr
+import functools
+import os
+import output
+import sys
+import time
+
+from collections import defaultdict
+from typing import Any, Optional, TextIO
+
+from ast_nodes import FuncCall, FunctionDef, IfNode, ParallelNode, RouteNode
+from interpreter import Interpreter
+from lexer import Lexer
+from parallel import run_parallel
+from parser import Parser
+from resolver import Resolver
+
+
+# Filas de cada sección del informe.
+REPORT_LIMIT = 15
+
+
+@attr.s(auto_attribs=True)
+class LineTrackingParser(Parser):
+    """Parser que anota la línea del código fuente donde empieza cada sentencia.
+
+    Solo lo usa el perfilador: el parser normal no calcula líneas. `lines`
+    se indexa por `id()` del nodo, así que los nodos deben seguir vivos (lo
+    están mientras exista el árbol).
+    """
+
+    def __attrs_post_init__(self):
+        super().__attrs_post_init__()
+        self.lines: dict[int, int] = {}
+        self._line = 1
+        self._line_pos = 0
+
+    def current_line(self) -> int:
+        """Línea del token actual, contando los saltos de línea desde la última consulta."""
+        # `lexer.pos` es el final del token actual; los tokens no ocupan varias
+        # líneas salvo las cadenas, que se cuentan por su última línea.
+        pos = self.lexer.pos
+        self._line += self.lexer.text.count('\n', self._line_pos, pos)
+        self._line_pos = pos
+        return self._line
+
+    def statement(self) -> Any:
+        line = self.current_line()
+        node = super().statement()
+        self.lines[id(node)] = line
+        return node
+
+
+def transfer_lines(old_block: list[Any], new_block: list[Any], lines: dict[int, int]) -> None:
+    """Copia las líneas de las sentencias de `old_block` a sus equivalentes en `new_block`.
+
+    El resolver devuelve bloques con las mismas sentencias en el mismo orden,
+    aunque algunos nodos sean nuevos.
+    """
+    for old, new in zip(old_block, new_block):
+        line = lines.get(id(old))
+        if line is not None:
+            lines[id(new)] = line
+        if isinstance(old, IfNode):
+            transfer_lines(old.if_block, new.if_block, lines)
+            for (_, old_elif), (_, new_elif) in zip(old.elif_blocks or [], new.elif_blocks or []):
+                transfer_lines(old_elif, new_elif, lines)
+            transfer_lines(old.else_block or [], new.else_block or [], lines)
+        elif isinstance(old, (RouteNode, FunctionDef)):
+            transfer_lines(old.body, new.body, lines)
+        elif isinstance(old, ParallelNode):
+            for old_task, new_task in zip(old.tasks, new.tasks):
+                transfer_lines(old_task, new_task, lines)
+
+
+@attr.s(auto_attribs=True)
+class ProfilingInterpreter(Interpreter):
+    """Intérprete que mide el tiempo de cada nodo, sentencia y función nativa.
+
+    Para cada grupo guarda `[llamadas, tiempo total, tiempo propio]`: el
+    total incluye los nodos hijos y el propio no. El tiempo de una función
+    nativa incluye lo que tarden SQLite o la consola dentro de ella. Además
+    acumula el tiempo propio por pila de llamadas para generar el formato
+    «collapsed stacks» de las herramientas de flamegraphs.
+
+    El intérprete normal no lleva ninguna de estas medidas: el perfilador
+    solo cuesta cuando se usa.
+    """
+    filename: str = '<script>'
+    lines: dict[int, int] = attr.ib(factory=dict)
+
+    def __attrs_post_init__(self):
+        self.by_line = defaultdict(lambda: [0, 0.0, 0.0])
+        self.by_node = defaultdict(lambda: [0, 0.0, 0.0])
+        self.by_native = defaultdict(lambda: [0, 0.0, 0.0])
+        self.stacks = defaultdict(float)
+        self._stack = []
+        self._child_time = [0.0]
+        self._active = defaultdict(int)
+        self.total_time = 0.0
+
+    def _measure(self, label: str, groups: list[Any], func: Any, *args: Any) -> Any:
+        """Ejecuta `func(*args)` anotando su tiempo en `groups` y en la pila `label`."""
+        stack = self._stack
+        child_time = self._child_time
+        active = self._active
+        stack.append(label)
+        child_time.append(0.0)
+        for group in groups:
+            active[id(group)] += 1
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            own = elapsed - child_time.pop()
+            child_time[-1] += elapsed
+            for group in groups:
+                group[0] += 1
+                group[2] += own
+                active[id(group)] -= 1
+                # En una recursión el total solo se suma en la llamada más externa
+                if not active[id(group)]:
+                    group[1] += elapsed
+            self.stacks[';'.join(stack)] += own
+            stack.pop()
+
+    def visit(self, node: Any) -> Any:
+        node_type = type(node).__name__
+        line = self.lines.get(id(node))
+        if line is None:
+            return self._measure(node_type, [self.by_node[node_type]], super().visit, node)
+        label = f'{self.filename}:{line} {node_type}'
+        return self._measure(label, [self.by_node[node_type], self.by_line[line]], super().visit, node)
+
+    def visit_FuncCall(self, node: FuncCall) -> Any:
+        native = node.native
+        if native is None:
+            native = self.natives.resolve(node.name, len(node.args))
+        args = [self.visit(arg) for arg in node.args]
+        return self._measure(f'{node.name}()', [self.by_native[node.name]], native.func, self, *args)
+
+    def visit_ParallelNode(self, node: ParallelNode) -> None:
+        # Las medidas no se pueden repartir entre hilos: las sentencias se
+        # ejecutan una tras otra, con la misma salida y los mismos errores
+        self.check_parallel()
+        run_parallel([functools.partial(self._execute_block, task) for task in node.tasks], sequential=True)
+
+    def interpret(self) -> None:
+        """Resuelve y ejecuta el árbol completo midiendo su tiempo."""
+        resolver = Resolver(self.natives.copy(), self.context.variables)
+        self.natives = resolver.natives
+        tree = resolver.resolve(self.tree)
+        transfer_lines(self.tree, tree, self.lines)
+        start = time.perf_counter()
+        try:
+            for node in tree:
+                self.visit(node)
+        finally:
+            self.total_time = time.perf_counter() - start
+
+    def report(self, source_lines: Optional[list[str]] = None, limit: int = REPORT_LIMIT) -> str:
+        """Informe de puntos calientes ordenado por tiempo."""
+        total = self.total_time or 1e-9
+        out = [f'Perfil de {self.filename}: {self.total_time * 1000:.1f} ms en total']
+
+        out.append('')
+        out.append('Sentencias más costosas (tiempo incluyendo lo que contienen):')
+        out.append(f'  {"línea":>6} {"veces":>9} {"total ms":>11} {"%":>6}  código')
+        for line, (count, elapsed, _) in sorted(self.by_line.items(), key=lambda item: -item[1][1])[:limit]:
+            code = source_lines[line - 1].strip() if source_lines and line <= len(source_lines) else ''
+            out.append(f'  {line:>6} {count:>9} {elapsed * 1000:>11.2f} {elapsed / total * 100:>5.1f}%  {code[:60]}')
+
+        out.append('')
+        out.append('Por tipo de nodo (propio: sin contar los nodos hijos):')
+        out.append(f'  {"nodo":<14} {"veces":>9} {"propio ms":>11} {"total ms":>11} {"%":>6}')
+        for name, (count, elapsed, own) in sorted(self.by_node.items(), key=lambda item: -item[1][2])[:limit]:
+            out.append(f'  {name:<14} {count:>9} {own * 1000:>11.2f} {elapsed * 1000:>11.2f} {own / total * 100:>5.1f}%')
+
+        if self.by_native:
+            out.append('')
+            out.append('Funciones nativas (incluye SQLite y la salida por consola):')
+            out.append(f'  {"función":<18} {"veces":>9} {"total ms":>11} {"media us":>10} {"%":>6}')
+            for name, (count, elapsed, _) in sorted(self.by_native.items(), key=lambda item: -item[1][1])[:limit]:
+                out.append(
+                    f'  {name:<18} {count:>9} {elapsed * 1000:>11.2f} '
+                    f'{elapsed / count * 1e6:>10.1f} {elapsed / total * 100:>5.1f}%'
+                )
+        return '\n'.join(out)
+
+    def collapsed(self) -> str:
+        """Pilas en formato «collapsed» (una por línea, con microsegundos propios)."""
+        return '\n'.join(
+            f'{stack} {round(own * 1e6)}'
+            for stack, own in sorted(self.stacks.items()) if round(own * 1e6) > 0
+        )
+
+
+def profile_file(filename: str, collapsed_path: Optional[str] = None, report_file: Optional[TextIO] = None) -> ProfilingInterpreter:
+    """Ejecuta un script con el perfilador y escribe el informe en `report_file` (stderr).
+
+    El árbol se ejecuta tal y como está escrito, sin optimizador ni caché,
+    para que cada medida corresponda a una línea del fichero. El informe se
+    escribe también si el script termina con un error.
+    """
+    with open(filename, 'r', encoding='utf-8') as file:
+        source = file.read()
+    parser = LineTrackingParser(Lexer(source))
+    tree = parser.parse()
+    profiler = ProfilingInterpreter(tree, filename=os.path.basename(filename), lines=parser.lines)
+    try:
+        profiler.interpret()
+    finally:
+        output.flush()  # La salida del script va antes que el informe
+        print(profiler.report(source.splitlines()), file=report_file or sys.stderr)
+        if collapsed_path:
+            with open(collapsed_path, 'w', encoding='utf-8') as file:
+                file.write(profiler.collapsed() + '\n')
+    return profiler
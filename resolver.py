@@ -0,0 +1,178 @@
+import attr
+
+from typing import Any, Iterable, Iterator, Optional
+
+from ast_nodes import (
+    BinOp, UnaryOp, Assign, Var, FuncCall, DictNode, ListNode, IfNode, IndexAccess,
+    RouteNode, ReturnNode, FunctionDef, GlobalVar, ParallelNode
+)
+from frame import Frame
+from functions import UserFunction, local_names
+from natives import DEFAULT_REGISTRY, NativeRegistry
+
+
+@attr.s(auto_attribs=True)
+class Resolver:
+    """Pasada previa a la ejecución que enlaza nombres con lo que designan.
+
+    Cada `FuncCall` se enlaza con su función nativa y, si hay `frame`, cada
+    `Var` recibe la posición fija de su variable. Las llamadas a funciones
+    desconocidas o con un número de argumentos incorrecto se rechazan todas
+    juntas antes de ejecutar nada.
+
+    Las funciones definidas con `def` se registran en `natives` antes de
+    resolver el bloque en el que están, de modo que se pueden llamar antes de
+    su definición y de forma recursiva. Dentro de una función, `frame` es su
+    frame local y las variables que no son locales se leen de `global_frame`.
+    """
+    natives: NativeRegistry = DEFAULT_REGISTRY
+    frame: Optional[Frame] = None
+    global_frame: Optional[Frame] = None
+
+    def __attrs_post_init__(self):
+        self.errors = []
+        self._functions = {}
+
+    def resolve(self, tree: list[Any], start: int = 0) -> list[Any]:
+        """Devuelve el árbol con las llamadas resueltas o lanza un error con todos los fallos.
+
+        Con `start` solo se resuelven y se devuelven las sentencias desde esa
+        posición, además de las funciones definidas antes (para reanudar un
+        script ya ejecutado en parte, ver `watch.py`).
+        """
+        self.errors = []
+        self.define_functions(tree)
+        if start:
+            self.resolve_block([node for node in tree[:start] if type(node) is FunctionDef])
+            tree = tree[start:]
+        result = self.resolve_block(tree)
+        if self.errors:
+            raise Exception('\n'.join(self.errors))
+        return result
+
+    def resolve_stream(self, statements: Iterable[Any]) -> Iterator[Any]:
+        """Resuelve las sentencias de primer nivel a medida que llegan."""
+        for statement in statements:
+            yield from self.resolve([statement])
+
+    def resolve_block(self, block: list[Any]) -> list[Any]:
+        resolved = [self.resolve_node(node) for node in block]
+        if all(new is old for new, old in zip(resolved, block)):
+            return block
+        return resolved
+
+    def resolve_node(self, node: Any) -> Any:
+        """Devuelve el nodo con sus llamadas enlazadas; si no cambia nada, el mismo nodo."""
+        node_type = type(node)
+        if node_type is Var:
+            return self.resolve_var(node)
+        if node_type is FuncCall:
+            args = self.resolve_block(node.args)
+            error = self.natives.check(node.name, len(args))
+            if error is not None:
+                self.errors.append(error)
+                return node
+            native = self.natives.lookup(node.name)
+            if native is node.native and args is node.args:
+                return node
+            return FuncCall(name=node.name, args=args, native=native)
+        if node_type is BinOp:
+            left, right = self.resolve_node(node.left), self.resolve_node(node.right)
+            if left is node.left and right is node.right:
+                return node
+            return BinOp(left=left, op=node.op, right=right)
+        if node_type is UnaryOp:
+            expr = self.resolve_node(node.expr)
+            return node if expr is node.expr else UnaryOp(op=node.op, expr=expr)
+        if node_type is Assign:
+            left, right = self.resolve_var(node.left), self.resolve_node(node.right)
+            if left is node.left and right is node.right:
+                return node
+            return Assign(left=left, right=right)
+        if node_type is IndexAccess:
+            container, index = self.resolve_node(node.container), self.resolve_node(node.index)
+            if container is node.container and index is node.index:
+                return node
+            return IndexAccess(container=container, index=index)
+        if node_type is DictNode:
+            pairs = {self.resolve_node(key): self.resolve_node(value) for key, value in node.pairs.items()}
+            if all(
+                new_key is old_key and new_value is old_value
+                for (new_key, new_value), (old_key, old_value) in zip(pairs.items(), node.pairs.items())
+            ):
+                return node
+            return DictNode(pairs=pairs)
+        if node_type is ListNode:
+            elements = self.resolve_block(node.elements)
+            return node if elements is node.elements else ListNode(elements=elements)
+        if node_type is IfNode:
+            condition = self.resolve_node(node.condition)
+            if_block = self.resolve_block(node.if_block)
+            elif_blocks = [
+                (self.resolve_node(elif_condition), self.resolve_block(block))
+                for elif_condition, block in node.elif_blocks or []
+            ]
+            else_block = self.resolve_block(node.else_block) if node.else_block is not None else None
+            return IfNode(condition=condition, if_block=if_block, elif_blocks=elif_blocks, else_block=else_block)
+        if node_type is ReturnNode:
+            value = self.resolve_node(node.value)
+            return node if value is node.value else ReturnNode(value=value)
+        if node_type is RouteNode:
+            return self.resolve_route(node)
+        if node_type is FunctionDef:
+            return self.resolve_function(node)
+        if node_type is ParallelNode:
+            tasks = [self.resolve_block(task) for task in node.tasks]
+            if all(new is old for new, old in zip(tasks, node.tasks)):
+                return node
+            return ParallelNode(tasks=tasks)
+        return node
+
+    def define_functions(self, block: list[Any]) -> None:
+        """Registra las funciones definidas en `block` (aún sin resolver sus cuerpos)."""
+        for node in block:
+            if type(node) is not FunctionDef:
+                continue
+            existing = self.natives.lookup(node.name)
+            if existing is not None:
+                kind = 'función' if isinstance(existing.func, UserFunction) else 'función nativa'
+                self.errors.append(f'Ya existe una {kind} "{node.name}"')
+                continue
+            if self.natives is DEFAULT_REGISTRY:
+                self.natives = self.natives.copy()
+            function = UserFunction(
+                node.name, node.params, local_names(node.params, node.body), node.body, self.frame, node.memo
+            )
+            self.natives.functions[node.name] = function.native()
+            self._functions[id(node)] = function
+
+    def resolve_function(self, node: FunctionDef) -> FunctionDef:
+        """Resuelve el cuerpo de una función contra su frame local."""
+        function = self._functions.pop(id(node), None)
+        if function is None:
+            return node  # Definición repetida, ya anotada como error
+        nested = Resolver(self.natives, Frame.from_names(function.names), self.frame)
+        function.body = nested.resolve_block(node.body)
+        self.errors.extend(nested.errors)
+        return FunctionDef(
+            name=node.name, params=node.params, body=function.body, memo=node.memo, names=function.names
+        )
+
+    def resolve_route(self, node: RouteNode) -> RouteNode:
+        """Resuelve el cuerpo de una ruta contra su propio frame por petición."""
+        nested = Resolver(self.natives, Frame())
+        body = nested.resolve_block(node.body)
+        self.errors.extend(nested.errors)
+        options = self.resolve_node(node.options) if node.options is not None else None
+        return RouteNode(
+            method=node.method, path=node.path, body=body, options=options, names=tuple(nested.frame.names)
+        )
+
+    def resolve_var(self, node: Var) -> Var:
+        """Asigna a la variable su posición en el frame."""
+        if self.frame is None:
+            return node
+        if self.global_frame is not None and node.name not in self.frame.index:
+            return GlobalVar(name=node.name, slot=self.global_frame.slot(node.name))
+        slot = self.frame.slot(node.name)
+        return node if slot == node.slot else Var(name=node.name, slot=slot)
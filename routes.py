@@ -0,0 +1,287 @@
+import attr
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Optional
+
+from ast_nodes import (
+    BinOp, UnaryOp, Assign, FuncCall, String, DictNode, ListNode, IfNode, IndexAccess,
+    Const, ReturnNode, ParallelNode
+)
+from arrays import NumArray
+from database import RowSet
+from frame import Frame
+from limits import Governor, LimitExceeded, LimitStats, Limits
+from natives import DEFAULT_REGISTRY
+
+
+ROUTE_OPTIONS = ('cache_ttl', 'cache_size', 'cache_tables', 'limits')
+DEFAULT_CACHE_SIZE = 128
+
+# Funciones nativas cuyo primer argumento es la tabla que leen.
+TABLE_READERS = ('db_query',)
+
+
+def referenced_tables(body: list[Any]) -> Optional[tuple[str, ...]]:
+    """Tablas que consulta el cuerpo de una ruta, o None si no se pueden saber.
+
+    Solo se reconocen las llamadas a `db_query` con el nombre de la tabla
+    escrito como literal; si alguna usa una expresión, o el cuerpo llama a
+    una función del script (que puede consultar cualquier tabla), cualquier
+    escritura debe invalidar la caché de la ruta.
+    """
+    tables = set()
+    pending = list(body)
+    while pending:
+        node = pending.pop()
+        node_type = type(node)
+        if node_type is FuncCall:
+            if node.name not in DEFAULT_REGISTRY.functions:
+                return None
+            if node.name in TABLE_READERS and node.args:
+                table = node.args[0]
+                if type(table) in (String, Const) and isinstance(table.value, str):
+                    tables.add(table.value)
+                else:
+                    return None
+            pending.extend(node.args)
+        elif node_type is BinOp:
+            pending.extend((node.left, node.right))
+        elif node_type is UnaryOp:
+            pending.append(node.expr)
+        elif node_type is Assign:
+            pending.append(node.right)
+        elif node_type is ReturnNode:
+            pending.append(node.value)
+        elif node_type is IndexAccess:
+            pending.extend((node.container, node.index))
+        elif node_type is DictNode:
+            for key, value in node.pairs.items():
+                pending.extend((key, value))
+        elif node_type is ListNode:
+            pending.extend(node.elements)
+        elif node_type is IfNode:
+            pending.append(node.condition)
+            pending.extend(node.if_block)
+            for condition, block in node.elif_blocks or []:
+                pending.append(condition)
+                pending.extend(block)
+            pending.extend(node.else_block or [])
+        elif node_type is ParallelNode:
+            for task in node.tasks:
+                pending.extend(task)
+    return tuple(sorted(tables))
+
+
+def to_response(value: Any) -> Any:
+    """Convierte el valor devuelto por una ruta en datos serializables como JSON.
+
+    Los resultados perezosos de `db_query` se leen aquí, en el hilo de trabajo
+    que atiende la petición y con su propia conexión.
+    """
+    if isinstance(value, RowSet):
+        return list(value)
+    if isinstance(value, NumArray):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {key: to_response(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_response(item) for item in value]
+    return value
+
+
+@attr.s(auto_attribs=True, eq=False)
+class ResponseCache:
+    """Caché LRU con caducidad de las respuestas de una ruta GET.
+
+    La clave es la ruta de la petición más sus parámetros de consulta y el
+    valor, el cuerpo JSON ya generado. `tables` son las tablas de las que
+    depende la ruta (None: todas); escribir en una de ellas vacía la caché.
+
+    Esa invalidación solo ve las escrituras del propio proceso. Con varios
+    procesos, `version` devuelve la versión de los datos compartidos (ver
+    `ConnectionManager.data_version`) y la caché se vacía cada vez que
+    cambia, escriba quien escriba.
+    """
+    ttl: float
+    max_entries: int = DEFAULT_CACHE_SIZE
+    tables: Optional[tuple[str, ...]] = None
+    version: Optional[Callable[[], Any]] = attr.ib(default=None, repr=False)
+
+    def __attrs_post_init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._seen_version = None
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_options(cls, method: str, options: Optional[dict[str, Any]], tables: Optional[tuple[str, ...]]) -> Optional['ResponseCache']:
+        """Crea la caché pedida en las opciones de la ruta, o None si no se pide."""
+        options = options or {}
+        unknown = [key for key in options if key not in ROUTE_OPTIONS]
+        if unknown:
+            raise Exception(f'Opciones de ruta desconocidas: {", ".join(map(str, unknown))}')
+        ttl = options.get('cache_ttl')
+        if ttl is None:
+            return None
+        if method != 'GET':
+            raise Exception('Solo se pueden cachear las rutas GET')
+        if not isinstance(ttl, (int, float)) or isinstance(ttl, bool) or ttl <= 0:
+            raise Exception('La opción "cache_ttl" debe ser un número de segundos mayor que 0')
+        size = options.get('cache_size', DEFAULT_CACHE_SIZE)
+        if not isinstance(size, int) or isinstance(size, bool) or size < 1:
+            raise Exception('La opción "cache_size" debe ser un entero mayor que 0')
+        if options.get('cache_tables') is not None:
+            tables = options['cache_tables']
+            tables = tuple([tables] if isinstance(tables, str) else tables)
+        return cls(ttl, size, tables)
+
+    @staticmethod
+    def key(path: str, query: Iterable[tuple[str, str]]) -> tuple:
+        """Clave de una petición: la ruta y sus parámetros de consulta ordenados."""
+        return (path, tuple(sorted(query)))
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        """Devuelve la respuesta guardada si sigue vigente, o None."""
+        if self.version is not None:
+            self.check_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, body: bytes, generation: int) -> None:
+        """Guarda una respuesta calculada en la generación `generation`.
+
+        Si la caché se invalidó mientras se calculaba, la respuesta puede
+        estar desfasada y no se guarda.
+        """
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def check_version(self) -> None:
+        """Vacía la caché si los datos han cambiado desde la última consulta."""
+        current = self.version()
+        if current != self._seen_version:
+            if self._seen_version is not None:
+                self.invalidate()
+            self._seen_version = current
+
+    def depends_on(self, table: Optional[str]) -> bool:
+        """Indica si escribir en `table` (None: en cualquiera) afecta a la ruta."""
+        return table is None or self.tables is None or table in self.tables
+
+    def invalidate(self) -> None:
+        """Vacía la caché."""
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Contadores de la caché."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+
+def invalidate_routes(handlers: Iterable['RouteHandler'], table: Optional[str] = None) -> None:
+    """Vacía la caché de las rutas que dependen de `table` (None: de todas)."""
+    for handler in handlers:
+        if handler.cache is not None and handler.cache.depends_on(table):
+            handler.cache.invalidate()
+
+
+@attr.s(auto_attribs=True, eq=False)
+class RouteHandler:
+    """Ruta de la API lista para atender peticiones.
+
+    El cuerpo se analiza y prepara una sola vez, al ejecutar la sentencia
+    `route`; `execute` lo ejecuta contra el contexto que recibe y devuelve el
+    valor de su `return`. Cada petición tiene su propio `Frame`, que parte de
+    los valores actuales de las variables globales del script con el mismo
+    nombre más la variable `request`, de modo que lo que asigna una petición
+    no lo ve ninguna otra. `source` es la ruta preparada de la que se creó
+    (`CompiledRoute` o `RouteNode`) y `options` sus opciones, para
+    reconstruirla en otro proceso. Si las opciones lo piden, las respuestas
+    se guardan en `cache`, que depende de `tables`. Con la opción `limits`
+    cada petición se ejecuta con un `Governor` y su consumo se suma en
+    `limit_stats`.
+    """
+    method: str
+    path: str
+    names: tuple[str, ...]
+    execute: Callable[[Any], Any]
+    context: Any
+    source: Any = attr.ib(default=None, repr=False)
+    options: Optional[dict[str, Any]] = None
+    tables: Optional[tuple[str, ...]] = None
+
+    def __attrs_post_init__(self):
+        self.cache = ResponseCache.from_options(self.method, self.options, self.tables)
+        limits = (self.options or {}).get('limits')
+        self.limits = Limits.from_options(limits) if limits is not None else None
+        self.limit_stats = LimitStats()
+
+    def new_context(self, request: dict[str, Any], governor: Optional[Governor] = None) -> Any:
+        """Crea el contexto de una petición a partir del contexto del script."""
+        frame = Frame.from_names(self.names)
+        variables = self.context.variables
+        for position, name in enumerate(frame.names):
+            source = variables.index.get(name)
+            if source is not None:
+                frame.slots[position] = variables.slots[source]
+        frame['request'] = request
+        return attr.evolve(self.context, variables=frame, transaction=False, pending_rows=0, governor=governor)
+
+    def run(self, request: dict[str, Any], limits: Optional[Limits] = None) -> Any:
+        """Atiende una petición y devuelve la respuesta serializable.
+
+        Los límites de la ruta tienen preferencia sobre `limits` (los
+        límites por defecto del servidor). Si se supera alguno se lanza
+        `LimitExceeded`. La conexión del hilo la comparten todas las
+        peticiones que atiende, así que si la petición falla, o termina con
+        una transacción abierta (lo que también es un error), la transacción
+        se deshace antes de atender la siguiente.
+        """
+        limits = self.limits or limits
+        governor = Governor(limits) if limits is not None else None
+        context = self.new_context(request, governor)
+        failed = True
+        try:
+            # Las filas de un resultado perezoso se leen en `to_response`
+            response = to_response(self.execute(context))
+            if context.transaction or (context.database is not None and context.database.in_transaction()):
+                raise Exception('La ruta terminó con una transacción abierta: usa db_commit() o db_rollback()')
+            failed = False
+        except LimitExceeded as e:
+            # El `finally` deshace la transacción antes de responder con 503
+            self.limit_stats.record(governor, e)
+            raise
+        finally:
+            if failed and context.database is not None:
+                context.database.rollback()
+        if governor is not None:
+            self.limit_stats.record(governor)
+        return response
@@ -0,0 +1,190 @@
+import attr
+import os
+import pickle
+import signal
+import subsystems
+import tempfile
+import threading
+
+from typing import Any, Optional
+
+from apiapp import APIApp
+from compiler import CompiledRoute
+from frame import Frame
+from functions import bind_functions, raise_recursion_limit
+from interpreter import Context, Interpreter
+from limits import Limits
+from natives import DEFAULT_REGISTRY, NativeRegistry
+from vm import VM
+
+
+SERVER_OPTIONS = ('host', 'port', 'workers', 'threads', 'keep_alive', 'backlog', 'limits')
+
+# Variable de entorno con la ruta de la instantánea que cargan los procesos hijos.
+SNAPSHOT_ENV = 'MERCU_API_SNAPSHOT'
+
+
+def _check_int(options: dict[str, Any], name: str, minimum: int, maximum: Optional[int] = None) -> None:
+    value = options.get(name)
+    if value is None:
+        return
+    if not isinstance(value, int) or isinstance(value, bool) or value < minimum or (maximum is not None and value > maximum):
+        limit = f'entre {minimum} y {maximum}' if maximum is not None else f'mayor o igual que {minimum}'
+        raise Exception(f'La opción "{name}" de create_api debe ser un entero {limit}')
+
+
+@attr.s(auto_attribs=True)
+class ServerOptions:
+    """Opciones de `create_api`.
+
+    `workers` es el número de procesos que sirven la API y `threads` el de
+    hilos que ejecutan rutas en cada proceso. `keep_alive` son los segundos
+    que se mantiene abierta una conexión inactiva y `backlog` el tamaño de la
+    cola de conexiones pendientes del socket. `limits` son los límites de
+    ejecución (ver `limits.Limits`) de las rutas que no definen los suyos.
+    """
+    host: str = '127.0.0.1'
+    port: int = 8000
+    workers: int = 1
+    threads: int = 8
+    keep_alive: int = 5
+    backlog: int = 2048
+    limits: Optional[Limits] = None
+
+    @classmethod
+    def from_options(cls, options: Optional[dict[str, Any]] = None) -> 'ServerOptions':
+        """Valida el diccionario de opciones de `create_api`."""
+        options = dict(options or {})
+        unknown = [key for key in options if key not in SERVER_OPTIONS]
+        if unknown:
+            raise Exception(f'Opciones de create_api desconocidas: {", ".join(map(str, unknown))}')
+        if 'host' in options and not isinstance(options['host'], str):
+            raise Exception('La opción "host" de create_api debe ser una cadena')
+        _check_int(options, 'port', 0, 65535)
+        _check_int(options, 'workers', 1)
+        _check_int(options, 'threads', 1)
+        _check_int(options, 'keep_alive', 0)
+        _check_int(options, 'backlog', 1)
+        if options.get('limits') is not None:
+            options['limits'] = Limits.from_options(options['limits'])
+        return cls(**options)
+
+    def uvicorn_settings(self) -> dict[str, Any]:
+        """Parámetros equivalentes de `uvicorn.Config`."""
+        return {
+            'host': self.host,
+            'port': self.port,
+            'timeout_keep_alive': self.keep_alive,
+            'backlog': self.backlog,
+        }
+
+
+@attr.s(auto_attribs=True)
+class Snapshot:
+    """Lo que necesita un proceso hijo para servir la API sin volver a ejecutar el script.
+
+    `routes` son las rutas ya preparadas (`CompiledRoute` o `RouteNode`
+    resueltos) con sus opciones, `variables` los valores globales que se pueden serializar y
+    `database` el gestor de conexiones, que cada proceso vuelve a abrir.
+    `natives` es el registro con las funciones definidas en el script y
+    `names` el orden de las variables globales, que se conserva porque los
+    cuerpos de esas funciones ya están enlazados con él. `limits` son los
+    límites por defecto de las rutas.
+    """
+    title: str
+    threads: int
+    routes: list[Any]
+    variables: dict[str, Any]
+    database: Optional[Any] = None
+    natives: NativeRegistry = DEFAULT_REGISTRY
+    names: tuple[str, ...] = ()
+    limits: Optional[Limits] = None
+
+
+def take_snapshot(context: Any, title: str, options: ServerOptions,
+                  natives: NativeRegistry = DEFAULT_REGISTRY) -> Snapshot:
+    """Captura el estado del script en el momento de llamar a `create_api`."""
+    variables = {}
+    for name, value in context.variables.items():
+        try:
+            pickle.dumps(value)
+        except Exception:
+            continue  # Conexiones, resultados perezosos...: no pasan a los hijos
+        variables[name] = value
+    routes = [(handler.source, handler.options) for handler in context.routes]
+    return Snapshot(
+        title, options.threads, routes, variables, context.database, natives, tuple(context.variables.names),
+        options.limits
+    )
+
+
+def serve_in_thread(app: Any, options: ServerOptions) -> Any:
+    """Sirve `app` en un hilo del propio proceso y devuelve el servidor de uvicorn.
+
+    El script sigue ejecutándose. SIGINT o SIGTERM detienen el servidor de
+    forma ordenada (terminando las peticiones en curso), y el proceso sale al
+    acabar el script.
+    """
+    uvicorn = subsystems.require('uvicorn', 'api')
+    server = uvicorn.Server(uvicorn.Config(app, **options.uvicorn_settings()))
+    thread = threading.Thread(target=server.run, name='mercu-api')
+    if threading.current_thread() is threading.main_thread():
+        previous = {}
+
+        def stop(signum, frame):
+            server.should_exit = True
+            # Una segunda señal vuelve al comportamiento normal
+            for number, handler in previous.items():
+                signal.signal(number, handler)
+
+        for number in (signal.SIGINT, signal.SIGTERM):
+            previous[number] = signal.signal(number, stop)
+    thread.start()
+    return server
+
+
+def serve_workers(snapshot: Snapshot, options: ServerOptions) -> None:
+    """Sirve la API con `options.workers` procesos y bloquea hasta que se detiene.
+
+    La instantánea se guarda en un fichero temporal; uvicorn arranca los
+    procesos, cada uno la carga con `create_worker_app` y sirve las rutas ya
+    compiladas sin volver a analizar el script. El supervisor de uvicorn
+    atiende SIGINT/SIGTERM y detiene a todos los procesos.
+    """
+    uvicorn = subsystems.require('uvicorn', 'api')
+    fd, path = tempfile.mkstemp(prefix='mercu-api-', suffix='.snapshot')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.environ[SNAPSHOT_ENV] = path
+        uvicorn.run(
+            'serve:create_worker_app', factory=True, workers=options.workers,
+            **options.uvicorn_settings()
+        )
+    finally:
+        os.environ.pop(SNAPSHOT_ENV, None)
+        os.unlink(path)
+
+
+def create_worker_app() -> Any:
+    """Factoría de la aplicación en cada proceso hijo (la invoca uvicorn)."""
+    raise_recursion_limit()
+    with open(os.environ[SNAPSHOT_ENV], 'rb') as file:
+        snapshot = pickle.load(file)
+    variables = Frame.from_names(snapshot.names)
+    variables.update(snapshot.variables)
+    context = Context(variables=variables, database=snapshot.database)
+    bind_functions(snapshot.natives, variables)
+    api = context.app = APIApp(snapshot.title, workers=snapshot.threads, limits=snapshot.limits)
+    for source, options in snapshot.routes:
+        if isinstance(source, CompiledRoute):
+            handler = VM(context=context, natives=snapshot.natives).route_handler(source, options)
+        else:
+            handler = Interpreter(tree=[], context=context, natives=snapshot.natives).route_handler(source, options)
+        if handler.cache is not None and context.database is not None and context.database.path != ':memory:':
+            # Las escrituras de otros procesos también deben vaciar la caché
+            handler.cache.version = context.database.data_version
+        context.routes.append(handler)
+        api.add_route(handler)
+    api.add_health_check(context.routes)
+    return api.app
@@ -0,0 +1,36 @@
+import importlib
+import sys
+import time
+
+from types import ModuleType
+
+
+# Tiempo (segundos) que ha costado importar cada subsistema en este proceso.
+IMPORT_TIMES: dict[str, float] = {}
+
+
+def require(module_name: str, subsystem: str) -> ModuleType:
+    """Importa `module_name` la primera vez que se necesita y contabiliza su coste.
+
+    Los subsistemas pesados (base de datos, API, consola enriquecida) no se
+    importan al cargar el intérprete, sino al usar la primera función nativa
+    que los necesita.
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    IMPORT_TIMES[subsystem] = IMPORT_TIMES.get(subsystem, 0.0) + time.perf_counter() - start
+    return module
+
+
+def startup_report(core_time: float) -> str:
+    """Informe del tiempo de importación del núcleo y de cada subsistema cargado."""
+    lines = ['Tiempo de importación por subsistema:']
+    lines.append(f'  {"núcleo":<10} {core_time * 1000:8.1f} ms')
+    for subsystem, elapsed in sorted(IMPORT_TIMES.items(), key=lambda item: -item[1]):
+        lines.append(f'  {subsystem:<10} {elapsed * 1000:8.1f} ms')
+    total = core_time + sum(IMPORT_TIMES.values())
+    lines.append(f'  {"total":<10} {total * 1000:8.1f} ms')
+    return '\n'.join(lines)
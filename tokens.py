@@ -1,46 +1,108 @@
-EOF = 'EOF' # End of file
-
-# Types
-NUMBER = 'NUMBER'
-BOOLEAN = "BOOLEAN"
-STRING = 'STRING'
-
-# Special Values
-TRUE = 'TRUE'
-FALSE = 'FALSE'
-
-# Unitary Operators
-IDENTIFIER = 'IDENTIFIER' # Var and functions
-ASSIGN = 'ASSIGN' # =
-
-# Binary Operators
-MUL = 'MUL'
-DIV = 'DIV'
-
-# Unitary/Bynary Operators
-PLUS = 'PLUS'
-MINUS = 'MINUS'
-
-# Syntax
-LPAREN = 'LPAREN' # (
-RPAREN = 'RPAREN' # )
-COMMA = 'COMMA'
-LBRACE = 'LBRACE' # {
-RBRACE = 'RBRACE' # }
-COLON = 'COLON' # :
-LBRACKET = 'LBRACKET' # [
-RBRACKET = 'RBRACKET' # ]
-IF = 'IF'
-ELIF = 'ELIF'
-ELSE = 'ELSE'
-
-# Logic Operators
-AND = 'AND'
-OR = 'OR'
-NOT = 'NOT'
-EQUALS = 'EQUALS' # ==
-NOT_EQUALS = 'NOT_EQUALS' # !=
-LESS_THAN = 'LESS_THAN' # <
-GREATER_THAN = 'GREATER_THAN' # >
-LESS_EQUAL = 'LESS_EQUAL' # <=
-GREATER_EQUAL = 'GREATER_EQUAL' # >=
+from enum import IntEnum
+
+
+class TokenType(IntEnum):
+    """Tipos de token. El lexer emite los valores enteros de este enum."""
+    EOF = 0 # End of file
+
+    # Types
+    NUMBER = 1
+    BOOLEAN = 2
+    STRING = 3
+
+    # Special Values
+    TRUE = 4
+    FALSE = 5
+
+    # Unitary Operators
+    IDENTIFIER = 6 # Var and functions
+    ASSIGN = 7 # =
+
+    # Binary Operators
+    MUL = 8
+    DIV = 9
+
+    # Unitary/Bynary Operators
+    PLUS = 10
+    MINUS = 11
+
+    # Syntax
+    LPAREN = 12 # (
+    RPAREN = 13 # )
+    COMMA = 14
+    LBRACE = 15 # {
+    RBRACE = 16 # }
+    COLON = 17 # :
+    LBRACKET = 18 # [
+    RBRACKET = 19 # ]
+    IF = 20
+    ELIF = 21
+    ELSE = 22
+
+    # Logic Operators
+    AND = 23
+    OR = 24
+    NOT = 25
+    EQUALS = 26 # ==
+    NOT_EQUALS = 27 # !=
+    LESS_THAN = 28 # <
+    GREATER_THAN = 29 # >
+    LESS_EQUAL = 30 # <=
+    GREATER_EQUAL = 31 # >=
+
+    # API
+    ROUTE = 32
+    RETURN = 33
+
+    # Functions
+    DEF = 34
+    MEMO = 35
+
+    # Concurrency
+    PARALLEL = 36
+
+
+def token_name(token_type: int) -> str:
+    """Devuelve el nombre legible de un tipo de token."""
+    return TokenType(token_type).name
+
+
+# Constantes enteras planas: comparar y usar como clave de diccionario un
+# `int` es más rápido que hacerlo con el miembro del enum.
+EOF = int(TokenType.EOF)
+NUMBER = int(TokenType.NUMBER)
+BOOLEAN = int(TokenType.BOOLEAN)
+STRING = int(TokenType.STRING)
+TRUE = int(TokenType.TRUE)
+FALSE = int(TokenType.FALSE)
+IDENTIFIER = int(TokenType.IDENTIFIER)
+ASSIGN = int(TokenType.ASSIGN)
+MUL = int(TokenType.MUL)
+DIV = int(TokenType.DIV)
+PLUS = int(TokenType.PLUS)
+MINUS = int(TokenType.MINUS)
+LPAREN = int(TokenType.LPAREN)
+RPAREN = int(TokenType.RPAREN)
+COMMA = int(TokenType.COMMA)
+LBRACE = int(TokenType.LBRACE)
+RBRACE = int(TokenType.RBRACE)
+COLON = int(TokenType.COLON)
+LBRACKET = int(TokenType.LBRACKET)
+RBRACKET = int(TokenType.RBRACKET)
+IF = int(TokenType.IF)
+ELIF = int(TokenType.ELIF)
+ELSE = int(TokenType.ELSE)
+AND = int(TokenType.AND)
+OR = int(TokenType.OR)
+NOT = int(TokenType.NOT)
+EQUALS = int(TokenType.EQUALS)
+NOT_EQUALS = int(TokenType.NOT_EQUALS)
+LESS_THAN = int(TokenType.LESS_THAN)
+GREATER_THAN = int(TokenType.GREATER_THAN)
+LESS_EQUAL = int(TokenType.LESS_EQUAL)
+GREATER_EQUAL = int(TokenType.GREATER_EQUAL)
+ROUTE = int(TokenType.ROUTE)
+RETURN = int(TokenType.RETURN)
+DEF = int(TokenType.DEF)
+MEMO = int(TokenType.MEMO)
+PARALLEL = int(TokenType.PARALLEL)
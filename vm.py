@@ -0,0 +1,277 @@
+import attr
+import functools
+import json
+
+from typing import Any, Iterable, Optional
+
+from compiler import Code, CompiledFunction, CompiledParallel, CompiledRoute
+from frame import UNBOUND, Frame
+from functions import UserFunction
+from interpreter import Context, Interpreter
+from natives import DEFAULT_REGISTRY, NativeRegistry
+from parallel import run_parallel
+from opcodes import (
+    LOAD_CONST, LOAD_NAME, STORE_NAME, BINARY_OP, UNARY_OP, CALL_FUNCTION,
+    POP_TOP, INDEX, BUILD_DICT, LOAD_JSON, JUMP, POP_JUMP_IF_FALSE, MAKE_ROUTE,
+    RETURN_VALUE, BUILD_LIST, LOAD_GLOBAL, PARALLEL, BINARY_OPERATORS, UNARY_OPERATORS
+)
+from routes import RouteHandler
+
+
+HASHABLE_KEY_TYPES = (str, int, float, bool, tuple)
+
+
+@attr.s(auto_attribs=True, eq=False)
+class VMFunction(UserFunction):
+    """Función del script cuyo cuerpo es bytecode (`body` es su `Code`).
+
+    El cuerpo se enlaza una sola vez, en la primera llamada, contra la
+    disposición fija de su frame local y contra el frame del script; cada
+    llamada reutiliza ese enlace.
+    """
+    natives: NativeRegistry = attr.ib(default=DEFAULT_REGISTRY, repr=False)
+
+    def __attrs_post_init__(self):
+        super().__attrs_post_init__()
+        self._vm = None
+        self._linked = None
+
+    def __reduce__(self):
+        # El registro va en el estado: contiene a la propia función
+        function, args = super().__reduce__()
+        return (function, args, {'natives': self.natives})
+
+    def run(self, interpreter: Any, frame: Frame) -> Any:
+        vm, linked = self._vm, self._linked
+        if linked is None:
+            vm = self._vm = VM(natives=self.natives)
+            linked = self._linked = vm.link(self.body, Frame.from_names(self.names), self.global_variables)
+        return vm.run_linked(self.body, *linked, interpreter, frame, self.global_variables)
+
+
+@attr.s(auto_attribs=True)
+class VM:
+    """Máquina virtual de pila que ejecuta el bytecode generado por `Compiler`."""
+    code: Code = attr.ib(factory=Code)
+    context: Context = attr.ib(factory=Context)
+    natives: NativeRegistry = DEFAULT_REGISTRY
+
+    def __attrs_post_init__(self):
+        """Prepara el intérprete que se pasa a las funciones nativas."""
+        self.builtins = Interpreter(tree=[], context=self.context, natives=self.natives)
+        self._own_natives = False
+
+    def define_functions(self, functions: list[CompiledFunction]) -> None:
+        """Registra las funciones del programa en una copia propia del registro de nativas."""
+        if not self._own_natives:
+            self.natives = self.builtins.natives = self.natives.copy()
+            self._own_natives = True
+        errors = []
+        for function in functions:
+            existing = self.natives.lookup(function.name)
+            if existing is not None:
+                kind = 'función' if isinstance(existing.func, UserFunction) else 'función nativa'
+                errors.append(f'Ya existe una {kind} "{function.name}"')
+                continue
+            user_function = VMFunction(
+                function.name, function.params, function.names, function.code,
+                self.context.variables, function.memo, self.natives
+            )
+            self.natives.functions[function.name] = user_function.native()
+        if errors:
+            raise Exception('\n'.join(errors))
+
+    def link(self, code: Code, frame: Optional[Frame] = None,
+             global_frame: Optional[Frame] = None) -> tuple[list[int], list[Any]]:
+        """Enlaza el programa con el contexto antes de ejecutarlo.
+
+        Registra las funciones que define el programa, resuelve la tabla de
+        llamadas (lanzando un error con todas las llamadas inválidas) y
+        traduce los índices de `code.names` a posiciones fijas del `Frame` de
+        variables (`frame`, por defecto el del contexto) o, en LOAD_GLOBAL,
+        del de las globales. Devuelve las instrucciones enlazadas y las
+        implementaciones en el orden de `code.calls`.
+        """
+        if code.functions:
+            self.define_functions(code.functions)
+        errors = [
+            error for error in (self.natives.check(name, argc) for name, argc in code.calls)
+            if error is not None
+        ]
+        if errors:
+            raise Exception('\n'.join(errors))
+        functions = [self.natives.lookup(name).func for name, _ in code.calls]
+
+        if frame is None:
+            frame = self.context.variables
+        if global_frame is None:
+            global_frame = frame
+        names = code.names
+        instructions = list(code.instructions)
+        for pc in range(0, len(instructions), 2):
+            op = instructions[pc]
+            if op == LOAD_NAME or op == STORE_NAME:
+                instructions[pc + 1] = frame.slot(names[instructions[pc + 1]])
+            elif op == LOAD_GLOBAL:
+                instructions[pc + 1] = global_frame.slot(names[instructions[pc + 1]])
+        return instructions, functions
+
+    def run(self) -> None:
+        """Ejecuta el programa completo."""
+        self.execute(self.code)
+
+    def run_stream(self, programs: Iterable[Code]) -> None:
+        """Ejecuta una secuencia de programas según se van produciendo."""
+        for program in programs:
+            self.execute(program)
+
+    def route_handler(self, route: CompiledRoute, options: Optional[dict[str, Any]] = None) -> RouteHandler:
+        """Prepara una ruta compilada para ejecutarla en cada petición con una VM propia."""
+        code, natives = route.code, self.natives
+
+        def execute(context: Context) -> Any:
+            return VM(code=code, context=context, natives=natives).execute(code)
+
+        return RouteHandler(
+            route.method, route.path, tuple(code.names), execute, self.context, route, options, route.tables
+        )
+
+    def execute(self, code: Code) -> Any:
+        """Enlaza y ejecuta un programa con las variables del contexto.
+
+        Devuelve el valor de RETURN_VALUE, o None si el programa termina sin él.
+        """
+        instructions, functions = self.link(code)
+        variables = self.context.variables
+        return self.run_linked(code, instructions, functions, self.builtins, variables, variables)
+
+    def run_parallel(self, block: CompiledParallel, interpreter: Interpreter, frame: Frame,
+                     global_frame: Frame) -> None:
+        """Ejecuta a la vez las tareas de un bloque parallel sobre las variables del bloque.
+
+        Las tareas se enlazan antes de lanzarlas, en este hilo: los errores de
+        enlace salen enseguida y los hilos solo ejecutan bytecode. Con límites,
+        cada tarea cuenta con su propio `TaskGovernor`.
+        """
+        interpreter.check_parallel()
+        governor = interpreter.context.governor
+        governors = governor.fork(len(block.codes)) if governor is not None else None
+        tasks = []
+        for index, code in enumerate(block.codes):
+            instructions, functions = self.link(code, frame, global_frame)
+            task_interpreter = interpreter
+            if governors is not None:
+                task_interpreter = attr.evolve(interpreter, context=attr.evolve(interpreter.context, governor=governors[index]))
+            tasks.append(functools.partial(
+                self.run_linked, code, instructions, functions, task_interpreter, frame, global_frame
+            ))
+        try:
+            run_parallel(tasks)
+        finally:
+            if governor is not None:
+                governor.join(governors)
+
+    def run_linked(self, code: Code, instructions: list[int], functions: list[Any], interpreter: Interpreter,
+                   frame: Frame, global_frame: Frame) -> Any:
+        """Bucle principal de la VM sobre un programa ya enlazado contra `frame` y `global_frame`."""
+        constants = code.constants
+        calls = code.calls
+        slots = frame.slots
+        slot_names = frame.names
+        global_slots = global_frame.slots
+        unbound = UNBOUND
+        binary_operators = BINARY_OPERATORS
+        unary_operators = UNARY_OPERATORS
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+        end = len(instructions)
+        governor = interpreter.context.governor
+        if governor is not None:
+            # Se cuentan las instrucciones hasta el siguiente salto, y luego
+            # desde el destino de cada salto: solo las que se ejecutan
+            runs = code.straight_runs()
+            if end:
+                governor.step(runs[0])
+        # Los códigos de operación como variables locales evitan búsquedas globales
+        load_name, load_const, store_name, binary_op = LOAD_NAME, LOAD_CONST, STORE_NAME, BINARY_OP
+        call_op, pop_top, pop_jump_if_false, jump = CALL_FUNCTION, POP_TOP, POP_JUMP_IF_FALSE, JUMP
+        index_op, unary_op, load_json, build_dict = INDEX, UNARY_OP, LOAD_JSON, BUILD_DICT
+        make_route, return_value, build_list, load_global = MAKE_ROUTE, RETURN_VALUE, BUILD_LIST, LOAD_GLOBAL
+        parallel_op = PARALLEL
+
+        while pc < end:
+            op = instructions[pc]
+            arg = instructions[pc + 1]
+            pc += 2
+            if op == load_name:
+                value = slots[arg]
+                if value is unbound:
+                    raise Exception(f'Variable "{slot_names[arg]}" no definida')
+                push(value)
+            elif op == load_const:
+                push(constants[arg])
+            elif op == store_name:
+                slots[arg] = pop()
+                if governor is not None:
+                    governor.check_value(slot_names[arg], slots[arg])
+            elif op == binary_op:
+                right = pop()
+                stack[-1] = binary_operators[arg](stack[-1], right)
+            elif op == call_op:
+                argc = calls[arg][1]
+                if argc:
+                    args = stack[-argc:]
+                    del stack[-argc:]
+                    push(functions[arg](interpreter, *args))
+                else:
+                    push(functions[arg](interpreter))
+            elif op == load_global:
+                value = global_slots[arg]
+                if value is unbound:
+                    raise Exception(f'Variable "{global_frame.names[arg]}" no definida')
+                push(value)
+            elif op == pop_top:
+                pop()
+            elif op == pop_jump_if_false:
+                if not pop():
+                    pc = arg
+                if governor is not None and pc < end:
+                    governor.step(runs[pc >> 1])
+            elif op == jump:
+                pc = arg
+                if governor is not None and pc < end:
+                    governor.step(runs[pc >> 1])
+            elif op == index_op:
+                index = pop()
+                try:
+                    stack[-1] = stack[-1][index]
+                except (TypeError, KeyError, IndexError) as e:
+                    raise Exception(f'Error al acceder al elemento: {e}')
+            elif op == unary_op:
+                stack[-1] = unary_operators[arg](stack[-1])
+            elif op == load_json:
+                push(json.loads(constants[arg]))
+            elif op == build_dict:
+                result = {}
+                items = stack[len(stack) - 2 * arg:]
+                del stack[len(stack) - 2 * arg:]
+                for i in range(0, len(items), 2):
+                    key = items[i]
+                    if not isinstance(key, HASHABLE_KEY_TYPES):
+                        raise TypeError(f'Las claves del diccionario deben ser tipos hashables, pero se recibió: {type(key).__name__}')
+                    result[key] = items[i + 1]
+                push(result)
+            elif op == build_list:
+                items = stack[len(stack) - arg:]
+                del stack[len(stack) - arg:]
+                push(items)
+            elif op == return_value:
+                return pop()
+            elif op == make_route:
+                interpreter.register_route(self.route_handler(constants[arg], pop()))
+            elif op == parallel_op:
+                self.run_parallel(constants[arg], interpreter, frame, global_frame)
+            else:
+                raise Exception(f'Instrucción {op} no soportada')
@@ -0,0 +1,446 @@
+"""`mercu --watch`: vuelve a ejecutar un script cada vez que cambia.
+
+Cada sentencia de primer nivel se guarda con su posición en el código y un
+hash de su texto. Al cambiar el fichero solo se vuelven a analizar las
+sentencias de la zona editada: las anteriores y las posteriores se reutilizan
+tal cual, igual que su versión optimizada y compilada.
+
+Antes de ejecutar cada sentencia se toma una instantánea del `Context`, así
+que la siguiente ejecución puede reanudarse desde la primera sentencia
+cambiada en lugar de repetir la preparación (`connect_db`,
+`db_create_table`...). Solo se reanuda si lo que se ejecutó después de ese
+punto no dejó efectos que la instantánea no deshace, como filas insertadas;
+si no, el script se ejecuta entero con un contexto nuevo.
+"""
+
+import attr
+import hashlib
+import os
+import re
+import sys
+import time
+
+from typing import Any, Optional
+
+import output
+from ast_nodes import (
+    BinOp, UnaryOp, Assign, FuncCall, DictNode, ListNode, IfNode, IndexAccess, RouteNode, ReturnNode,
+    FunctionDef, ParallelNode
+)
+from compiler import Compiler
+from frame import Frame
+from interpreter import Context, Interpreter
+from lexer import Lexer
+from optimizer import Optimizer
+from parser import Parser
+from resolver import Resolver
+from tokens import EOF
+from vm import VM
+
+
+# Segundos entre dos comprobaciones del fichero.
+POLL_INTERVAL = 0.2
+
+# Funciones cuyos efectos sobreviven a restaurar una instantánea del contexto:
+# escriben en la base de datos, cierran o deshacen una transacción, o dejan
+# un servidor escuchando.
+DURABLE_FUNCTIONS = (
+    'db_insert', 'db_insert_many', 'db_create_table', 'db_begin', 'db_commit', 'db_rollback', 'create_api'
+)
+
+WHITESPACE_RE = re.compile(r'\s*')
+
+
+def span_key(source: str) -> bytes:
+    """Hash del texto de una sentencia."""
+    return hashlib.sha256(source.encode('utf-8')).digest()[:16]
+
+
+def common_prefix(a: str, b: str) -> int:
+    """Longitud del prefijo común de dos textos (búsqueda binaria sobre comparaciones de cortes)."""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def common_suffix(a: str, b: str, limit: int) -> int:
+    """Longitud del sufijo común de dos textos, como mucho `limit`."""
+    low, high = 0, min(len(a), len(b), limit)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:] == b[len(b) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def called_functions(block: list[Any]) -> set[str]:
+    """Funciones a las que llama un bloque al ejecutarse.
+
+    Los cuerpos de funciones y rutas no cuentan: se ejecutan cuando se llama
+    a la función o llega una petición, no al pasar por su definición.
+    """
+    calls = set()
+    pending = list(block)
+    while pending:
+        node = pending.pop()
+        node_type = type(node)
+        if node_type is FuncCall:
+            calls.add(node.name)
+            pending.extend(node.args)
+        elif node_type is Assign:
+            pending.append(node.right)
+        elif node_type is BinOp:
+            pending.extend((node.left, node.right))
+        elif node_type is UnaryOp:
+            pending.append(node.expr)
+        elif node_type is ReturnNode:
+            pending.append(node.value)
+        elif node_type is IndexAccess:
+            pending.extend((node.container, node.index))
+        elif node_type is DictNode:
+            for key, value in node.pairs.items():
+                pending.extend((key, value))
+        elif node_type is ListNode:
+            pending.extend(node.elements)
+        elif node_type is IfNode:
+            pending.append(node.condition)
+            pending.extend(node.if_block)
+            for condition, elif_block in node.elif_blocks or []:
+                pending.append(condition)
+                pending.extend(elif_block)
+            pending.extend(node.else_block or [])
+        elif node_type is ParallelNode:
+            for task in node.tasks:
+                pending.extend(task)
+        elif node_type is RouteNode and node.options is not None:
+            pending.append(node.options)
+    return calls
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class Statement:
+    """Sentencia de primer nivel y su posición en el código.
+
+    `key` es el hash del texto de la sentencia, de `start` a `end`. Su análisis
+    depende además del token siguiente, que termina antes de `lookahead_end`:
+    si el texto hasta ahí no cambia, la sentencia tampoco.
+    """
+    key: bytes
+    start: int
+    end: int
+    lookahead_end: int
+    node: Any
+
+    def shifted(self, delta: int) -> 'Statement':
+        return attr.evolve(
+            self, start=self.start + delta, end=self.end + delta, lookahead_end=self.lookahead_end + delta
+        )
+
+
+@attr.s(auto_attribs=True)
+class SpanTrackingParser(Parser):
+    """Parser que anota dónde empieza y termina cada sentencia de primer nivel.
+
+    Solo lo usa el modo `--watch`. `offset` es la posición del texto del
+    lexer dentro del fichero completo, y `token_end` el final (relativo a
+    ese texto) del último token consumido.
+    """
+    offset: int = 0
+
+    def __attrs_post_init__(self):
+        super().__attrs_post_init__()
+        self.token_end = 0
+
+    def eat(self, token_type: str) -> None:
+        # `lexer.pos` es el final del token actual, el que se consume
+        self.token_end = self.lexer.pos
+        super().eat(token_type)
+
+    def next_start(self) -> int:
+        """Posición en el fichero del token actual (el primero de la siguiente sentencia)."""
+        return self.offset + WHITESPACE_RE.match(self.lexer.text, self.token_end).end()
+
+    def span_statement(self, start: int) -> Statement:
+        """Analiza la sentencia que empieza en `start` y la devuelve con su posición."""
+        node = self.statement()
+        end = self.offset + self.token_end
+        source = self.lexer.text[start - self.offset:end - self.offset]
+        return Statement(span_key(source), start, end, self.offset + self.lexer.pos + 1, node)
+
+
+@attr.s(auto_attribs=True)
+class Snapshot:
+    """Estado del `Context` antes de una sentencia de primer nivel.
+
+    Los frames y la lista de rutas solo crecen, así que basta con guardar
+    cuántos nombres y rutas había: `names` es la lista del frame, que puede
+    tener más nombres al restaurar.
+    """
+    names: list[str]
+    size: int
+    slots: list[Any]
+    database: Any
+    app: Any
+    transaction: bool
+    pending_rows: int
+    routes: int
+
+    @classmethod
+    def take(cls, context: Context) -> 'Snapshot':
+        variables = context.variables
+        return cls(
+            variables.names, len(variables.names), list(variables.slots), context.database, context.app,
+            context.transaction, context.pending_rows, len(context.routes)
+        )
+
+    def restore(self, context: Context) -> Context:
+        """Devuelve un contexto nuevo con el estado guardado; `context` es el actual."""
+        variables = Frame.from_names(self.names[:self.size])
+        variables.slots[:] = self.slots
+        if context.database is not None and context.database is not self.database:
+            context.database.close()
+        return Context(
+            variables=variables, database=self.database, app=self.app, transaction=self.transaction,
+            pending_rows=self.pending_rows, routes=context.routes[:self.routes]
+        )
+
+
+@attr.s(auto_attribs=True)
+class WatchSession:
+    """Estado del modo `--watch` entre dos ejecuciones del mismo script."""
+    filename: str
+    engine: str = 'vm'
+    optimize: bool = True
+
+    def __attrs_post_init__(self):
+        self.text: Optional[str] = None
+        self.statements: list[Statement] = []
+        self.context = Context()
+        self.snapshots: list[Snapshot] = []
+        self.started = 0
+        self.optimizer = Optimizer() if self.optimize else None
+        self._units: dict[bytes, Any] = {}
+        self._calls: dict[bytes, set[str]] = {}
+
+    def close(self) -> None:
+        if self.context.database is not None:
+            self.context.database.close()
+
+    def update(self) -> None:
+        """Lee el fichero y, si ha cambiado, lo analiza y lo ejecuta desde donde haga falta."""
+        start = time.perf_counter()
+        with open(self.filename, 'r', encoding='utf-8') as file:
+            text = file.read()
+        if text == self.text:
+            return
+        try:
+            statements, parsed = self.parse(text)
+        except Exception as e:
+            # Se conserva la versión anterior como referencia para el próximo cambio
+            print(f'Error: {e}', file=sys.stderr)
+            return
+        old_statements, self.text, self.statements = self.statements, text, statements
+        first, reason = self.resume_point(old_statements, statements)
+        if first and first == len(statements) == len(old_statements):
+            resumed = 'ninguna sentencia ha cambiado'
+        elif first == len(statements):
+            resumed = 'no queda nada que ejecutar'
+        elif first:
+            resumed = f'se reanuda en la línea {text.count(chr(10), 0, statements[first].start) + 1}'
+        else:
+            resumed = 'ejecución completa' + (f' ({reason})' if reason else '')
+        try:
+            self.run(first)
+            error = None
+        except Exception as e:
+            error = e
+        finally:
+            output.flush()
+        if error is not None:
+            print(f'Error: {error}', file=sys.stderr)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(
+            f'[watch] {parsed} sentencia(s) analizada(s), {len(statements) - parsed} reutilizada(s); '
+            f'{resumed} ({elapsed:.1f} ms)',
+            file=sys.stderr
+        )
+
+    def parse(self, text: str) -> tuple[list[Statement], int]:
+        """Analiza `text` reutilizando las sentencias que no han cambiado desde la versión anterior.
+
+        Devuelve las sentencias y cuántas se han analizado de nuevo.
+        """
+        old, old_text = self.statements, self.text or ''
+        prefix = common_prefix(old_text, text)
+        suffix = common_suffix(old_text, text, min(len(old_text), len(text)) - prefix)
+        delta = len(text) - len(old_text)
+
+        kept = 0
+        while kept < len(old) and old[kept].lookahead_end <= prefix:
+            kept += 1
+        statements = old[:kept]
+        position = old[kept - 1].end if kept else 0
+        # Sentencias que no cambian hasta el final del fichero: si el análisis
+        # llega al inicio de una de ellas, el resto se reutiliza
+        unchanged = len(old_text) - suffix
+        resync = {
+            statement.start + delta: index
+            for index, statement in enumerate(old[kept:], kept) if statement.start >= unchanged
+        }
+
+        parser = SpanTrackingParser(Lexer(text[position:]), offset=position)
+        parser.functions.update(
+            (statement.node.name, statement.node) for statement in statements if type(statement.node) is FunctionDef
+        )
+        parsed = 0
+        function_changed = False
+        while parser.current_token[0] != EOF:
+            start = parser.next_start()
+            index = resync.get(start)
+            # Si cambia una función, los bloques parallel que siguen se
+            # vuelven a analizar para comprobarlos con su nuevo cuerpo
+            if index is not None and not function_changed:
+                statements.extend(statement.shifted(delta) for statement in old[index:])
+                break
+            statement = parser.span_statement(start)
+            function_changed = function_changed or type(statement.node) is FunctionDef
+            statements.append(statement)
+            parsed += 1
+        return statements, parsed
+
+    def unit(self, statement: Statement) -> Any:
+        """Sentencia optimizada (motor AST) o compilada (VM), guardada por el hash de su texto."""
+        unit = self._units.get(statement.key)
+        if unit is None:
+            nodes = [statement.node]
+            if self.optimizer is not None:
+                nodes = self.optimizer.optimize(nodes)
+            unit = self._units[statement.key] = nodes if self.engine == 'ast' else Compiler().compile(nodes)
+        return unit
+
+    def calls(self, statement: Statement) -> set[str]:
+        calls = self._calls.get(statement.key)
+        if calls is None:
+            calls = self._calls[statement.key] = called_functions([statement.node])
+        return calls
+
+    def reachable(self, statement: Statement, functions: dict[str, set[str]]) -> set[str]:
+        """Funciones que puede llegar a ejecutar una sentencia, siguiendo las del script."""
+        reached = set()
+        pending = list(self.calls(statement))
+        while pending:
+            name = pending.pop()
+            if name not in reached:
+                reached.add(name)
+                pending.extend(functions.get(name, ()))
+        return reached
+
+    def resume_point(self, old: list[Statement], new: list[Statement]) -> tuple[int, Optional[str]]:
+        """Primera sentencia que hay que ejecutar y, si es la primera del script por un efecto, cuál."""
+        first = 0
+        while first < min(len(old), len(new)) and old[first].key == new[first].key:
+            first += 1
+        # Sin instantánea más allá de la sentencia en la que falló la ejecución anterior
+        first = min(first, len(self.snapshots) - 1)
+        if first <= 0:
+            return 0, None
+
+        functions = {}
+        for statement in old + new:
+            if type(statement.node) is FunctionDef:
+                functions.setdefault(statement.node.name, set()).update(called_functions(statement.node.body))
+        # Las funciones se pueden llamar antes de su definición: si cambia
+        # alguna, se vuelve a la primera sentencia que la usa
+        changed = {
+            statement.node.name for statement in old[first:] + new[first:] if type(statement.node) is FunctionDef
+        }
+        if changed:
+            for index in range(first):
+                if self.reachable(new[index], functions) & changed:
+                    first = index
+                    break
+
+        for index in range(first, self.started):
+            durable = self.reachable(old[index], functions).intersection(DURABLE_FUNCTIONS)
+            if durable:
+                return 0, f'{sorted(durable)[0]}() ya se había ejecutado después del cambio'
+        return first, None
+
+    def run(self, first: int) -> None:
+        """Ejecuta las sentencias desde `first`, con el contexto de la instantánea tomada antes de ella."""
+        if first:
+            self.context = self.snapshots[first].restore(self.context)
+        else:
+            self.close()
+            self.context = Context()
+        del self.snapshots[first:]
+        self.started = first
+        units = [self.unit(statement) for statement in self.statements]
+        live = {statement.key for statement in self.statements}
+        self._units = {key: unit for key, unit in self._units.items() if key in live}
+        self._calls = {key: calls for key, calls in self._calls.items() if key in live}
+        if self.engine == 'ast':
+            self.run_ast(units, first)
+        else:
+            self.run_vm(units, first)
+        self.begin(len(units))
+
+    def begin(self, index: int) -> None:
+        """Anota que empieza la sentencia `index`, con una instantánea del estado previo."""
+        del self.snapshots[index:]
+        self.snapshots.append(Snapshot.take(self.context))
+        self.started = min(index + 1, len(self.statements))
+
+    def run_ast(self, units: list[list[Any]], first: int) -> None:
+        interpreter = Interpreter(tree=[], context=self.context)
+        resolver = Resolver(interpreter.natives.copy(), self.context.variables)
+        interpreter.natives = resolver.natives
+        position = sum(len(unit) for unit in units[:first])
+        tree = resolver.resolve([node for unit in units for node in unit], position)
+        position = 0
+        for index in range(first, len(units)):
+            self.begin(index)
+            for node in tree[position:position + len(units[index])]:
+                interpreter.visit(node)
+            position += len(units[index])
+
+    def run_vm(self, units: list[Any], first: int) -> None:
+        vm = VM(context=self.context)
+        functions = [function for code in units for function in code.functions]
+        if functions:
+            vm.define_functions(functions)
+        # Se enlaza todo antes de ejecutar, como con el programa completo
+        linked = [vm.link(attr.evolve(code, functions=[])) for code in units[first:]]
+        variables = self.context.variables
+        for index, code, (instructions, natives) in zip(range(first, len(units)), units[first:], linked):
+            self.begin(index)
+            vm.run_linked(code, instructions, natives, vm.builtins, variables, variables)
+
+
+def watch_file(filename: str, engine: str = 'vm', optimize: bool = True, interval: float = POLL_INTERVAL) -> None:
+    """Ejecuta el script y lo vuelve a ejecutar con cada cambio hasta recibir Ctrl+C."""
+    session = WatchSession(filename, engine, optimize)
+    print(f'Vigilando {filename} (Ctrl+C para terminar)', file=sys.stderr)
+    signature = None
+    try:
+        while True:
+            try:
+                stat = os.stat(filename)
+            except FileNotFoundError:
+                # Algunos editores sustituyen el fichero al guardar
+                stat = None
+            if stat is not None and (stat.st_mtime_ns, stat.st_size) != signature:
+                signature = (stat.st_mtime_ns, stat.st_size)
+                session.update()
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        session.close()